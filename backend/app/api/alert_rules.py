@@ -172,6 +172,16 @@ def get_notifications(
     return NotificationService.get_notifications(db, alert_id, skip, limit)
 
 
+@router.get("/notifications/queue")
+def get_notification_queue(
+    current_user: User = Depends(get_current_active_user)
+):
+    """获取通知投递队列状态（待发送数、发送中数）"""
+    from app.services.notification_dispatcher import notification_dispatcher
+    
+    return notification_dispatcher.stats()
+
+
 @router.post("/notifications/{notification_id}/retry", response_model=AlertNotification)
 def retry_notification(
     notification_id: int,
@@ -1,10 +1,13 @@
-from fastapi import APIRouter, Depends, HTTPException, BackgroundTasks
+from fastapi import APIRouter, Depends, HTTPException, BackgroundTasks, Query
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
 from typing import List, Optional
+from datetime import datetime
 from app.core.database import get_db
 from app.schemas.kubernetes import (
     K8sCluster, K8sClusterCreate, K8sClusterUpdate, K8sClusterSummary,
-    K8sNode, K8sNamespace, K8sPod, K8sClusterStats
+    K8sNode, K8sNamespace, K8sPod, K8sClusterStats, K8sUsageHistory, K8sPodPage,
+    K8sDeploymentBatchAction
 )
 from app.schemas.user import User
 from app.services.k8s_service import K8sService
@@ -101,233 +104,47 @@ def diagnose_cluster_connection(
     返回详细的诊断信息，包括：
     - 连接测试结果
     - 认证配置检查
-    - 网络连通性测试
+    - 网络连通性测试（DNS解析、TCP连接）
     - 详细错误信息
+    
+    网络与API检查并发执行，整体不超过K8S_DIAGNOSE_DEADLINE秒
     """
-    from app.utils.k8s_client import K8sClient
-    import socket
-    from urllib.parse import urlparse
+    from app.services.k8s_diagnosis_service import k8s_diagnosis_service
     
     cluster = K8sService.get_cluster(db, cluster_id)
     if not cluster:
         raise HTTPException(status_code=404, detail="Cluster not found")
     
-    diagnosis = {
-        "cluster_id": cluster_id,
-        "cluster_name": cluster.cluster_name,
-        "checks": [],
-        "overall_status": "unknown",
-        "recommendations": []
-    }
-    
-    # 检查1: API Server地址格式
-    if cluster.api_server:
-        try:
-            parsed = urlparse(cluster.api_server)
-            if parsed.scheme and parsed.netloc:
-                diagnosis["checks"].append({
-                    "name": "API Server地址格式",
-                    "status": "pass",
-                    "message": f"格式正确: {parsed.scheme}://{parsed.netloc}"
-                })
-                
-                # 检查2: 网络连通性
-                try:
-                    host = parsed.hostname
-                    port = parsed.port or (443 if parsed.scheme == 'https' else 80)
-                    
-                    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-                    sock.settimeout(5)
-                    result = sock.connect_ex((host, port))
-                    sock.close()
-                    
-                    if result == 0:
-                        diagnosis["checks"].append({
-                            "name": "网络连通性",
-                            "status": "pass",
-                            "message": f"可以访问 {host}:{port}"
-                        })
-                    else:
-                        diagnosis["checks"].append({
-                            "name": "网络连通性",
-                            "status": "fail",
-                            "message": f"无法连接到 {host}:{port}"
-                        })
-                        diagnosis["recommendations"].append(
-                            "请检查: 1) API Server是否运行 2) 网络防火墙设置 3) 安全组配置"
-                        )
-                except Exception as e:
-                    diagnosis["checks"].append({
-                        "name": "网络连通性",
-                        "status": "error",
-                        "message": f"测试失败: {str(e)}"
-                    })
-            else:
-                diagnosis["checks"].append({
-                    "name": "API Server地址格式",
-                    "status": "fail",
-                    "message": "地址格式不正确，应该类似: https://x.x.x.x:6443"
-                })
-                diagnosis["recommendations"].append("请检查API Server地址格式")
-        except Exception as e:
-            diagnosis["checks"].append({
-                "name": "API Server地址格式",
-                "status": "error",
-                "message": str(e)
-            })
-    else:
-        diagnosis["checks"].append({
-            "name": "API Server地址",
-            "status": "fail",
-            "message": "API Server地址未配置"
-        })
-        diagnosis["recommendations"].append("请配置API Server地址")
-    
-    # 检查3: 认证配置
-    auth_config_ok = False
-    if cluster.auth_type == "kubeconfig":
-        if cluster.kubeconfig:
-            diagnosis["checks"].append({
-                "name": "认证配置",
-                "status": "pass",
-                "message": f"使用kubeconfig认证 (长度: {len(cluster.kubeconfig)} 字符)"
-            })
-            auth_config_ok = True
-        else:
-            diagnosis["checks"].append({
-                "name": "认证配置",
-                "status": "fail",
-                "message": "kubeconfig内容为空"
-            })
-            diagnosis["recommendations"].append("请提供完整的kubeconfig文件内容")
-    
-    elif cluster.auth_type == "token":
-        if cluster.token:
-            diagnosis["checks"].append({
-                "name": "认证配置",
-                "status": "pass",
-                "message": f"使用Token认证 (长度: {len(cluster.token)} 字符)"
-            })
-            auth_config_ok = True
-            
-            if not cluster.ca_cert:
-                diagnosis["checks"].append({
-                    "name": "SSL证书",
-                    "status": "warning",
-                    "message": "未提供CA证书，将跳过SSL验证（不推荐用于生产环境）"
-                })
-                diagnosis["recommendations"].append("建议配置CA证书以提高安全性")
-        else:
-            diagnosis["checks"].append({
-                "name": "认证配置",
-                "status": "fail",
-                "message": "Token为空"
-            })
-            diagnosis["recommendations"].append("请提供有效的Bearer Token")
-    
-    elif cluster.auth_type == "cert":
-        has_ca = bool(cluster.ca_cert)
-        has_client_cert = bool(cluster.client_cert)
-        has_client_key = bool(cluster.client_key)
-        
-        if has_ca and has_client_cert and has_client_key:
-            diagnosis["checks"].append({
-                "name": "认证配置",
-                "status": "pass",
-                "message": "证书认证配置完整"
-            })
-            auth_config_ok = True
-        else:
-            missing = []
-            if not has_ca: missing.append("CA证书")
-            if not has_client_cert: missing.append("客户端证书")
-            if not has_client_key: missing.append("客户端密钥")
-            
-            diagnosis["checks"].append({
-                "name": "认证配置",
-                "status": "fail",
-                "message": f"缺少: {', '.join(missing)}"
-            })
-            diagnosis["recommendations"].append(f"请提供完整的证书认证配置: {', '.join(missing)}")
-    
-    # 检查4: K8s连接测试
-    if auth_config_ok:
-        try:
-            k8s_client = K8sClient(
-                api_server=cluster.api_server,
-                auth_type=cluster.auth_type,
-                kubeconfig=cluster.kubeconfig,
-                token=cluster.token,
-                ca_cert=cluster.ca_cert,
-                client_cert=cluster.client_cert,
-                client_key=cluster.client_key
-            )
-            
-            success, error_msg = k8s_client.connect()
-            
-            if success:
-                diagnosis["checks"].append({
-                    "name": "K8s API连接",
-                    "status": "pass",
-                    "message": "成功连接到Kubernetes集群"
-                })
-                
-                # 尝试获取版本信息
-                version = k8s_client.get_version()
-                if version:
-                    diagnosis["checks"].append({
-                        "name": "集群版本",
-                        "status": "pass",
-                        "message": f"Kubernetes {version}"
-                    })
-                
-                # 尝试获取资源统计
-                stats = k8s_client.get_cluster_stats()
-                diagnosis["checks"].append({
-                    "name": "资源统计",
-                    "status": "pass",
-                    "message": f"节点: {stats['node_count']}, 命名空间: {stats['namespace_count']}, Pod: {stats['pod_count']}"
-                })
-                
-                diagnosis["overall_status"] = "healthy"
-                k8s_client.close()
-            else:
-                diagnosis["checks"].append({
-                    "name": "K8s API连接",
-                    "status": "fail",
-                    "message": error_msg or "连接失败"
-                })
-                diagnosis["overall_status"] = "unhealthy"
-                
-                # 根据错误信息提供建议
-                if "401" in (error_msg or "") or "认证失败" in (error_msg or ""):
-                    diagnosis["recommendations"].append("认证失败：请检查Token或证书是否正确、是否过期")
-                elif "403" in (error_msg or "") or "权限" in (error_msg or ""):
-                    diagnosis["recommendations"].append("权限不足：请确保账号有足够的RBAC权限（至少需要list namespace的权限）")
-                elif "timeout" in (error_msg or "").lower():
-                    diagnosis["recommendations"].append("连接超时：请检查网络连接和防火墙设置")
-                elif "certificate" in (error_msg or "").lower():
-                    diagnosis["recommendations"].append("证书问题：请检查CA证书是否正确")
-                else:
-                    diagnosis["recommendations"].append(f"连接错误：{error_msg}")
-                    
-        except Exception as e:
-            diagnosis["checks"].append({
-                "name": "K8s API连接",
-                "status": "error",
-                "message": f"测试异常: {str(e)}"
-            })
-            diagnosis["overall_status"] = "error"
-            diagnosis["recommendations"].append("发生未预期的错误，请检查配置或查看后端日志")
-    else:
-        diagnosis["overall_status"] = "config_error"
-        diagnosis["recommendations"].append("请先完成认证配置")
-    
-    # 汇总建议
-    if not diagnosis["recommendations"]:
-        diagnosis["recommendations"].append("集群配置正常，可以开始同步资源")
-    
-    return diagnosis
+    # 检查在工作线程中读取集群配置，先与会话分离
+    db.expunge(cluster)
+    return k8s_diagnosis_service.diagnose(cluster)
+
+
+@router.post("/diagnose")
+def diagnose_all_clusters(
+    include_inactive: bool = False,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_active_user)
+):
+    """
+    批量诊断所有集群，结果以NDJSON按完成顺序逐行返回（type=cluster），最后一行为汇总（type=summary）
+    """
+    import json
+    from app.models.kubernetes import K8sCluster as K8sClusterModel
+    from app.services.k8s_diagnosis_service import k8s_diagnosis_service
+    
+    query = db.query(K8sClusterModel)
+    if not include_inactive:
+        query = query.filter(K8sClusterModel.is_active == True)
+    clusters = query.all()
+    for cluster in clusters:
+        db.expunge(cluster)
+    
+    return StreamingResponse(
+        (json.dumps(result, ensure_ascii=False) + "\n" for result in k8s_diagnosis_service.diagnose_all(clusters)),
+        media_type="application/x-ndjson",
+        headers={"X-Accel-Buffering": "no", "Cache-Control": "no-cache"}
+    )
 
 
 @router.post("/clusters/{cluster_id}/sync")
@@ -364,13 +181,15 @@ def sync_cluster_resources(
                 "status": "success",
                 "cluster": {
                     "id": updated_cluster.id,
-                    "cluster_name": updated_cluster.cluster_name,
+                    "cluster_name": updated_cluster.name,
                     "status": updated_cluster.status,
                     "node_count": updated_cluster.node_count,
                     "namespace_count": updated_cluster.namespace_count,
                     "pod_count": updated_cluster.pod_count,
                     "version": updated_cluster.version,
-                }
+                },
+                # 本次同步的增量统计（新增/更新/删除/未变化）
+                "changes": updated_cluster.last_sync_result
             }
         else:
             return {
@@ -423,6 +242,173 @@ def get_cluster_pods(
     return K8sService.get_cluster_pods(db, cluster_id, namespace)
 
 
+@router.get("/clusters/{cluster_id}/pods/page", response_model=K8sPodPage)
+def query_cluster_pods(
+    cluster_id: int,
+    namespace: Optional[str] = None,
+    node: Optional[str] = None,
+    status: Optional[str] = None,
+    name_prefix: Optional[str] = None,
+    label_selector: Optional[str] = Query(None, description="标签选择器，例如 app=web,env in (prod,staging),!legacy"),
+    cursor: Optional[str] = Query(None, description="上一页返回的next_cursor"),
+    limit: int = Query(100, ge=1, le=500),
+    include_labels: bool = False,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_active_user)
+):
+    """游标分页查询Pod（按命名空间、名称排序）"""
+    cluster = K8sService.get_cluster(db, cluster_id)
+    if not cluster:
+        raise HTTPException(status_code=404, detail="Cluster not found")
+    
+    try:
+        return K8sService.query_cluster_pods(
+            db, cluster_id,
+            namespace=namespace,
+            node_name=node,
+            status=status,
+            name_prefix=name_prefix,
+            label_selector=label_selector,
+            cursor=cursor,
+            limit=limit,
+            include_labels=include_labels
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+def _query_usage(series_id: int, start: Optional[datetime], end: Optional[datetime],
+                 resolution: Optional[str]) -> dict:
+    """查询使用量历史（参数含义同服务器资源历史）"""
+    from app.services.k8s_metrics_service import k8s_metrics_store
+    from app.utils.metrics_store import query_range, RESOLUTION_BY_NAME
+    
+    if resolution is not None and resolution not in RESOLUTION_BY_NAME:
+        raise HTTPException(status_code=400, detail=f"resolution must be one of {list(RESOLUTION_BY_NAME)}")
+    
+    try:
+        start_ts, end_ts = query_range(start, end)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    return k8s_metrics_store.query(
+        series_id,
+        start_ts,
+        end_ts,
+        RESOLUTION_BY_NAME[resolution] if resolution else None
+    )
+
+
+@router.get("/clusters/{cluster_id}/usage", response_model=K8sUsageHistory)
+def get_cluster_usage(
+    cluster_id: int,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    resolution: Optional[str] = None,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_active_user)
+):
+    """
+    获取集群汇总资源使用量历史（全部节点之和，使用率相对总可分配资源）
+    
+    参数:
+        start/end: 时间范围（UTC，默认最近1小时）
+        resolution: raw, 1m, 5m, 1h（默认按时间跨度自动选择）
+    """
+    from app.services.k8s_metrics_service import cluster_series_id
+    
+    if not K8sService.get_cluster(db, cluster_id):
+        raise HTTPException(status_code=404, detail="Cluster not found")
+    return _query_usage(cluster_series_id(cluster_id), start, end, resolution)
+
+
+@router.get("/clusters/{cluster_id}/nodes/{node_id}/usage", response_model=K8sUsageHistory)
+def get_node_usage(
+    cluster_id: int,
+    node_id: int,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    resolution: Optional[str] = None,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_active_user)
+):
+    """获取节点资源使用量历史（参数同集群使用量历史）"""
+    from app.models.kubernetes import K8sNode as K8sNodeModel
+    
+    node = db.query(K8sNodeModel).filter(
+        K8sNodeModel.id == node_id, K8sNodeModel.cluster_id == cluster_id
+    ).first()
+    if not node:
+        raise HTTPException(status_code=404, detail="Node not found")
+    return _query_usage(node_id, start, end, resolution)
+
+
+@router.get("/metrics/collections")
+def get_metrics_collections(
+    limit: int = 10,
+    current_user: User = Depends(get_current_active_user)
+):
+    """获取最近几轮使用量采集的结果"""
+    from app.services.k8s_metrics_service import k8s_metrics_service
+    
+    return k8s_metrics_service.get_stats(limit)
+
+
+@router.get("/health")
+def get_cluster_health(
+    limit: int = 10,
+    current_user: User = Depends(get_current_active_user)
+):
+    """获取后台健康巡检结果（各集群最近一次检查与最近几轮巡检统计）"""
+    from app.services.k8s_health_service import k8s_health_service
+    
+    return {
+        "clusters": k8s_health_service.get_health(),
+        "sweeps": k8s_health_service.get_stats(limit),
+    }
+
+
+@router.get("/informers")
+def get_informer_stats(
+    current_user: User = Depends(get_current_active_user)
+):
+    """获取各集群informer缓存状态（对象数、事件数、重新list次数、最近错误）"""
+    from app.utils.k8s_informer import k8s_informers
+    
+    return k8s_informers.stats()
+
+
+@router.get("/labels/select")
+def select_by_labels(
+    selector: str = Query(..., description="标签选择器，例如 app=web,env in (prod,staging),tier!=canary,!legacy"),
+    kind: str = Query("pods", description="pods 或 namespaces"),
+    cluster_id: Optional[int] = Query(None, description="为空时查询所有集群"),
+    limit: int = Query(500, ge=1, le=5000),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_active_user)
+):
+    """按标签选择器查询Pod/命名空间（基于内存倒排索引，支持跨集群）"""
+    try:
+        return K8sService.select_by_labels(db, kind, selector, cluster_id, limit)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@router.get("/labels/keys")
+def get_label_keys(
+    kind: str = Query("pods", description="pods 或 namespaces"),
+    cluster_id: Optional[int] = None,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_active_user)
+):
+    """获取标签键及带该标签的对象数"""
+    from app.services.k8s_label_index import INDEXED_KINDS, label_index
+    
+    if kind not in INDEXED_KINDS:
+        raise HTTPException(status_code=400, detail=f"kind must be one of {list(INDEXED_KINDS)}")
+    return label_index.label_keys(db, kind, cluster_id)
+
+
 @router.get("/statistics", response_model=K8sClusterStats)
 def get_cluster_statistics(
     db: Session = Depends(get_db),
@@ -444,28 +430,17 @@ def get_pod_logs(
     current_user: User = Depends(get_current_active_user)
 ):
     """获取Pod日志"""
-    from app.utils.k8s_client import K8sClient
+    from app.utils.k8s_client import k8s_clients
     
     cluster = K8sService.get_cluster(db, cluster_id)
     if not cluster:
         raise HTTPException(status_code=404, detail="Cluster not found")
     
-    k8s_client = K8sClient(
-        api_server=cluster.api_server,
-        auth_type=cluster.auth_type,
-        kubeconfig=cluster.kubeconfig,
-        token=cluster.token,
-        ca_cert=cluster.ca_cert,
-        client_cert=cluster.client_cert,
-        client_key=cluster.client_key
-    )
-    
-    success, error_msg = k8s_client.connect()
-    if not success:
+    k8s_client, error_msg = k8s_clients.get(cluster)
+    if k8s_client is None:
         raise HTTPException(status_code=500, detail=error_msg or "Failed to connect to cluster")
     
     logs = k8s_client.get_pod_logs(namespace, pod_name, container, tail_lines)
-    k8s_client.close()
     
     return {"logs": logs}
 
@@ -479,28 +454,17 @@ def delete_pod(
     current_user: User = Depends(get_current_active_user)
 ):
     """删除Pod（会触发重启）"""
-    from app.utils.k8s_client import K8sClient
+    from app.utils.k8s_client import k8s_clients
     
     cluster = K8sService.get_cluster(db, cluster_id)
     if not cluster:
         raise HTTPException(status_code=404, detail="Cluster not found")
     
-    k8s_client = K8sClient(
-        api_server=cluster.api_server,
-        auth_type=cluster.auth_type,
-        kubeconfig=cluster.kubeconfig,
-        token=cluster.token,
-        ca_cert=cluster.ca_cert,
-        client_cert=cluster.client_cert,
-        client_key=cluster.client_key
-    )
-    
-    success, error_msg = k8s_client.connect()
-    if not success:
+    k8s_client, error_msg = k8s_clients.get(cluster)
+    if k8s_client is None:
         raise HTTPException(status_code=500, detail=error_msg or "Failed to connect to cluster")
     
     success = k8s_client.delete_pod(namespace, pod_name)
-    k8s_client.close()
     
     if not success:
         raise HTTPException(status_code=500, detail="Failed to delete pod")
@@ -508,6 +472,66 @@ def delete_pod(
     return {"message": "Pod deleted successfully"}
 
 
+@router.get("/clusters/{cluster_id}/pods/{namespace}/{pod_name}/logs/stream")
+def stream_pod_logs(
+    cluster_id: int,
+    namespace: str,
+    pod_name: str,
+    container: Optional[str] = None,
+    follow: bool = Query(False, description="持续跟随新日志"),
+    since_seconds: Optional[int] = Query(None, ge=1, description="只返回最近N秒的日志"),
+    tail_lines: Optional[int] = Query(None, ge=1, description="只返回最后N行"),
+    limit_bytes: Optional[int] = Query(None, ge=1, description="最多返回的字节数（过滤后）"),
+    grep: Optional[str] = Query(None, description="只返回包含该内容的行"),
+    regex: bool = Query(False, description="grep按正则表达式匹配"),
+    ignore_case: bool = Query(False, description="忽略大小写"),
+    timestamps: bool = False,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_active_user)
+):
+    """
+    流式获取Pod日志（分块传输，text/plain）
+    
+    日志行从K8s日志流到达后立即转发，客户端读取慢时上游读取随之暂停，
+    服务端不缓存完整日志。follow=true时持续推送，直到客户端断开或长时间无新日志。
+    """
+    from app.utils.k8s_client import k8s_clients
+    from kubernetes.client.rest import ApiException
+    
+    cluster = K8sService.get_cluster(db, cluster_id)
+    if not cluster:
+        raise HTTPException(status_code=404, detail="Cluster not found")
+    
+    try:
+        matcher = K8sService.build_log_matcher(grep, regex, ignore_case)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    k8s_client, error_msg = k8s_clients.get(cluster)
+    if k8s_client is None:
+        raise HTTPException(status_code=500, detail=error_msg or "Failed to connect to cluster")
+    
+    try:
+        lines = k8s_client.stream_pod_logs(
+            namespace, pod_name, container,
+            follow=follow,
+            since_seconds=since_seconds,
+            tail_lines=tail_lines,
+            # 不过滤时由API Server截断，过滤时在本地按输出字节数截断
+            limit_bytes=limit_bytes if matcher is None else None,
+            timestamps=timestamps
+        )
+    except ApiException as e:
+        raise HTTPException(status_code=e.status or 500, detail=f"获取日志失败: {e.reason}")
+    
+    return StreamingResponse(
+        K8sService.filter_log_lines(lines, matcher, limit_bytes),
+        media_type="text/plain; charset=utf-8",
+        # 禁止反向代理缓冲，保证实时输出
+        headers={"X-Accel-Buffering": "no", "Cache-Control": "no-cache"}
+    )
+
+
 # Deployment管理接口
 @router.get("/clusters/{cluster_id}/deployments")
 def get_deployments(
@@ -517,30 +541,25 @@ def get_deployments(
     current_user: User = Depends(get_current_active_user)
 ):
     """获取Deployment列表"""
-    from app.utils.k8s_client import K8sClient
+    from app.utils.k8s_client import k8s_clients
     
     cluster = K8sService.get_cluster(db, cluster_id)
     if not cluster:
         raise HTTPException(status_code=404, detail="Cluster not found")
     
-    k8s_client = K8sClient(
-        api_server=cluster.api_server,
-        auth_type=cluster.auth_type,
-        kubeconfig=cluster.kubeconfig,
-        token=cluster.token,
-        ca_cert=cluster.ca_cert,
-        client_cert=cluster.client_cert,
-        client_key=cluster.client_key
-    )
+    # 优先读取informer缓存（只启动Deployment的informer）
+    informers = K8sService._get_informers(cluster, ("deployments",))
+    if informers is not None and informers.is_synced('deployments'):
+        return informers.store('deployments').list(namespace=namespace)
     
-    success, error_msg = k8s_client.connect()
-    if not success:
+    k8s_client, error_msg = k8s_clients.get(cluster)
+    if k8s_client is None:
         raise HTTPException(status_code=500, detail=error_msg or "Failed to connect to cluster")
     
-    deployments = k8s_client.list_deployments(namespace)
-    k8s_client.close()
-    
-    return deployments
+    try:
+        return list(k8s_client.list_deployments(namespace, raw=True))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"获取Deployment列表失败: {str(e)}")
 
 
 @router.post("/clusters/{cluster_id}/deployments/{namespace}/{deployment_name}/scale")
@@ -553,31 +572,75 @@ def scale_deployment(
     current_user: User = Depends(get_current_active_user)
 ):
     """伸缩Deployment"""
-    from app.utils.k8s_client import K8sClient
+    from app.utils.k8s_client import k8s_clients
     
     cluster = K8sService.get_cluster(db, cluster_id)
     if not cluster:
         raise HTTPException(status_code=404, detail="Cluster not found")
     
-    k8s_client = K8sClient(
-        api_server=cluster.api_server,
-        auth_type=cluster.auth_type,
-        kubeconfig=cluster.kubeconfig,
-        token=cluster.token,
-        ca_cert=cluster.ca_cert,
-        client_cert=cluster.client_cert,
-        client_key=cluster.client_key
-    )
-    
-    success, error_msg = k8s_client.connect()
-    if not success:
+    k8s_client, error_msg = k8s_clients.get(cluster)
+    if k8s_client is None:
         raise HTTPException(status_code=500, detail=error_msg or "Failed to connect to cluster")
     
     success = k8s_client.scale_deployment(namespace, deployment_name, replicas)
-    k8s_client.close()
     
     if not success:
         raise HTTPException(status_code=500, detail="Failed to scale deployment")
     
     return {"message": f"Deployment scaled to {replicas} replicas"}
 
+
+@router.post("/deployments/batch")
+def batch_deployment_action(
+    request: K8sDeploymentBatchAction,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_active_user)
+):
+    """
+    批量伸缩/重启Deployment（可跨命名空间和集群）
+    
+    目标由targets和label_selector共同决定，并发执行，每个目标一次PATCH。
+    结果以NDJSON逐行返回：plan、每个目标的result（按完成顺序）、summary；
+    标签选择失败的集群或目标数超限时返回error行
+    """
+    import json
+    from app.services.k8s_batch_service import k8s_batch_service
+    from app.services.k8s_label_index import parse_selector
+    
+    if request.action == "scale" and request.replicas is None:
+        raise HTTPException(status_code=400, detail="scale操作必须指定replicas")
+    if not request.targets and not request.label_selector:
+        raise HTTPException(status_code=400, detail="必须指定targets或label_selector")
+    if len(request.targets) > k8s_batch_service.max_targets:
+        raise HTTPException(status_code=400, detail=f"单次最多操作{k8s_batch_service.max_targets}个Deployment")
+    if request.label_selector:
+        try:
+            parse_selector(request.label_selector)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+    
+    # 标签选择未限定集群时作用于全部启用的集群
+    if request.label_selector and request.cluster_ids is None:
+        clusters = k8s_batch_service.load_clusters(db, None)
+        clusters.update(k8s_batch_service.load_clusters(db, [t.cluster_id for t in request.targets]))
+    else:
+        cluster_ids = {t.cluster_id for t in request.targets} | set(request.cluster_ids or [])
+        clusters = k8s_batch_service.load_clusters(db, list(cluster_ids))
+    selector_cluster_ids = request.cluster_ids
+    if request.label_selector and selector_cluster_ids is None:
+        selector_cluster_ids = [cid for cid, cluster in clusters.items() if cluster.is_active]
+    
+    events = k8s_batch_service.run(
+        clusters,
+        request.action,
+        replicas=request.replicas,
+        targets=[(t.cluster_id, t.namespace, t.name) for t in request.targets],
+        label_selector=request.label_selector,
+        selector_cluster_ids=selector_cluster_ids,
+        namespace=request.namespace
+    )
+    return StreamingResponse(
+        (json.dumps(event, ensure_ascii=False) + "\n" for event in events),
+        media_type="application/x-ndjson",
+        headers={"X-Accel-Buffering": "no", "Cache-Control": "no-cache"}
+    )
@@ -1,9 +1,11 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, Header, HTTPException, Query
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
-from typing import List
+from typing import List, Optional
 from app.core.database import get_db
-from app.schemas.script import Script, ScriptCreate, ScriptExecution, ScriptExecutionCreate
+from app.schemas.script import Script, ScriptCreate, ScriptExecution, ScriptExecutionCreate, ScriptExecutionDetail
 from app.schemas.user import User
+from app.services.execution_output_service import ExecutionOutputService
 from app.services.script_service import ScriptService
 from app.utils.dependencies import get_current_active_user
 
@@ -71,7 +73,7 @@ def delete_script(
     return {"message": "Script deleted successfully"}
 
 
-@router.post("/execute", response_model=ScriptExecution)
+@router.post("/execute", response_model=ScriptExecutionDetail)
 def execute_script(
     execution: ScriptExecutionCreate,
     db: Session = Depends(get_db),
@@ -86,7 +88,75 @@ def execute_script(
     )
     if not result:
         raise HTTPException(status_code=404, detail="Script or server not found")
-    return result
+    return _with_output(db, result)
+
+
+@router.post("/execute/stream")
+def execute_script_stream(
+    execution: ScriptExecutionCreate,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_active_user)
+):
+    """
+    执行脚本并实时返回输出（Server-Sent Events）
+    
+    事件依次为：start（执行记录ID）、stdout/stderr（输出片段，按到达顺序）、
+    dropped（客户端读取过慢时被跳过的实时输出字节数，完整输出仍可通过执行记录获取）、
+    end（状态、退出码、输出大小、是否截断）；长时间无输出时发送注释行心跳
+    """
+    import json
+    
+    record = ScriptService.start_execution(db, execution.script_id, execution.server_id, current_user.id)
+    if not record:
+        raise HTTPException(status_code=404, detail="Script or server not found")
+    execution_id = record.id
+    
+    def events():
+        yield f"event: start\ndata: {json.dumps({'execution_id': execution_id})}\n\n"
+        for event, data in ScriptService.stream_execution(execution_id):
+            if event == "keepalive":
+                yield ": keepalive\n\n"
+            elif event == "output":
+                yield f"event: {data['stream']}\ndata: {json.dumps({'text': data['text']}, ensure_ascii=False)}\n\n"
+            else:
+                yield f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+    
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"X-Accel-Buffering": "no", "Cache-Control": "no-cache"}
+    )
+
+
+@router.get("/executions/{execution_id}/output")
+def get_execution_output(
+    execution_id: int,
+    stream: str = Query("stdout", description="stdout 或 stderr"),
+    range_header: Optional[str] = Header(None, alias="Range"),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_active_user)
+):
+    """
+    下载执行的完整输出，支持Range请求（例如 Range: bytes=-65536 只取最后64KB）
+    
+    超出保存上限的输出从落盘文件返回，否则返回压缩存储的内容
+    """
+    import os
+    from app.utils.http_range import bytes_reader, file_reader, range_response
+    from app.utils.output_capture import STREAM_SUFFIXES, spill_path
+    
+    if stream not in STREAM_SUFFIXES:
+        raise HTTPException(status_code=400, detail=f"stream must be one of {list(STREAM_SUFFIXES)}")
+    record = ScriptService.get_execution(db, execution_id)
+    if not record:
+        raise HTTPException(status_code=404, detail="Execution not found")
+    
+    filename = f"script_{execution_id}_{stream}.log"
+    path = spill_path(record.output_path, stream)
+    if path and os.path.exists(path):
+        return range_response(range_header, os.path.getsize(path), file_reader(path), filename=filename)
+    data = ExecutionOutputService.load(db, "script", execution_id, stream) or b""
+    return range_response(range_header, len(data), bytes_reader(data), filename=filename)
 
 
 @router.get("/executions/list", response_model=List[ScriptExecution])
@@ -100,7 +170,7 @@ def get_executions(
     return ScriptService.get_executions(db, skip=skip, limit=limit)
 
 
-@router.get("/executions/{execution_id}", response_model=ScriptExecution)
+@router.get("/executions/{execution_id}", response_model=ScriptExecutionDetail)
 def get_execution(
     execution_id: int,
     db: Session = Depends(get_db),
@@ -110,5 +180,11 @@ def get_execution(
     execution = ScriptService.get_execution(db, execution_id)
     if not execution:
         raise HTTPException(status_code=404, detail="Execution not found")
-    return execution
+    return _with_output(db, execution)
+
+
+def _with_output(db: Session, execution) -> ScriptExecutionDetail:
+    """执行记录 + 解压后的输出"""
+    output, error = ExecutionOutputService.texts(db, "script", execution.id)
+    return ScriptExecutionDetail(**ScriptExecution.model_validate(execution).model_dump(), output=output, error=error)
 
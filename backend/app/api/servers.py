@@ -1,8 +1,10 @@
 from fastapi import APIRouter, Depends, HTTPException
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
-from typing import List
+from typing import List, Optional
+from datetime import datetime
 from app.core.database import get_db
-from app.schemas.server import Server, ServerCreate, ServerUpdate, ServerStatus
+from app.schemas.server import Server, ServerCreate, ServerUpdate, ServerStatus, ServerMetrics, ServerCommandFanout
 from app.schemas.user import User
 from app.services.server_service import ServerService
 from app.utils.dependencies import get_current_active_user
@@ -21,6 +23,61 @@ def get_servers(
     return ServerService.get_servers(db, skip=skip, limit=limit)
 
 
+@router.get("/monitoring/stats")
+def get_monitoring_stats(
+    limit: int = 10,
+    current_user: User = Depends(get_current_active_user)
+):
+    """获取最近几轮监控巡检的统计信息（主机数、p50/p99延迟、超时数）"""
+    from app.services.monitor_service import monitor_service
+    from app.utils.ssh_pool import ssh_pool
+    
+    return {
+        "sweeps": monitor_service.get_stats(limit),
+        "ssh_pool": ssh_pool.stats()
+    }
+
+
+@router.post("/execute")
+def execute_command_fanout(
+    request: ServerCommandFanout,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_active_user)
+):
+    """
+    在多台服务器上并发执行命令（Server-Sent Events）
+    
+    事件依次为：start（目标主机数）、host（每台主机的结果，按完成顺序）、
+    summary（退出码分布、成功/失败/超时数、耗时分位数）
+    """
+    import json
+    from app.services.command_service import command_service
+    
+    if not (request.server_ids or request.name_pattern or request.status or request.os_type):
+        raise HTTPException(status_code=400, detail="必须指定server_ids或筛选条件（name_pattern、status、os_type）")
+    
+    servers = command_service.select_servers(
+        db,
+        server_ids=request.server_ids,
+        name_pattern=request.name_pattern,
+        status=request.status,
+        os_type=request.os_type
+    )
+    if not servers:
+        raise HTTPException(status_code=404, detail="没有匹配的服务器")
+    
+    def events():
+        yield f"event: start\ndata: {json.dumps({'total': len(servers)})}\n\n"
+        for event in command_service.run(servers, request.command, request.timeout, request.max_parallel):
+            yield f"event: {event['type']}\ndata: {json.dumps(event, ensure_ascii=False)}\n\n"
+    
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"X-Accel-Buffering": "no", "Cache-Control": "no-cache"}
+    )
+
+
 @router.get("/{server_id}", response_model=Server)
 def get_server(
     server_id: int,
@@ -108,6 +165,44 @@ def get_server_status(
     return status
 
 
+@router.get("/{server_id}/metrics", response_model=ServerMetrics)
+def get_server_metrics(
+    server_id: int,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    resolution: Optional[str] = None,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_active_user)
+):
+    """
+    获取服务器资源历史
+    
+    参数:
+        start/end: 时间范围（UTC，默认最近1小时）
+        resolution: raw, 1m, 5m, 1h（默认按时间跨度自动选择）
+    """
+    from app.utils.metrics_store import metrics_store, query_range, RESOLUTION_BY_NAME
+    
+    server = ServerService.get_server(db, server_id)
+    if not server:
+        raise HTTPException(status_code=404, detail="Server not found")
+    
+    if resolution is not None and resolution not in RESOLUTION_BY_NAME:
+        raise HTTPException(status_code=400, detail=f"resolution must be one of {list(RESOLUTION_BY_NAME)}")
+    
+    try:
+        start_ts, end_ts = query_range(start, end)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    return metrics_store.query(
+        server_id,
+        start_ts,
+        end_ts,
+        RESOLUTION_BY_NAME[resolution] if resolution else None
+    )
+
+
 @router.post("/{server_id}/execute")
 def execute_command(
     server_id: int,
@@ -121,7 +216,7 @@ def execute_command(
     参数:
         command: {"command": "ls -la"}
     """
-    from app.utils.ssh_client import SSHClient
+    from app.utils.ssh_pool import ssh_pool
     
     server = ServerService.get_server(db, server_id)
     if not server:
@@ -130,18 +225,10 @@ def execute_command(
     if not command.get('command'):
         raise HTTPException(status_code=400, detail="Command is required")
     
-    ssh = SSHClient(
-        host=server.host,
-        port=server.port,
-        username=server.username,
-        password=server.password,
-        ssh_key=server.ssh_key
-    )
-    
-    if not ssh.connect():
-        raise HTTPException(status_code=500, detail="Failed to connect to server")
-    
-    try:
+    with ssh_pool.connection(server) as ssh:
+        if not ssh:
+            raise HTTPException(status_code=500, detail="Failed to connect to server")
+        
         stdout, stderr, exit_code = ssh.execute_command(command['command'])
         return {
             "success": exit_code == 0,
@@ -149,6 +236,3 @@ def execute_command(
             "stderr": stderr,
             "exit_code": exit_code
         }
-    finally:
-        ssh.close()
-
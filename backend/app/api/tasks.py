@@ -1,4 +1,4 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, Header, HTTPException, Query
 from sqlalchemy.orm import Session
 from typing import List, Optional
 from app.core.database import get_db
@@ -112,3 +112,23 @@ def get_task_executions(
     """获取任务执行记录"""
     return TaskService.get_executions(db, task_id=task_id, skip=skip, limit=limit)
 
+
+@router.get("/executions/{execution_id}/output")
+def get_task_execution_output(
+    execution_id: int,
+    stream: str = Query("stdout", description="stdout 或 stderr"),
+    range_header: Optional[str] = Header(None, alias="Range"),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_active_user)
+):
+    """获取任务执行的输出，支持Range请求"""
+    from app.services.execution_output_service import ExecutionOutputService, LEGACY_COLUMNS
+    from app.utils.http_range import bytes_reader, range_response
+    
+    if stream not in LEGACY_COLUMNS:
+        raise HTTPException(status_code=400, detail=f"stream must be one of {list(LEGACY_COLUMNS)}")
+    if not TaskService.get_execution(db, execution_id):
+        raise HTTPException(status_code=404, detail="Execution not found")
+    
+    data = ExecutionOutputService.load(db, "task", execution_id, stream) or b""
+    return range_response(range_header, len(data), bytes_reader(data), filename=f"task_{execution_id}_{stream}.log")
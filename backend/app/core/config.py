@@ -39,6 +39,77 @@ class Settings(BaseSettings):
     SMTP_PASSWORD: str = ""  # 邮箱密码或应用专用密码
     SMTP_FROM_NAME: str = "运维自动化平台"
     
+    # SSH连接池配置
+    SSH_POOL_MAX_SIZE: int = 500  # 最多缓存的连接数
+    SSH_POOL_IDLE_TTL: int = 300  # 空闲连接回收时间（秒）
+    SSH_POOL_MAX_LIFETIME: int = 3600  # 单个连接最长存活时间（秒）
+    SSH_KEEPALIVE_INTERVAL: int = 30  # keepalive发送间隔（秒）
+    
+    # 服务器监控巡检配置
+    MONITOR_INTERVAL: int = 60  # 巡检间隔（秒）
+    MONITOR_MAX_WORKERS: int = 32  # 并发采集线程数
+    MONITOR_HOST_TIMEOUT: float = 20  # 单台服务器采集期限（秒）
+    MONITOR_JITTER: float = 2.0  # 采集前随机抖动上限（秒）
+    
+    # 脚本执行
+    SCRIPT_TIMEOUT: float = 3600  # 单次脚本执行超时（秒）
+    SCRIPT_OUTPUT_HEAD: int = 65536  # 执行记录中保留的输出开头字节数（stdout/stderr各自）
+    SCRIPT_OUTPUT_TAIL: int = 65536  # 执行记录中保留的输出结尾字节数（stdout/stderr各自）
+    SCRIPT_OUTPUT_DIR: str = "./script_outputs"  # 超出上限的完整输出落盘目录
+    SCRIPT_OUTPUT_RETENTION_DAYS: float = 7  # 落盘输出保留天数
+    SCRIPT_OUTPUT_MAX_BYTES: int = 1024 ** 3  # 落盘输出总大小上限，超出时从最旧的开始删除
+    SCRIPT_STREAM_QUEUE: int = 256  # 实时输出的缓冲块数，客户端读取过慢时丢弃实时块（落盘不受影响）
+    
+    # 批量远程命令执行
+    EXEC_MAX_WORKERS: int = 32  # 同时执行的主机数上限
+    EXEC_HOST_TIMEOUT: float = 60  # 单台主机命令默认超时（秒）
+    EXEC_MAX_OUTPUT: int = 65536  # 每台主机stdout/stderr各自最多返回的字节数
+    
+    # 时序指标存储（独立于业务数据库）
+    METRICS_DB_PATH: str = "./metrics.db"
+    
+    # 告警通知异步投递
+    NOTIFY_WORKERS: int = 4  # 发送线程数
+    NOTIFY_MAX_ATTEMPTS: int = 5  # 最多发送次数，超过后标记为failed
+    NOTIFY_RETRY_BASE: int = 30  # 首次重试间隔（秒），之后按指数退避
+    NOTIFY_RETRY_MAX: int = 1800  # 最长重试间隔（秒）
+    NOTIFY_RATE_PER_MINUTE: int = 20  # 每个目标（邮箱/Webhook）每分钟最多发送数
+    NOTIFY_POLL_INTERVAL: float = 5  # 队列轮询间隔（秒）
+    NOTIFY_CLAIM_LEASE: int = 300  # 通知领取后超过该时间仍未完成视为投递中断，重新排队（秒）
+    SMTP_IDLE_TIMEOUT: int = 60  # SMTP会话空闲多久后断开（秒）
+    
+    # 告警统计缓存时间（秒），0表示不缓存
+    ALERT_STATS_CACHE_TTL: int = 30
+    
+    # K8s informer（list + watch 缓存）
+    K8S_INFORMER_ENABLED: bool = True
+    K8S_WATCH_TIMEOUT: int = 300  # 单次watch请求的服务端超时（秒），到期后从上次的resourceVersion继续
+    K8S_INFORMER_SYNC_TIMEOUT: float = 30  # 等待首次list完成的时间（秒），超时回退到直接list
+    K8S_CONNECTION_POOL_SIZE: int = 16  # 每个集群ApiClient的连接池大小（informer的watch各占一个连接）
+    K8S_LIST_PAGE_SIZE: int = 500  # list接口分页大小（limit），决定单次请求的内存峰值
+    K8S_LOG_FOLLOW_IDLE_TIMEOUT: int = 600  # 跟随日志时无新输出多久（秒）后结束流
+    
+    # K8s集群健康巡检
+    K8S_HEALTH_INTERVAL: int = 30  # 巡检间隔（秒）
+    K8S_HEALTH_MAX_WORKERS: int = 16  # 并发检查线程数
+    K8S_HEALTH_CLUSTER_TIMEOUT: float = 15  # 单集群检查期限（秒）
+    K8S_HEALTH_REQUEST_TIMEOUT: float = 5  # /version、/readyz请求超时（秒）
+    K8S_HEALTH_STAGGER: float = 5  # 各集群检查时间错开的窗口（秒）
+    
+    # K8s资源使用量采集（metrics.k8s.io）
+    K8S_METRICS_INTERVAL: int = 60  # 采集间隔（秒）
+    K8S_METRICS_DB_PATH: str = "./k8s_metrics.db"  # 节点/集群使用量历史的存储文件
+    
+    # K8s集群连接诊断
+    K8S_DIAGNOSE_DEADLINE: float = 10  # 单个集群诊断的整体期限（秒）
+    K8S_DIAGNOSE_MAX_WORKERS: int = 16  # 批量诊断时同时诊断的集群数
+    K8S_DIAGNOSE_CACHE_TTL: float = 30  # DNS解析和TCP连接结果的缓存时间（秒）
+    
+    # K8s批量操作（批量伸缩/重启Deployment）
+    K8S_BATCH_MAX_WORKERS: int = 16  # 单个批量请求的最大并发数
+    K8S_BATCH_REQUEST_TIMEOUT: float = 15  # 单个PATCH请求超时（秒）
+    K8S_BATCH_MAX_TARGETS: int = 500  # 单个批量请求最多操作的Deployment数
+    
     class Config:
         env_file = ".env"
         case_sensitive = True
@@ -30,3 +30,43 @@ def init_db():
     """初始化数据库"""
     Base.metadata.create_all(bind=engine)
 
+    upgrade_schema()
+
+
+def upgrade_schema():
+    """
+    为已存在的表补齐新增列和索引
+    
+    create_all 只会创建缺失的表，不会修改已有表结构；
+    这里对比模型与数据库中的列，按列默认值执行 ALTER TABLE ADD COLUMN，并创建缺失的索引
+    """
+    from sqlalchemy import inspect, text
+    
+    inspector = inspect(engine)
+    existing_tables = set(inspector.get_table_names())
+    
+    with engine.begin() as conn:
+        for table in Base.metadata.sorted_tables:
+            if table.name not in existing_tables:
+                continue
+            existing_columns = {c["name"] for c in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name in existing_columns:
+                    continue
+                column_type = column.type.compile(dialect=engine.dialect)
+                ddl = f"ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}"
+                default = column.default.arg if column.default is not None and column.default.is_scalar else None
+                if isinstance(default, bool):
+                    ddl += f" DEFAULT {int(default)}"
+                elif isinstance(default, (int, float)):
+                    ddl += f" DEFAULT {default}"
+                elif isinstance(default, str):
+                    ddl += " DEFAULT '{}'".format(default.replace("'", "''"))
+                conn.execute(text(ddl))
+                print(f"🛠️  Added column {table.name}.{column.name}")
+            
+            existing_indexes = {i["name"] for i in inspector.get_indexes(table.name)}
+            for index in table.indexes:
+                if index.name not in existing_indexes:
+                    index.create(bind=conn)
+                    print(f"🛠️  Created index {index.name}")
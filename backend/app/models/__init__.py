@@ -2,6 +2,7 @@ from app.models.user import User
 from app.models.server import Server
 from app.models.script import Script, ScriptExecution
 from app.models.task import Task, TaskExecution
+from app.models.execution_output import ExecutionOutput
 from app.models.alert import Alert
 from app.models.log import OperationLog
 from app.models.alert_rule import AlertRule, AlertNotification, AlertSilence
@@ -14,6 +15,7 @@ __all__ = [
     "ScriptExecution",
     "Task",
     "TaskExecution",
+    "ExecutionOutput",
     "Alert",
     "OperationLog",
     "AlertRule",
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, DateTime, Text, Float, Boolean, ForeignKey
+from sqlalchemy import Column, Integer, String, DateTime, Text, Float, Boolean, ForeignKey, Index
 from datetime import datetime
 from app.core.database import Base
 
@@ -6,6 +6,14 @@ from app.core.database import Base
 class Alert(Base):
     """告警模型"""
     __tablename__ = "alerts"
+    __table_args__ = (
+        # 统计/趋势查询按时间范围过滤后分组，覆盖索引避免回表；同时用于列表按时间倒序
+        Index("ix_alerts_stats", "triggered_at", "level", "status", "alert_type", "server_id"),
+        # 按状态筛选的列表
+        Index("ix_alerts_status_triggered", "status", "triggered_at"),
+        # 按服务器查询告警
+        Index("ix_alerts_server_triggered", "server_id", "triggered_at"),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     server_id = Column(Integer, ForeignKey("servers.id"), nullable=False)
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Float, Boolean, ForeignKey, JSON, DateTime
+from sqlalchemy import Column, Integer, String, Float, Boolean, ForeignKey, JSON, DateTime, Index
 from datetime import datetime
 from app.core.database import Base
 
@@ -26,6 +26,10 @@ class AlertRule(Base):
     # 持续时间（秒），连续超过阈值多久才触发
     duration = Column(Integer, default=60)
     
+    # 窗口聚合方式: for(持续超过阈值), avg(窗口平均值), percentile(窗口百分位)
+    aggregation = Column(String(20), default="for")
+    percentile = Column(Float)  # aggregation为percentile时使用，例如95
+    
     # 告警级别
     alert_level = Column(String(20), default="warning")  # info, warning, error, critical
     
@@ -55,6 +59,12 @@ class AlertRule(Base):
 class AlertNotification(Base):
     """告警通知记录"""
     __tablename__ = "alert_notifications"
+    __table_args__ = (
+        # 投递线程领取到期通知
+        Index("ix_alert_notifications_due", "status", "next_attempt_at"),
+        # 按告警查询通知记录
+        Index("ix_alert_notifications_alert", "alert_id", "created_at"),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     
@@ -71,7 +81,14 @@ class AlertNotification(Base):
     recipient = Column(String(500))  # 邮箱地址或webhook URL
     
     # 通知状态
-    status = Column(String(20), default="pending")  # pending, sent, failed
+    status = Column(String(20), default="pending")  # pending, sending, sent, failed, skipped
+    
+    # 已发送次数与下次发送时间（失败后按指数退避重试）
+    attempts = Column(Integer, default=0)
+    next_attempt_at = Column(DateTime)
+    
+    # 领取时间（sending状态的租约起点，超过NOTIFY_CLAIM_LEASE未完成则重新排队）
+    claimed_at = Column(DateTime)
     
     # 错误信息
     error_message = Column(String(1000))
@@ -87,6 +104,9 @@ class AlertNotification(Base):
 class AlertSilence(Base):
     """告警静默记录"""
     __tablename__ = "alert_silences"
+    __table_args__ = (
+        Index("ix_alert_silences_rule_server", "rule_id", "server_id", "silence_until"),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     
@@ -0,0 +1,22 @@
+from sqlalchemy import Column, Integer, BigInteger, String, LargeBinary, Index
+from app.core.database import Base
+
+
+class ExecutionOutput(Base):
+    """执行输出（压缩存储，与执行记录分表，列表查询不会加载）"""
+    __tablename__ = "execution_outputs"
+    __table_args__ = (
+        Index("ix_execution_outputs_owner", "kind", "execution_id", "stream", unique=True),
+    )
+    
+    id = Column(Integer, primary_key=True)
+    kind = Column(String(20), nullable=False)  # script, task
+    execution_id = Column(Integer, nullable=False)
+    stream = Column(String(10), nullable=False)  # stdout, stderr
+    
+    codec = Column(String(10), default="zlib")  # zlib, none
+    size = Column(BigInteger, default=0)  # 解压后的字节数
+    data = Column(LargeBinary)
+    
+    def __repr__(self):
+        return f"<ExecutionOutput {self.kind}:{self.execution_id} {self.stream}>"
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, DateTime, Text, Boolean, JSON, ForeignKey
+from sqlalchemy import BigInteger, Column, Integer, String, DateTime, Text, Boolean, JSON, ForeignKey, Index
 from datetime import datetime
 from app.core.database import Base
 
@@ -39,6 +39,10 @@ class K8sCluster(Base):
     last_check_time = Column(DateTime)
     error_message = Column(Text)
     
+    # 最近一次资源同步
+    last_sync_time = Column(DateTime)
+    last_sync_result = Column(JSON)  # {"pods": {"added": 0, "updated": 0, "deleted": 0, "unchanged": 0}, ...}
+    
     # 标签和分类
     environment = Column(String(50))  # dev, test, staging, prod
     tags = Column(JSON)  # ["tag1", "tag2"]
@@ -56,12 +60,19 @@ class K8sCluster(Base):
 class K8sNode(Base):
     """Kubernetes节点模型"""
     __tablename__ = "k8s_nodes"
+    __table_args__ = (
+        Index("ix_k8s_nodes_cluster_uid", "cluster_id", "uid"),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     
     # 关联集群
     cluster_id = Column(Integer, ForeignKey("k8s_clusters.id"), nullable=False)
     
+    # K8s对象标识（增量同步按uid比对resourceVersion）
+    uid = Column(String(64))
+    resource_version = Column(String(50))
+    
     # 节点信息
     node_name = Column(String(200), nullable=False)
     node_ip = Column(String(100))
@@ -99,12 +110,19 @@ class K8sNode(Base):
 class K8sNamespace(Base):
     """Kubernetes命名空间模型"""
     __tablename__ = "k8s_namespaces"
+    __table_args__ = (
+        Index("ix_k8s_namespaces_cluster_uid", "cluster_id", "uid"),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     
     # 关联集群
     cluster_id = Column(Integer, ForeignKey("k8s_clusters.id"), nullable=False)
     
+    # K8s对象标识
+    uid = Column(String(64))
+    resource_version = Column(String(50))
+    
     # 命名空间信息
     namespace_name = Column(String(200), nullable=False)
     status = Column(String(50))  # Active, Terminating
@@ -130,6 +148,13 @@ class K8sNamespace(Base):
 class K8sPod(Base):
     """Kubernetes Pod模型（简化版，用于监控）"""
     __tablename__ = "k8s_pods"
+    __table_args__ = (
+        Index("ix_k8s_pods_cluster_uid", "cluster_id", "uid"),
+        # 游标分页按 (namespace, pod_name, id) 排序，各过滤条件的索引都以排序列结尾
+        Index("ix_k8s_pods_cluster_ns_name", "cluster_id", "namespace", "pod_name"),
+        Index("ix_k8s_pods_cluster_status_ns_name", "cluster_id", "status", "namespace", "pod_name"),
+        Index("ix_k8s_pods_cluster_node_ns_name", "cluster_id", "node_name", "namespace", "pod_name"),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     
@@ -137,6 +162,10 @@ class K8sPod(Base):
     cluster_id = Column(Integer, ForeignKey("k8s_clusters.id"), nullable=False)
     namespace = Column(String(200), nullable=False)
     
+    # K8s对象标识
+    uid = Column(String(64))
+    resource_version = Column(String(50))
+    
     # Pod信息
     pod_name = Column(String(200), nullable=False)
     node_name = Column(String(200))
@@ -152,6 +181,10 @@ class K8sPod(Base):
     cpu_limit = Column(String(50))
     memory_limit = Column(String(50))
     
+    # 实时使用量（metrics.k8s.io）
+    cpu_usage = Column(Integer)  # 毫核
+    memory_usage = Column(BigInteger)  # 字节
+    
     # IP信息
     pod_ip = Column(String(100))
     host_ip = Column(String(100))
@@ -1,4 +1,5 @@
-from sqlalchemy import Column, Integer, String, DateTime, Text, ForeignKey
+from sqlalchemy import Column, Integer, BigInteger, Boolean, String, DateTime, Text, ForeignKey, Index
+from sqlalchemy.orm import deferred
 from datetime import datetime
 from app.core.database import Base
 
@@ -25,6 +26,11 @@ class Script(Base):
 class ScriptExecution(Base):
     """脚本执行记录"""
     __tablename__ = "script_executions"
+    __table_args__ = (
+        # 执行记录列表按开始时间倒序
+        Index("ix_script_executions_start_time", "start_time"),
+        Index("ix_script_executions_script_start", "script_id", "start_time"),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     script_id = Column(Integer, ForeignKey("scripts.id"), nullable=False)
@@ -34,10 +40,18 @@ class ScriptExecution(Base):
     start_time = Column(DateTime, default=datetime.utcnow)
     end_time = Column(DateTime)
     
-    output = Column(Text)  # 执行输出
-    error = Column(Text)  # 错误信息
+    # 旧版本的未压缩输出；新输出压缩存储在execution_outputs表（超出上限时只保存开头和结尾），
+    # 延迟加载，列表查询不读取
+    output = deferred(Column(Text))
+    error = deferred(Column(Text))
     exit_code = Column(Integer)
     
+    # 完整输出大小；超出上限的完整输出落盘到 output_path + .out/.err
+    output_bytes = Column(BigInteger, default=0)
+    error_bytes = Column(BigInteger, default=0)
+    output_truncated = Column(Boolean, default=False)
+    output_path = Column(String(500))
+    
     executed_by = Column(Integer, ForeignKey("users.id"))
     
     def __repr__(self):
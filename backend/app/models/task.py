@@ -1,4 +1,5 @@
-from sqlalchemy import Column, Integer, String, DateTime, Text, Boolean, ForeignKey
+from sqlalchemy import Column, Integer, String, DateTime, Text, Boolean, ForeignKey, Index
+from sqlalchemy.orm import deferred
 from datetime import datetime
 from app.core.database import Base
 
@@ -39,6 +40,11 @@ class Task(Base):
 class TaskExecution(Base):
     """任务执行记录"""
     __tablename__ = "task_executions"
+    __table_args__ = (
+        # 执行记录列表按开始时间倒序，可按任务筛选
+        Index("ix_task_executions_start_time", "start_time"),
+        Index("ix_task_executions_task_start", "task_id", "start_time"),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     task_id = Column(Integer, ForeignKey("tasks.id"), nullable=False)
@@ -47,8 +53,9 @@ class TaskExecution(Base):
     start_time = Column(DateTime, default=datetime.utcnow)
     end_time = Column(DateTime)
     
-    output = Column(Text)
-    error = Column(Text)
+    # 旧版本的未压缩输出；新输出压缩存储在execution_outputs表，延迟加载，列表查询不读取
+    output = deferred(Column(Text))
+    error = deferred(Column(Text))
     
     def __repr__(self):
         return f"<TaskExecution {self.id} - {self.status}>"
@@ -12,6 +12,8 @@ class AlertRuleBase(BaseModel):
     threshold_value: float = Field(..., description="阈值")
     threshold_operator: str = Field("gt", description="比较操作符: gt, lt, gte, lte, eq")
     duration: int = Field(60, description="持续时间（秒）")
+    aggregation: str = Field("for", description="窗口聚合方式: for, avg, percentile")
+    percentile: Optional[float] = Field(None, description="窗口百分位（aggregation为percentile时使用）")
     alert_level: str = Field("warning", description="告警级别: info, warning, error, critical")
     
     enable_email: bool = Field(False, description="启用邮件通知")
@@ -47,6 +49,21 @@ class AlertRuleBase(BaseModel):
         if v not in allowed:
             raise ValueError(f'alert_level must be one of {allowed}')
         return v
+    
+    @field_validator('aggregation')
+    @classmethod
+    def validate_aggregation(cls, v):
+        allowed = ['for', 'avg', 'percentile']
+        if v not in allowed:
+            raise ValueError(f'aggregation must be one of {allowed}')
+        return v
+    
+    @field_validator('percentile')
+    @classmethod
+    def validate_percentile(cls, v):
+        if v is not None and not 0 < v <= 100:
+            raise ValueError('percentile must be in (0, 100]')
+        return v
 
 
 class AlertRuleCreate(AlertRuleBase):
@@ -63,6 +80,8 @@ class AlertRuleUpdate(BaseModel):
     threshold_value: Optional[float] = None
     threshold_operator: Optional[str] = None
     duration: Optional[int] = None
+    aggregation: Optional[str] = None
+    percentile: Optional[float] = None
     alert_level: Optional[str] = None
     enable_email: Optional[bool] = None
     email_recipients: Optional[List[str]] = None
@@ -102,6 +121,8 @@ class AlertNotification(AlertNotificationBase):
     rule_id: Optional[int]
     status: str
     error_message: Optional[str]
+    attempts: Optional[int] = 0
+    next_attempt_at: Optional[datetime] = None
     sent_at: Optional[datetime]
     created_at: datetime
     
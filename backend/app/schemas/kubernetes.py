@@ -1,4 +1,4 @@
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, field_validator
 from typing import Optional, List, Dict
 from datetime import datetime
 
@@ -52,6 +52,8 @@ class K8sCluster(K8sClusterBase):
     status: str
     last_check_time: Optional[datetime]
     error_message: Optional[str]
+    last_sync_time: Optional[datetime] = None
+    last_sync_result: Optional[Dict[str, Dict[str, int]]] = None
     created_by: Optional[int]
     created_at: datetime
     updated_at: datetime
@@ -144,6 +146,8 @@ class K8sPodBase(BaseModel):
     memory_request: Optional[str]
     cpu_limit: Optional[str]
     memory_limit: Optional[str]
+    cpu_usage: Optional[int] = None  # 毫核
+    memory_usage: Optional[int] = None  # 字节
     pod_ip: Optional[str]
     host_ip: Optional[str]
     restart_count: int = 0
@@ -161,6 +165,64 @@ class K8sPod(K8sPodBase):
     model_config = {"from_attributes": True}
 
 
+class K8sPodListItem(BaseModel):
+    """Pod分页查询的投影列"""
+    id: int
+    namespace: str
+    pod_name: str
+    node_name: Optional[str]
+    status: Optional[str]
+    ready_containers: Optional[int]
+    total_containers: Optional[int]
+    restart_count: Optional[int]
+    pod_ip: Optional[str]
+    cpu_usage: Optional[int]
+    memory_usage: Optional[int]
+    start_time: Optional[datetime]
+    labels: Optional[Dict[str, str]] = None
+
+
+class K8sPodPage(BaseModel):
+    """Pod游标分页结果"""
+    items: List[K8sPodListItem]
+    next_cursor: Optional[str] = None  # 为空表示没有更多数据
+
+
+class K8sUsageHistory(BaseModel):
+    """节点/集群资源使用量历史（列式）"""
+    series_id: int  # 节点ID；集群汇总为负的集群ID
+    resolution: str  # raw, 1m, 5m, 1h
+    timestamps: List[int]  # Unix秒
+    series: Dict[str, List[Optional[float]]]  # cpu/memory为使用率（%），cpu_cores为核，memory_gib为GiB
+
+
+# ==================== K8s 批量操作 ====================
+
+class K8sDeploymentTarget(BaseModel):
+    """批量操作的目标Deployment"""
+    cluster_id: int
+    namespace: str
+    name: str
+
+
+class K8sDeploymentBatchAction(BaseModel):
+    """批量伸缩/重启Deployment（targets与label_selector至少指定一个，结果合并去重）"""
+    action: str = Field(..., description="操作: scale, restart")
+    replicas: Optional[int] = Field(None, ge=0, description="目标副本数（scale时必填）")
+    targets: List[K8sDeploymentTarget] = Field(default_factory=list, description="明确指定的Deployment")
+    label_selector: Optional[str] = Field(None, description="按标签选择Deployment，例如 app=payments,tier!=canary")
+    cluster_ids: Optional[List[int]] = Field(None, description="标签选择的集群范围，为空表示全部启用的集群")
+    namespace: Optional[str] = Field(None, description="标签选择的命名空间范围，为空表示全部")
+    
+    @field_validator('action')
+    @classmethod
+    def validate_action(cls, v):
+        allowed = ['scale', 'restart']
+        if v not in allowed:
+            raise ValueError(f'action must be one of {allowed}')
+        return v
+
+
 # ==================== K8s 统计信息 ====================
 
 class K8sClusterStats(BaseModel):
@@ -42,11 +42,18 @@ class ScriptExecution(BaseModel):
     status: str
     start_time: datetime
     end_time: Optional[datetime] = None
-    output: Optional[str] = None
-    error: Optional[str] = None
     exit_code: Optional[int] = None
     executed_by: Optional[int] = None
+    output_bytes: Optional[int] = None  # 完整stdout字节数
+    error_bytes: Optional[int] = None  # 完整stderr字节数
+    output_truncated: Optional[bool] = None  # output/error是否只包含开头和结尾
     
     class Config:
         from_attributes = True
 
+
+class ScriptExecutionDetail(ScriptExecution):
+    """脚本执行记录详情（含输出，列表接口不返回输出）"""
+    output: Optional[str] = None
+    error: Optional[str] = None
+
@@ -1,5 +1,5 @@
-from pydantic import BaseModel
-from typing import Optional
+from pydantic import BaseModel, Field
+from typing import Optional, List, Dict
 from datetime import datetime
 
 
@@ -60,6 +60,27 @@ class ServerStatus(BaseModel):
     disk_percent: Optional[float] = None
     disk_used: Optional[int] = None
     disk_total: Optional[int] = None
+    load_1: Optional[float] = None
+    load_5: Optional[float] = None
+    load_15: Optional[float] = None
     uptime: Optional[str] = None
     check_time: datetime
 
+
+class ServerMetrics(BaseModel):
+    """服务器资源历史（列式）"""
+    server_id: int
+    resolution: str  # raw, 1m, 5m, 1h
+    timestamps: List[int]  # Unix秒
+    series: Dict[str, List[Optional[float]]]
+
+
+class ServerCommandFanout(BaseModel):
+    """批量执行命令（server_ids与筛选条件可同时指定，取并集；只包含启用的服务器）"""
+    command: str = Field(..., min_length=1, description="要执行的命令")
+    server_ids: Optional[List[int]] = Field(None, description="服务器ID列表")
+    name_pattern: Optional[str] = Field(None, description="按名称或主机地址通配匹配，例如 web-*")
+    status: Optional[str] = Field(None, description="按状态筛选: online, offline, unknown")
+    os_type: Optional[str] = Field(None, description="按操作系统筛选")
+    timeout: Optional[float] = Field(None, gt=0, le=3600, description="单台主机超时（秒）")
+    max_parallel: Optional[int] = Field(None, ge=1, description="并发主机数（不超过EXEC_MAX_WORKERS）")
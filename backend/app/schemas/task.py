@@ -49,8 +49,6 @@ class TaskExecution(BaseModel):
     status: str
     start_time: datetime
     end_time: Optional[datetime] = None
-    output: Optional[str] = None
-    error: Optional[str] = None
     
     class Config:
         from_attributes = True
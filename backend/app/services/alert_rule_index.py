@@ -0,0 +1,195 @@
+"""
+告警规则内存索引
+按 (metric_type, server_id | 全局) 索引已启用的规则，比较操作符预编译为可调用对象；
+静默状态保存在带过期时间的内存映射中。巡检评估时不再逐条查询数据库。
+"""
+import operator
+import threading
+from datetime import datetime
+from typing import Callable, Dict, List, Optional, Tuple
+
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.models.alert_rule import AlertRule, AlertSilence
+from app.services.alert_window import SlidingWindowEvaluator
+
+
+_EPOCH = datetime(1970, 1, 1)
+
+# 预编译比较操作符
+OPERATORS: Dict[str, Callable[[float, float], bool]] = {
+    'gt': operator.gt,
+    'gte': operator.ge,
+    'lt': operator.lt,
+    'lte': operator.le,
+    'eq': lambda v, t: abs(v - t) < 0.001,
+}
+
+
+class CompiledRule:
+    """规则快照（与AlertRule同名属性，可直接用于通知发送）"""
+    
+    __slots__ = (
+        "id", "name", "server_id", "metric_type", "threshold_value", "threshold_operator",
+        "duration", "aggregation", "percentile", "alert_level", "silence_duration", "enable_email", "email_recipients",
+        "enable_webhook", "webhook_url", "webhook_headers", "compare",
+    )
+    
+    def __init__(self, rule: AlertRule):
+        self.id = rule.id
+        self.name = rule.name
+        self.server_id = rule.server_id
+        self.metric_type = rule.metric_type
+        self.threshold_value = rule.threshold_value
+        self.threshold_operator = rule.threshold_operator or 'gt'
+        self.duration = rule.duration or 0
+        self.aggregation = rule.aggregation or 'for'
+        self.percentile = rule.percentile
+        self.alert_level = rule.alert_level
+        self.silence_duration = rule.silence_duration or 0
+        self.enable_email = rule.enable_email
+        self.email_recipients = list(rule.email_recipients or [])
+        self.enable_webhook = rule.enable_webhook
+        self.webhook_url = rule.webhook_url
+        self.webhook_headers = dict(rule.webhook_headers or {})
+        self.compare = OPERATORS.get(self.threshold_operator, OPERATORS['gt'])
+    
+    def matches(self, value: float) -> bool:
+        return self.compare(value, self.threshold_value)
+    
+    @property
+    def window_label(self) -> str:
+        """窗口条件描述，用于告警内容"""
+        if self.duration <= 0:
+            return ""
+        if self.aggregation == 'avg':
+            return f"{self.duration}秒平均"
+        if self.aggregation == 'percentile':
+            return f"{self.duration}秒P{self.percentile or 95:g}"
+        return f"持续{self.duration}秒"
+
+
+class AlertRuleIndex:
+    """告警规则索引与静默状态"""
+    
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._loaded = False
+        self._rules: Dict[int, CompiledRule] = {}
+        # (metric_type, server_id或None) -> 规则列表
+        self._index: Dict[Tuple[str, Optional[int]], Tuple[CompiledRule, ...]] = {}
+        # (rule_id, server_id) -> 静默结束时间
+        self._silences: Dict[Tuple[int, int], datetime] = {}
+        # 按规则的duration评估最近采样
+        self._windows = SlidingWindowEvaluator(
+            max_gap=settings.MONITOR_INTERVAL * 3,
+            slack=settings.MONITOR_JITTER + 1
+        )
+    
+    def ensure_loaded(self, db: Session):
+        """首次使用时从数据库加载规则与未过期的静默记录"""
+        if self._loaded:
+            return
+        self.reload(db)
+    
+    def reload(self, db: Session):
+        """全量重建索引"""
+        rules = db.query(AlertRule).filter(AlertRule.is_active == True).all()
+        now = datetime.utcnow()
+        silences = db.query(AlertSilence).filter(AlertSilence.silence_until > now).all()
+        
+        with self._lock:
+            self._rules = {rule.id: CompiledRule(rule) for rule in rules}
+            self._silences = {(s.rule_id, s.server_id): s.silence_until for s in silences}
+            self._rebuild()
+            self._loaded = True
+    
+    def _rebuild(self):
+        """根据规则表重建索引（需持有锁）"""
+        index: Dict[Tuple[str, Optional[int]], List[CompiledRule]] = {}
+        for rule in self._rules.values():
+            index.setdefault((rule.metric_type, rule.server_id), []).append(rule)
+        self._index = {key: tuple(rules) for key, rules in index.items()}
+    
+    def upsert(self, rule: AlertRule):
+        """规则新增或修改后增量更新；停用的规则从索引移除"""
+        with self._lock:
+            if not self._loaded:
+                return
+            old = self._rules.pop(rule.id, None)
+            if rule.is_active:
+                self._rules[rule.id] = CompiledRule(rule)
+            elif old is None:
+                return
+            # 规则变更后清除其静默状态
+            if old is not None and (old.server_id, old.metric_type) != (rule.server_id, rule.metric_type):
+                self._drop_silences(rule.id)
+            self._rebuild()
+        self._windows.drop_rule(rule.id)
+    
+    def remove(self, rule_id: int):
+        """规则删除后增量更新"""
+        with self._lock:
+            if self._rules.pop(rule_id, None) is not None:
+                self._rebuild()
+            self._drop_silences(rule_id)
+        self._windows.drop_rule(rule_id)
+    
+    def remove_server(self, server_id: int):
+        """服务器删除后清除其静默状态和窗口状态"""
+        with self._lock:
+            for key in [k for k in self._silences if k[1] == server_id]:
+                del self._silences[key]
+        self._windows.drop_server(server_id)
+    
+    def _drop_silences(self, rule_id: int):
+        for key in [k for k in self._silences if k[0] == rule_id]:
+            del self._silences[key]
+    
+    def rules_for(self, server_id: int, metric_type: str) -> Tuple[CompiledRule, ...]:
+        """获取适用于指定服务器和指标的规则（服务器专属 + 全局）"""
+        index = self._index
+        return index.get((metric_type, server_id), ()) + index.get((metric_type, None), ())
+    
+    def is_silenced(self, rule_id: int, server_id: int, now: Optional[datetime] = None) -> bool:
+        """检查规则是否在静默期"""
+        until = self._silences.get((rule_id, server_id))
+        if until is None:
+            return False
+        if until > (now or datetime.utcnow()):
+            return True
+        # 惰性清理过期静默
+        with self._lock:
+            if self._silences.get((rule_id, server_id)) == until:
+                del self._silences[(rule_id, server_id)]
+        return False
+    
+    def set_silence(self, rule_id: int, server_id: int, until: datetime):
+        """记录静默结束时间"""
+        with self._lock:
+            self._silences[(rule_id, server_id)] = until
+    
+    def evaluate(self, server_id: int, metrics: Dict[str, float],
+                 now: Optional[datetime] = None) -> List[Tuple[CompiledRule, str, float]]:
+        """
+        评估一台服务器的全部指标
+        
+        每条采样都会写入规则的滑动窗口（静默期内也写入，保证窗口连续）
+        
+        Returns:
+            [(规则, 指标类型, 观测值)]，已排除处于静默期的规则
+        """
+        now = now or datetime.utcnow()
+        ts = (now - _EPOCH).total_seconds()
+        matched = []
+        for metric_type, value in metrics.items():
+            for rule in self.rules_for(server_id, metric_type):
+                observed = self._windows.observe(rule, server_id, ts, value)
+                if observed is not None and not self.is_silenced(rule.id, server_id, now):
+                    matched.append((rule, metric_type, observed))
+        return matched
+
+
+# 全局规则索引实例
+alert_rule_index = AlertRuleIndex()
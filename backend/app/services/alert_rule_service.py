@@ -1,10 +1,18 @@
 from sqlalchemy.orm import Session
 from sqlalchemy import func, and_, or_
 from typing import List, Optional, Dict
+from collections import defaultdict
 from datetime import datetime, timedelta
+from app.core.config import settings
 from app.models.alert_rule import AlertRule, AlertSilence, AlertNotification
 from app.models.alert import Alert
 from app.schemas.alert_rule import AlertRuleCreate, AlertRuleUpdate, AlertStatistics, AlertTrend
+from app.services.alert_rule_index import alert_rule_index, OPERATORS
+from app.utils.ttl_cache import TTLCache
+
+
+# 仪表盘统计结果缓存
+_stats_cache = TTLCache(ttl=settings.ALERT_STATS_CACHE_TTL)
 
 
 class AlertRuleService:
@@ -40,6 +48,7 @@ class AlertRuleService:
         db.add(db_rule)
         db.commit()
         db.refresh(db_rule)
+        alert_rule_index.upsert(db_rule)
         return db_rule
     
     @staticmethod
@@ -56,6 +65,7 @@ class AlertRuleService:
         db_rule.updated_at = datetime.utcnow()
         db.commit()
         db.refresh(db_rule)
+        alert_rule_index.upsert(db_rule)
         return db_rule
     
     @staticmethod
@@ -67,19 +77,13 @@ class AlertRuleService:
         
         db.delete(db_rule)
         db.commit()
+        alert_rule_index.remove(rule_id)
         return True
     
     @staticmethod
     def check_value_against_rule(value: float, threshold: float, operator: str) -> bool:
         """检查值是否满足规则条件"""
-        operators = {
-            'gt': lambda v, t: v > t,
-            'gte': lambda v, t: v >= t,
-            'lt': lambda v, t: v < t,
-            'lte': lambda v, t: v <= t,
-            'eq': lambda v, t: abs(v - t) < 0.001,
-        }
-        return operators.get(operator, operators['gt'])(value, threshold)
+        return OPERATORS.get(operator, OPERATORS['gt'])(value, threshold)
     
     @staticmethod
     def is_silenced(db: Session, rule_id: int, server_id: int) -> bool:
@@ -97,6 +101,7 @@ class AlertRuleService:
     def set_silence(db: Session, rule_id: int, server_id: int, duration: int):
         """设置静默期"""
         silence_until = datetime.utcnow() + timedelta(seconds=duration)
+        alert_rule_index.set_silence(rule_id, server_id, silence_until)
         
         # 检查是否已存在静默记录
         silence = db.query(AlertSilence).filter(
@@ -138,137 +143,88 @@ class AlertRuleService:
     
     @staticmethod
     def get_alert_statistics(db: Session, days: int = 7) -> AlertStatistics:
-        """获取告警统计信息"""
+        """获取告警统计信息（单次分组扫描，结果短时缓存）"""
+        return _stats_cache.get_or_set(
+            ("overview", days),
+            lambda: AlertRuleService._compute_alert_statistics(db, days)
+        )
+    
+    @staticmethod
+    def _compute_alert_statistics(db: Session, days: int) -> AlertStatistics:
         start_date = datetime.utcnow() - timedelta(days=days)
         
-        # 基础统计
-        total_alerts = db.query(func.count(Alert.id)).filter(
-            Alert.triggered_at >= start_date
-        ).scalar()
-        
-        open_alerts = db.query(func.count(Alert.id)).filter(
-            and_(Alert.status == "open", Alert.triggered_at >= start_date)
-        ).scalar()
-        
-        acknowledged_alerts = db.query(func.count(Alert.id)).filter(
-            and_(Alert.status == "acknowledged", Alert.triggered_at >= start_date)
-        ).scalar()
-        
-        resolved_alerts = db.query(func.count(Alert.id)).filter(
-            and_(Alert.status == "resolved", Alert.triggered_at >= start_date)
-        ).scalar()
-        
-        # 按级别统计
-        critical_alerts = db.query(func.count(Alert.id)).filter(
-            and_(Alert.level == "critical", Alert.triggered_at >= start_date)
-        ).scalar()
-        
-        error_alerts = db.query(func.count(Alert.id)).filter(
-            and_(Alert.level == "error", Alert.triggered_at >= start_date)
-        ).scalar()
-        
-        warning_alerts = db.query(func.count(Alert.id)).filter(
-            and_(Alert.level == "warning", Alert.triggered_at >= start_date)
-        ).scalar()
-        
-        info_alerts = db.query(func.count(Alert.id)).filter(
-            and_(Alert.level == "info", Alert.triggered_at >= start_date)
-        ).scalar()
-        
-        # 按类型统计
-        alerts_by_type = {}
-        type_results = db.query(
-            Alert.alert_type, func.count(Alert.id)
+        # 一次扫描按 (级别, 状态, 类型, 服务器) 分组，其余维度在内存中汇总
+        rows = db.query(
+            Alert.level, Alert.status, Alert.alert_type, Alert.server_id, func.count(Alert.id)
         ).filter(
             Alert.triggered_at >= start_date
-        ).group_by(Alert.alert_type).all()
-        
-        for alert_type, count in type_results:
-            alerts_by_type[alert_type] = count
+        ).group_by(
+            Alert.level, Alert.status, Alert.alert_type, Alert.server_id
+        ).all()
         
-        # 按服务器统计
-        alerts_by_server = {}
-        server_results = db.query(
-            Alert.server_id, func.count(Alert.id)
-        ).filter(
-            Alert.triggered_at >= start_date
-        ).group_by(Alert.server_id).all()
+        total_alerts = 0
+        by_status: Dict[str, int] = defaultdict(int)
+        by_level: Dict[str, int] = defaultdict(int)
+        alerts_by_type: Dict[str, int] = defaultdict(int)
+        alerts_by_server: Dict[str, int] = defaultdict(int)
         
-        for server_id, count in server_results:
-            alerts_by_server[str(server_id)] = count
+        for level, status, alert_type, server_id, count in rows:
+            total_alerts += count
+            by_status[status] += count
+            by_level[level] += count
+            alerts_by_type[alert_type] += count
+            alerts_by_server[str(server_id)] += count
         
         return AlertStatistics(
-            total_alerts=total_alerts or 0,
-            open_alerts=open_alerts or 0,
-            acknowledged_alerts=acknowledged_alerts or 0,
-            resolved_alerts=resolved_alerts or 0,
-            critical_alerts=critical_alerts or 0,
-            error_alerts=error_alerts or 0,
-            warning_alerts=warning_alerts or 0,
-            info_alerts=info_alerts or 0,
-            alerts_by_type=alerts_by_type,
-            alerts_by_server=alerts_by_server
+            total_alerts=total_alerts,
+            open_alerts=by_status["open"],
+            acknowledged_alerts=by_status["acknowledged"],
+            resolved_alerts=by_status["resolved"],
+            critical_alerts=by_level["critical"],
+            error_alerts=by_level["error"],
+            warning_alerts=by_level["warning"],
+            info_alerts=by_level["info"],
+            alerts_by_type=dict(alerts_by_type),
+            alerts_by_server=dict(alerts_by_server)
         )
     
     @staticmethod
     def get_alert_trends(db: Session, days: int = 7) -> List[AlertTrend]:
-        """获取告警趋势"""
-        start_date = datetime.utcnow() - timedelta(days=days)
+        """获取告警趋势（按自然日，单次分组扫描，结果短时缓存）"""
+        return _stats_cache.get_or_set(
+            ("trends", days),
+            lambda: AlertRuleService._compute_alert_trends(db, days)
+        )
+    
+    @staticmethod
+    def _compute_alert_trends(db: Session, days: int) -> List[AlertTrend]:
+        today = datetime.utcnow().date()
+        first_day = today - timedelta(days=days - 1)
+        start_date = datetime.combine(first_day, datetime.min.time())
+        
+        day = func.date(Alert.triggered_at)
+        rows = db.query(
+            day, Alert.level, func.count(Alert.id)
+        ).filter(
+            Alert.triggered_at >= start_date
+        ).group_by(day, Alert.level).all()
+        
+        # 日期 -> 级别 -> 数量（SQLite返回字符串，其他数据库返回date）
+        buckets: Dict[str, Dict[str, int]] = defaultdict(lambda: defaultdict(int))
+        for bucket_day, level, count in rows:
+            buckets[str(bucket_day)[:10]][level] += count
         
-        # 按日期分组统计
         trends = []
         for i in range(days):
-            date = start_date + timedelta(days=i)
-            next_date = date + timedelta(days=1)
-            
-            # 当天总告警数
-            count = db.query(func.count(Alert.id)).filter(
-                and_(
-                    Alert.triggered_at >= date,
-                    Alert.triggered_at < next_date
-                )
-            ).scalar() or 0
-            
-            # 按级别统计
-            critical = db.query(func.count(Alert.id)).filter(
-                and_(
-                    Alert.triggered_at >= date,
-                    Alert.triggered_at < next_date,
-                    Alert.level == "critical"
-                )
-            ).scalar() or 0
-            
-            error = db.query(func.count(Alert.id)).filter(
-                and_(
-                    Alert.triggered_at >= date,
-                    Alert.triggered_at < next_date,
-                    Alert.level == "error"
-                )
-            ).scalar() or 0
-            
-            warning = db.query(func.count(Alert.id)).filter(
-                and_(
-                    Alert.triggered_at >= date,
-                    Alert.triggered_at < next_date,
-                    Alert.level == "warning"
-                )
-            ).scalar() or 0
-            
-            info = db.query(func.count(Alert.id)).filter(
-                and_(
-                    Alert.triggered_at >= date,
-                    Alert.triggered_at < next_date,
-                    Alert.level == "info"
-                )
-            ).scalar() or 0
-            
+            date = (first_day + timedelta(days=i)).strftime('%Y-%m-%d')
+            levels = buckets.get(date, {})
             trends.append(AlertTrend(
-                date=date.strftime('%Y-%m-%d'),
-                count=count,
-                critical=critical,
-                error=error,
-                warning=warning,
-                info=info
+                date=date,
+                count=sum(levels.values()),
+                critical=levels.get("critical", 0),
+                error=levels.get("error", 0),
+                warning=levels.get("warning", 0),
+                info=levels.get("info", 0)
             ))
         
         return trends
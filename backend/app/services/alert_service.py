@@ -78,45 +78,34 @@ class AlertService:
             触发的告警列表
         """
         from app.services.alert_rule_service import AlertRuleService
+        from app.services.alert_rule_index import alert_rule_index
         from app.services.notification_service import NotificationService
         
         alerts = []
         
-        # 遍历所有指标
-        for metric_type, current_value in metrics.items():
-            # 获取适用的规则
-            rules = AlertRuleService.get_applicable_rules(db, server_id, metric_type)
+        # 规则与静默状态均在内存索引中评估，不逐条查询数据库
+        alert_rule_index.ensure_loaded(db)
+        
+        for rule, metric_type, current_value in alert_rule_index.evaluate(server_id, metrics):
+            # 创建告警
+            alert = AlertCreate(
+                server_id=server_id,
+                alert_type=metric_type,
+                level=rule.alert_level,
+                title=f"{rule.name}",
+                message=f"{metric_type.upper()}使用率{rule.window_label}达到 {current_value}%，超过阈值 {rule.threshold_value}%",
+                current_value=current_value,
+                threshold_value=rule.threshold_value
+            )
+            
+            db_alert = AlertService.create_alert(db, alert)
+            alerts.append(db_alert)
+            
+            # 发送通知
+            NotificationService.send_notification_by_rule(db, db_alert, rule)
             
-            for rule in rules:
-                # 检查是否在静默期
-                if AlertRuleService.is_silenced(db, rule.id, server_id):
-                    continue
-                
-                # 检查值是否满足规则条件
-                if AlertRuleService.check_value_against_rule(
-                    current_value, 
-                    rule.threshold_value, 
-                    rule.threshold_operator
-                ):
-                    # 创建告警
-                    alert = AlertCreate(
-                        server_id=server_id,
-                        alert_type=metric_type,
-                        level=rule.alert_level,
-                        title=f"{rule.name}",
-                        message=f"{metric_type.upper()}使用率达到 {current_value}%，超过阈值 {rule.threshold_value}%",
-                        current_value=current_value,
-                        threshold_value=rule.threshold_value
-                    )
-                    
-                    db_alert = AlertService.create_alert(db, alert)
-                    alerts.append(db_alert)
-                    
-                    # 发送通知
-                    NotificationService.send_notification_by_rule(db, db_alert, rule)
-                    
-                    # 设置静默期
-                    AlertRuleService.set_silence(db, rule.id, server_id, rule.silence_duration)
+            # 设置静默期
+            AlertRuleService.set_silence(db, rule.id, server_id, rule.silence_duration)
         
         return alerts
     
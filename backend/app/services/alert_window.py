@@ -0,0 +1,124 @@
+"""
+告警规则滑动窗口评估
+为每个 (规则, 服务器) 维护最近采样，按规则的 duration 判断是否触发：
+- for: 连续超过阈值达到 duration 秒
+- avg: duration 秒窗口内的平均值满足阈值条件
+- percentile: duration 秒窗口内的百分位数满足阈值条件
+每条采样的更新都是常数时间（均摊）
+"""
+import math
+import threading
+from collections import deque
+from typing import Dict, Optional, Tuple
+
+
+# 百分位直方图精度：0.1
+_BIN_SCALE = 10
+
+
+class _WindowState:
+    """单个 (规则, 服务器) 的窗口状态"""
+    
+    __slots__ = ("started", "last_ts", "breach_since", "samples", "total", "bins")
+    
+    def __init__(self, ts: float):
+        # 当前连续采样序列的起点，出现采样中断时重置
+        self.started = ts
+        self.last_ts = ts
+        self.breach_since: Optional[float] = None
+        self.samples: deque = deque()
+        self.total = 0.0
+        # 稀疏直方图 {值*10: 次数}，用于窗口百分位
+        self.bins: Dict[int, int] = {}
+    
+    def push(self, ts: float, value: float):
+        self.samples.append((ts, value))
+        self.total += value
+        key = round(value * _BIN_SCALE)
+        self.bins[key] = self.bins.get(key, 0) + 1
+    
+    def evict_before(self, cutoff: float):
+        samples = self.samples
+        while samples and samples[0][0] < cutoff:
+            _, value = samples.popleft()
+            self.total -= value
+            key = round(value * _BIN_SCALE)
+            remaining = self.bins[key] - 1
+            if remaining:
+                self.bins[key] = remaining
+            else:
+                del self.bins[key]
+    
+    def average(self) -> float:
+        return self.total / len(self.samples)
+    
+    def percentile(self, pct: float) -> float:
+        rank = max(1, math.ceil(pct / 100 * len(self.samples)))
+        seen = 0
+        for key in sorted(self.bins):
+            seen += self.bins[key]
+            if seen >= rank:
+                return key / _BIN_SCALE
+        return max(self.bins) / _BIN_SCALE
+
+
+class SlidingWindowEvaluator:
+    """滑动窗口评估器"""
+    
+    def __init__(self, max_gap: float, slack: float = 0):
+        # 相邻采样间隔超过max_gap视为中断（主机离线等），窗口重新开始
+        self.max_gap = max_gap
+        # 采样时间存在抖动，判断窗口是否覆盖duration时允许的误差
+        self.slack = slack
+        self._lock = threading.Lock()
+        self._states: Dict[Tuple[int, int], _WindowState] = {}
+    
+    def observe(self, rule, server_id: int, ts: float, value: float) -> Optional[float]:
+        """
+        写入一条采样并评估规则
+        
+        Returns:
+            满足触发条件时返回观测值（for为当前值，avg/percentile为窗口聚合值），否则None
+        """
+        key = (rule.id, server_id)
+        with self._lock:
+            state = self._states.get(key)
+            if state is None or ts < state.last_ts or ts - state.last_ts > self.max_gap:
+                state = self._states[key] = _WindowState(ts)
+            state.last_ts = ts
+            
+            duration = rule.duration
+            if rule.aggregation == 'for' or duration <= 0:
+                if not rule.matches(value):
+                    state.breach_since = None
+                    return None
+                if state.breach_since is None:
+                    state.breach_since = ts
+                if ts - state.breach_since + self.slack >= duration:
+                    return value
+                return None
+            
+            state.push(ts, value)
+            state.evict_before(ts - duration)
+            
+            # 窗口尚未覆盖完整的duration
+            if ts - state.started + self.slack < duration:
+                return None
+            
+            if rule.aggregation == 'percentile':
+                observed = state.percentile(rule.percentile or 95)
+            else:
+                observed = round(state.average(), 2)
+            return observed if rule.matches(observed) else None
+    
+    def drop_rule(self, rule_id: int):
+        """规则变更或删除后清除其窗口状态"""
+        with self._lock:
+            for key in [k for k in self._states if k[0] == rule_id]:
+                del self._states[key]
+    
+    def drop_server(self, server_id: int):
+        """清除服务器的窗口状态"""
+        with self._lock:
+            for key in [k for k in self._states if k[1] == server_id]:
+                del self._states[key]
@@ -0,0 +1,158 @@
+"""
+批量远程命令执行
+在多台服务器上并发执行同一命令：有界线程池 + SSH连接池复用长连接，每台主机独立超时，
+结果按完成顺序逐台返回，最后汇总退出码分布和耗时
+"""
+import fnmatch
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Any, Dict, Iterator, List, Optional
+
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.models.server import Server
+from app.services.monitor_service import percentile
+from app.utils.ssh_pool import ssh_pool
+
+
+class CommandService:
+    """批量命令执行服务"""
+    
+    def __init__(self, max_workers: int = 32, host_timeout: float = 60, max_output: int = 65536):
+        self.max_workers = max_workers
+        self.host_timeout = host_timeout
+        self.max_output = max_output
+    
+    @staticmethod
+    def select_servers(
+        db: Session,
+        server_ids: Optional[List[int]] = None,
+        name_pattern: Optional[str] = None,
+        status: Optional[str] = None,
+        os_type: Optional[str] = None
+    ) -> List[Server]:
+        """
+        选择目标服务器（只包含启用的），并与会话分离供工作线程使用
+        
+        server_ids与筛选条件（name_pattern、status、os_type）取并集；
+        多个筛选条件之间取交集，name_pattern同时匹配名称和主机地址
+        """
+        selected: Dict[int, Server] = {}
+        base = db.query(Server).filter(Server.is_active == True)
+        
+        if server_ids:
+            for server in base.filter(Server.id.in_(server_ids)):
+                selected[server.id] = server
+        
+        if name_pattern or status or os_type:
+            query = base
+            if status:
+                query = query.filter(Server.status == status)
+            if os_type:
+                query = query.filter(Server.os_type == os_type)
+            for server in query:
+                if name_pattern and not (
+                    fnmatch.fnmatchcase(server.name, name_pattern) or fnmatch.fnmatchcase(server.host, name_pattern)
+                ):
+                    continue
+                selected[server.id] = server
+        
+        servers = sorted(selected.values(), key=lambda s: s.id)
+        for server in servers:
+            db.expunge(server)
+        return servers
+    
+    def _run_on_host(self, server: Server, command: str, timeout: float) -> Dict[str, Any]:
+        """在单台主机上执行命令，不抛出异常"""
+        started = time.monotonic()
+        result: Dict[str, Any] = {
+            "type": "host",
+            "server_id": server.id,
+            "server_name": server.name,
+            "host": server.host,
+            "success": False,
+            "exit_code": None,
+            "stdout": "",
+            "stderr": "",
+        }
+        try:
+            with ssh_pool.connection(server) as ssh:
+                if not ssh:
+                    result["error"] = "连接失败"
+                else:
+                    stdout, stderr, exit_code = ssh.execute_command(
+                        command, timeout=timeout, max_output=self.max_output
+                    )
+                    result.update(stdout=stdout, stderr=stderr, exit_code=exit_code, success=exit_code == 0)
+                    if exit_code == -1 and time.monotonic() - started >= timeout:
+                        result["error"] = "执行超时"
+        except Exception as e:
+            result["error"] = f"{type(e).__name__}: {str(e)}"
+        result["duration_ms"] = round((time.monotonic() - started) * 1000)
+        return result
+    
+    def run(
+        self,
+        servers: List[Server],
+        command: str,
+        timeout: Optional[float] = None,
+        max_parallel: Optional[int] = None
+    ) -> Iterator[Dict[str, Any]]:
+        """
+        并发执行，逐台产出结果（type=host，按完成顺序），最后产出汇总（type=summary）：
+        {"total", "succeeded", "failed", "timeouts", "connect_failures", "exit_codes",
+         "p50_ms", "p99_ms", "max_ms", "slowest", "duration_ms"}
+        
+        调用方停止迭代（如客户端断开）时，尚未开始的主机不再执行
+        """
+        timeout = timeout or self.host_timeout
+        workers = min(max_parallel or self.max_workers, self.max_workers, max(len(servers), 1))
+        started = time.monotonic()
+        executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="cmd-fanout")
+        try:
+            futures = [executor.submit(self._run_on_host, server, command, timeout) for server in servers]
+            exit_codes: Dict[str, int] = {}
+            durations: List[float] = []
+            succeeded = timeouts = connect_failures = 0
+            slowest = None
+            for future in as_completed(futures):
+                result = future.result()
+                durations.append(result["duration_ms"])
+                if slowest is None or result["duration_ms"] > slowest["duration_ms"]:
+                    slowest = {"server_id": result["server_id"], "duration_ms": result["duration_ms"]}
+                if result["success"]:
+                    succeeded += 1
+                if result.get("error") == "执行超时":
+                    timeouts += 1
+                elif result.get("error") == "连接失败":
+                    connect_failures += 1
+                if result["exit_code"] is not None:
+                    key = str(result["exit_code"])
+                    exit_codes[key] = exit_codes.get(key, 0) + 1
+                yield result
+            
+            yield {
+                "type": "summary",
+                "total": len(servers),
+                "succeeded": succeeded,
+                "failed": len(servers) - succeeded,
+                "timeouts": timeouts,
+                "connect_failures": connect_failures,
+                "exit_codes": exit_codes,
+                "p50_ms": percentile(durations, 50),
+                "p99_ms": percentile(durations, 99),
+                "max_ms": max(durations) if durations else None,
+                "slowest": slowest,
+                "duration_ms": round((time.monotonic() - started) * 1000),
+            }
+        finally:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+
+# 全局批量命令执行实例
+command_service = CommandService(
+    max_workers=settings.EXEC_MAX_WORKERS,
+    host_timeout=settings.EXEC_HOST_TIMEOUT,
+    max_output=settings.EXEC_MAX_OUTPUT
+)
@@ -0,0 +1,167 @@
+"""
+执行输出存储
+脚本/任务执行的stdout和stderr压缩后存放在execution_outputs表，与执行记录分开：
+执行记录列表不再加载输出，查看输出时按需读取并解压。
+旧版本保存在执行记录Text列中的输出读取时自动回退，并可由migrate_legacy分批迁移。
+"""
+import zlib
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import or_
+from sqlalchemy.orm import Session
+
+from app.core.database import SessionLocal
+from app.models.execution_output import ExecutionOutput
+from app.models.script import ScriptExecution
+from app.models.task import TaskExecution
+
+
+# 执行记录类型 -> 模型
+EXECUTION_MODELS = {"script": ScriptExecution, "task": TaskExecution}
+
+# 输出流 -> 执行记录中的旧列
+LEGACY_COLUMNS = {"stdout": "output", "stderr": "error"}
+
+# 小于该字节数的输出不压缩
+COMPRESS_MIN_BYTES = 128
+
+ZLIB_LEVEL = 6
+
+
+def _encode(raw: bytes) -> Tuple[str, bytes]:
+    if len(raw) < COMPRESS_MIN_BYTES:
+        return "none", raw
+    return "zlib", zlib.compress(raw, ZLIB_LEVEL)
+
+
+def _decode(row: ExecutionOutput) -> bytes:
+    if row.codec == "zlib":
+        return zlib.decompress(row.data)
+    return row.data or b""
+
+
+class ExecutionOutputService:
+    """执行输出服务"""
+    
+    @staticmethod
+    def _row(db: Session, kind: str, execution_id: int, stream: str) -> Optional[ExecutionOutput]:
+        return db.query(ExecutionOutput).filter(
+            ExecutionOutput.kind == kind,
+            ExecutionOutput.execution_id == execution_id,
+            ExecutionOutput.stream == stream
+        ).first()
+    
+    @staticmethod
+    def _put(db: Session, kind: str, execution_id: int, stream: str, raw: bytes):
+        row = ExecutionOutputService._row(db, kind, execution_id, stream)
+        if row is None:
+            row = ExecutionOutput(kind=kind, execution_id=execution_id, stream=stream)
+            db.add(row)
+        row.codec, row.data = _encode(raw)
+        row.size = len(raw)
+    
+    @staticmethod
+    def save(db: Session, kind: str, execution_id: int,
+             stdout: Optional[str] = None, stderr: Optional[str] = None):
+        """压缩保存输出（覆盖已有内容，为None的流不修改；不提交）"""
+        for stream, text in (("stdout", stdout), ("stderr", stderr)):
+            if text is not None:
+                ExecutionOutputService._put(db, kind, execution_id, stream, text.encode("utf-8"))
+    
+    @staticmethod
+    def load(db: Session, kind: str, execution_id: int, stream: str) -> Optional[bytes]:
+        """读取解压后的输出，没有时返回None"""
+        row = ExecutionOutputService._row(db, kind, execution_id, stream)
+        if row is not None:
+            return _decode(row)
+        
+        model = EXECUTION_MODELS[kind]
+        legacy = db.query(getattr(model, LEGACY_COLUMNS[stream])).filter(model.id == execution_id).scalar()
+        return legacy.encode("utf-8") if legacy is not None else None
+    
+    @staticmethod
+    def load_text(db: Session, kind: str, execution_id: int, stream: str) -> Optional[str]:
+        data = ExecutionOutputService.load(db, kind, execution_id, stream)
+        return data.decode("utf-8", errors="replace") if data is not None else None
+    
+    @staticmethod
+    def texts(db: Session, kind: str, execution_id: int) -> Tuple[Optional[str], Optional[str]]:
+        """(stdout, stderr)"""
+        return (
+            ExecutionOutputService.load_text(db, kind, execution_id, "stdout"),
+            ExecutionOutputService.load_text(db, kind, execution_id, "stderr"),
+        )
+    
+    @staticmethod
+    def copy(db: Session, src_kind: str, src_id: int, dst_kind: str, dst_id: int):
+        """复制另一条执行记录的输出（压缩数据直接复制，不重新压缩；不提交）"""
+        for stream in LEGACY_COLUMNS:
+            row = ExecutionOutputService._row(db, src_kind, src_id, stream)
+            if row is None:
+                raw = ExecutionOutputService.load(db, src_kind, src_id, stream)
+                if raw is not None:
+                    ExecutionOutputService._put(db, dst_kind, dst_id, stream, raw)
+                continue
+            target = ExecutionOutputService._row(db, dst_kind, dst_id, stream)
+            if target is None:
+                target = ExecutionOutput(kind=dst_kind, execution_id=dst_id, stream=stream)
+                db.add(target)
+            target.codec, target.size, target.data = row.codec, row.size, row.data
+    
+    @staticmethod
+    def delete(db: Session, kind: str, execution_ids: List[int]):
+        """删除执行记录的输出（不提交）"""
+        db.query(ExecutionOutput).filter(
+            ExecutionOutput.kind == kind, ExecutionOutput.execution_id.in_(execution_ids)
+        ).delete(synchronize_session=False)
+    
+    @staticmethod
+    def migrate_legacy(batch_size: int = 200) -> Dict[str, int]:
+        """
+        把旧版本保存在执行记录中的未压缩输出分批迁移到execution_outputs，并清空旧列
+        
+        每批在一个事务内完成，中断后可重复执行；释放的磁盘空间需要数据库自行回收（如VACUUM）
+        
+        Returns:
+            各类型迁移的执行记录数
+        """
+        migrated: Dict[str, int] = {}
+        db = SessionLocal()
+        try:
+            for kind, model in EXECUTION_MODELS.items():
+                migrated[kind] = 0
+                while True:
+                    rows = db.query(model.id, model.output, model.error).filter(
+                        or_(model.output.isnot(None), model.error.isnot(None))
+                    ).order_by(model.id).limit(batch_size).all()
+                    if not rows:
+                        break
+                    
+                    mappings = []
+                    for execution_id, output, error in rows:
+                        for stream, text in (("stdout", output), ("stderr", error)):
+                            if text is None:
+                                continue
+                            raw = text.encode("utf-8")
+                            codec, data = _encode(raw)
+                            mappings.append({
+                                "kind": kind, "execution_id": execution_id, "stream": stream,
+                                "codec": codec, "size": len(raw), "data": data,
+                            })
+                    ids = [row[0] for row in rows]
+                    # 新版本不再写入旧列，插入和清空旧列在同一事务内，已迁移的记录不会重复出现
+                    db.bulk_insert_mappings(ExecutionOutput, mappings)
+                    db.query(model).filter(model.id.in_(ids)).update(
+                        {model.output: None, model.error: None}, synchronize_session=False
+                    )
+                    db.commit()
+                    migrated[kind] += len(rows)
+                
+                if migrated[kind]:
+                    print(f"🗜️  Migrated {migrated[kind]} {kind} execution outputs to compressed storage")
+        except Exception as e:
+            db.rollback()
+            print(f"❌ Execution output migration failed: {str(e)}")
+        finally:
+            db.close()
+        return migrated
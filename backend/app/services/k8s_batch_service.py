@@ -0,0 +1,180 @@
+"""
+K8s Deployment批量操作
+按目标列表或标签选择器批量伸缩/重启Deployment（可跨命名空间和集群）：
+复用k8s_clients缓存的集群客户端，有界线程池并发执行，每个目标只发一次PATCH（不先读取），
+结果按完成顺序逐条返回，调用方可以边执行边输出
+"""
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from kubernetes.client.rest import ApiException
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.utils.k8s_client import K8sClient, k8s_clients
+
+
+# (集群ID, 命名空间, 名称)
+Target = Tuple[int, str, str]
+
+
+def _describe_error(e: Exception) -> str:
+    if isinstance(e, ApiException):
+        return K8sClient._describe_api_error(e)
+    return f"{type(e).__name__}: {str(e)}"
+
+
+class K8sBatchService:
+    """Deployment批量操作服务"""
+    
+    def __init__(self, max_workers: int = 16, request_timeout: float = 15, max_targets: int = 500):
+        self.max_workers = max_workers
+        self.request_timeout = request_timeout
+        self.max_targets = max_targets
+    
+    @staticmethod
+    def load_clusters(db: Session, cluster_ids: Optional[List[int]]) -> Dict[int, Any]:
+        """
+        加载涉及的集群并与会话分离（流式执行期间不再访问数据库）
+        
+        Args:
+            cluster_ids: 为None时加载全部启用的集群
+        """
+        from app.models.kubernetes import K8sCluster
+        
+        query = db.query(K8sCluster)
+        if cluster_ids is None:
+            query = query.filter(K8sCluster.is_active == True)
+        else:
+            query = query.filter(K8sCluster.id.in_(cluster_ids))
+        clusters = {}
+        for cluster in query.all():
+            db.expunge(cluster)
+            clusters[cluster.id] = cluster
+        return clusters
+    
+    @staticmethod
+    def _get_client(cluster) -> K8sClient:
+        if cluster is None:
+            raise RuntimeError("集群不存在")
+        if not cluster.is_active:
+            raise RuntimeError("集群已停用")
+        k8s_client, error_msg = k8s_clients.get(cluster)
+        if k8s_client is None:
+            raise RuntimeError(error_msg or "连接失败")
+        return k8s_client
+    
+    def _select(self, cluster, label_selector: str, namespace: Optional[str]) -> List[Target]:
+        """在集群中按标签选择Deployment（由API Server过滤，一次list）"""
+        k8s_client = self._get_client(cluster)
+        return [
+            (cluster.id, deploy['namespace'], deploy['name'])
+            for deploy in k8s_client.list_deployments(namespace, raw=True, label_selector=label_selector)
+        ]
+    
+    def _apply(self, cluster, target: Target, action: str, replicas: Optional[int]) -> Dict[str, Any]:
+        """对单个目标执行操作，不抛出异常"""
+        cluster_id, namespace, name = target
+        started = time.monotonic()
+        result: Dict[str, Any] = {
+            "type": "result",
+            "cluster_id": cluster_id,
+            "namespace": namespace,
+            "name": name,
+            "success": False,
+        }
+        try:
+            k8s_client = self._get_client(cluster)
+            if action == "scale":
+                result.update(k8s_client.patch_deployment_replicas(
+                    namespace, name, replicas, timeout=self.request_timeout
+                ))
+            else:
+                result.update(k8s_client.restart_deployment(namespace, name, timeout=self.request_timeout))
+            result["success"] = True
+        except Exception as e:
+            result["error"] = _describe_error(e)
+        result["duration_ms"] = round((time.monotonic() - started) * 1000)
+        return result
+    
+    def run(
+        self,
+        clusters: Dict[int, Any],
+        action: str,
+        replicas: Optional[int] = None,
+        targets: Optional[List[Target]] = None,
+        label_selector: Optional[str] = None,
+        selector_cluster_ids: Optional[List[int]] = None,
+        namespace: Optional[str] = None
+    ) -> Iterator[Dict[str, Any]]:
+        """
+        执行批量操作，逐条产出事件：
+        
+        - {"type": "error", ...}      标签选择失败的集群，或目标数超限（此时不执行任何操作）
+        - {"type": "plan", "total"}   去重后的目标数
+        - {"type": "result", ...}     每个目标的结果（按完成顺序）
+        - {"type": "summary", ...}    汇总
+        
+        Args:
+            clusters: 集群ID -> 已分离的集群对象（load_clusters的返回值）
+            selector_cluster_ids: 标签选择的集群范围，为None时为clusters中的全部集群
+        """
+        started = time.monotonic()
+        executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="k8s-batch")
+        try:
+            planned: Dict[Target, None] = dict.fromkeys(targets or [])
+            
+            # 标签选择：每个集群一次list，并发执行
+            if label_selector:
+                scope = selector_cluster_ids if selector_cluster_ids is not None else list(clusters)
+                futures = {
+                    executor.submit(self._select, clusters.get(cluster_id), label_selector, namespace): cluster_id
+                    for cluster_id in scope
+                }
+                for future in as_completed(futures):
+                    try:
+                        planned.update(dict.fromkeys(future.result()))
+                    except Exception as e:
+                        yield {"type": "error", "cluster_id": futures[future], "error": _describe_error(e)}
+            
+            if len(planned) > self.max_targets:
+                yield {
+                    "type": "error",
+                    "error": f"匹配到{len(planned)}个Deployment，超过单次上限{self.max_targets}，未执行任何操作",
+                }
+                return
+            yield {"type": "plan", "action": action, "total": len(planned)}
+            
+            succeeded = failed = 0
+            futures = [
+                executor.submit(self._apply, clusters.get(target[0]), target, action, replicas)
+                for target in planned
+            ]
+            for future in as_completed(futures):
+                result = future.result()
+                if result["success"]:
+                    succeeded += 1
+                else:
+                    failed += 1
+                yield result
+            
+            yield {
+                "type": "summary",
+                "action": action,
+                "total": len(planned),
+                "succeeded": succeeded,
+                "failed": failed,
+                "duration_ms": round((time.monotonic() - started) * 1000),
+            }
+        finally:
+            # 客户端断开时取消尚未开始的操作
+            executor.shutdown(wait=False, cancel_futures=True)
+
+
+# 全局批量操作实例
+k8s_batch_service = K8sBatchService(
+    max_workers=settings.K8S_BATCH_MAX_WORKERS,
+    request_timeout=settings.K8S_BATCH_REQUEST_TIMEOUT,
+    max_targets=settings.K8S_BATCH_MAX_TARGETS
+)
@@ -0,0 +1,323 @@
+"""
+K8s集群连接诊断
+配置类检查（地址格式、认证配置）在本地立即完成；网络检查（DNS解析 -> TCP连接）与API检查
+（建立客户端 -> /version、/readyz）并发执行，整体受期限约束，超过期限的检查记为超时，不再等待。
+DNS和TCP结果按主机/端口短暂缓存，并发诊断同一地址时共享同一次探测。
+"""
+import socket
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor, TimeoutError as FutureTimeout, as_completed, wait
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+from urllib.parse import urlparse
+
+from app.core.config import settings
+from app.utils.k8s_client import k8s_clients
+from app.utils.k8s_informer import k8s_informers
+
+
+class _ProbeCache:
+    """
+    按键缓存探测结果（包括失败）ttl秒；探测在首个请求的线程中执行，
+    进行中的探测被并发请求共享，其他请求只在自己的期限内等待
+    """
+    
+    def __init__(self, ttl: float):
+        self._ttl = ttl
+        self._lock = threading.Lock()
+        self._entries: Dict[Any, Tuple[float, Future]] = {}
+    
+    def run(self, key, timeout: float, func, *args):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            owner = entry is None or (entry[1].done() and entry[0] <= now)
+            if owner:
+                future = Future()
+                self._entries[key] = (now + self._ttl, future)
+                # 顺便清理过期项
+                if len(self._entries) > 1024:
+                    self._entries = {k: v for k, v in self._entries.items() if not v[1].done() or v[0] > now}
+            else:
+                future = entry[1]
+        if owner:
+            try:
+                future.set_result(func(*args))
+            except Exception as e:
+                future.set_exception(e)
+        return future.result(timeout=max(0.0, timeout))
+
+
+def _check(name: str, status: str, message: str, started: Optional[float] = None) -> Dict[str, Any]:
+    check = {"name": name, "status": status, "message": message}
+    if started is not None:
+        check["duration_ms"] = round((time.monotonic() - started) * 1000)
+    return check
+
+
+def _resolve(host: str, port: int) -> List[str]:
+    """解析主机地址（在工作线程中执行，getaddrinfo本身没有超时）"""
+    infos = socket.getaddrinfo(host, port, type=socket.SOCK_STREAM)
+    return list(dict.fromkeys(info[4][0] for info in infos))
+
+
+class K8sDiagnosisService:
+    """集群连接诊断服务"""
+    
+    def __init__(self, max_workers: int = 16, deadline: float = 10, cache_ttl: float = 30,
+                 request_timeout: float = 5):
+        self.max_workers = max_workers
+        self.deadline = deadline
+        self.request_timeout = request_timeout
+        # 每个诊断同时占用两个检查线程（网络、API），检查线程池按诊断并发数的两倍配置，
+        # 批量诊断时不会因检查线程耗尽而互相等待
+        self._executor = ThreadPoolExecutor(max_workers=max_workers * 2, thread_name_prefix="k8s-diagnose")
+        self._dns = _ProbeCache(cache_ttl)
+        self._tcp = _ProbeCache(cache_ttl)
+    
+    @staticmethod
+    def _check_address(cluster) -> Tuple[List[Dict[str, Any]], Optional[Tuple[str, int]], List[str]]:
+        """检查API Server地址格式，返回 (检查项, (主机, 端口), 建议)"""
+        if not cluster.api_server:
+            return [_check("API Server地址", "fail", "API Server地址未配置")], None, ["请配置API Server地址"]
+        try:
+            parsed = urlparse(cluster.api_server)
+            if not (parsed.scheme and parsed.netloc and parsed.hostname):
+                return (
+                    [_check("API Server地址格式", "fail", "地址格式不正确，应该类似: https://x.x.x.x:6443")],
+                    None,
+                    ["请检查API Server地址格式"],
+                )
+            port = parsed.port or (443 if parsed.scheme == 'https' else 80)
+        except Exception as e:
+            return [_check("API Server地址格式", "error", str(e))], None, []
+        checks = [_check("API Server地址格式", "pass", f"格式正确: {parsed.scheme}://{parsed.netloc}")]
+        return checks, (parsed.hostname, port), []
+    
+    @staticmethod
+    def _check_auth(cluster) -> Tuple[List[Dict[str, Any]], bool, List[str]]:
+        """检查认证配置，返回 (检查项, 配置是否完整, 建议)"""
+        if cluster.auth_type == "kubeconfig":
+            if cluster.kubeconfig:
+                return [_check("认证配置", "pass", f"使用kubeconfig认证 (长度: {len(cluster.kubeconfig)} 字符)")], True, []
+            return [_check("认证配置", "fail", "kubeconfig内容为空")], False, ["请提供完整的kubeconfig文件内容"]
+        
+        if cluster.auth_type == "token":
+            if not cluster.token:
+                return [_check("认证配置", "fail", "Token为空")], False, ["请提供有效的Bearer Token"]
+            checks = [_check("认证配置", "pass", f"使用Token认证 (长度: {len(cluster.token)} 字符)")]
+            recommendations = []
+            if not cluster.ca_cert:
+                checks.append(_check("SSL证书", "warning", "未提供CA证书，将跳过SSL验证（不推荐用于生产环境）"))
+                recommendations.append("建议配置CA证书以提高安全性")
+            return checks, True, recommendations
+        
+        if cluster.auth_type == "cert":
+            missing = [
+                label for label, value in (
+                    ("CA证书", cluster.ca_cert), ("客户端证书", cluster.client_cert), ("客户端密钥", cluster.client_key)
+                ) if not value
+            ]
+            if not missing:
+                return [_check("认证配置", "pass", "证书认证配置完整")], True, []
+            return (
+                [_check("认证配置", "fail", f"缺少: {', '.join(missing)}")],
+                False,
+                [f"请提供完整的证书认证配置: {', '.join(missing)}"],
+            )
+        
+        return [_check("认证配置", "fail", f"不支持的认证类型: {cluster.auth_type}")], False, []
+    
+    def _connect_tcp(self, host: str, port: int, addresses: List[str], deadline: float) -> Tuple[str, str]:
+        """依次尝试连接解析出的地址，返回 (状态, 说明)"""
+        errors = []
+        for address in addresses:
+            timeout = min(self.request_timeout, deadline - time.monotonic())
+            if timeout <= 0:
+                break
+            try:
+                with socket.create_connection((address, port), timeout=timeout):
+                    return "pass", f"可以访问 {host}:{port}（{address}）"
+            except OSError as e:
+                errors.append(f"{address}: {e.strerror or type(e).__name__}")
+        return "fail", f"无法连接到 {host}:{port}" + (f"（{'; '.join(errors)}）" if errors else "")
+    
+    def _check_network(self, host: str, port: int, deadline: float) -> List[Dict[str, Any]]:
+        """DNS解析 -> TCP连接"""
+        started = time.monotonic()
+        try:
+            addresses = self._dns.run(host, deadline - started, _resolve, host, port)
+        except socket.gaierror as e:
+            return [_check("DNS解析", "fail", f"无法解析 {host}: {e.strerror or str(e)}", started)]
+        except FutureTimeout:
+            return [_check("DNS解析", "timeout", f"解析 {host} 超过诊断期限", started)]
+        checks = [_check("DNS解析", "pass", f"{host} -> {', '.join(addresses[:4])}", started)]
+        
+        started = time.monotonic()
+        try:
+            status, message = self._tcp.run(
+                (host, port), deadline - started, self._connect_tcp, host, port, addresses, deadline
+            )
+        except FutureTimeout:
+            status, message = "timeout", f"连接 {host}:{port} 超过诊断期限"
+        checks.append(_check("网络连通性", status, message, started))
+        return checks
+    
+    def _check_api(self, cluster) -> List[Dict[str, Any]]:
+        """建立（或复用）客户端，检查/version和/readyz，资源数取自informer缓存或最近一次同步"""
+        started = time.monotonic()
+        k8s_client, error_msg = k8s_clients.get(cluster)
+        if k8s_client is None:
+            return [_check("K8s API连接", "fail", error_msg or "连接失败", started)]
+        
+        health = k8s_client.check_health(self.request_timeout)
+        if not health["live"]:
+            return [_check("K8s API连接", "fail", health["error"] or "连接失败", started)]
+        checks = [
+            _check("K8s API连接", "pass", "成功连接到Kubernetes集群", started),
+            _check("集群版本", "pass", f"Kubernetes {health['version']}"),
+        ]
+        if health["ready"] is False:
+            checks.append(_check("API Server就绪状态", "warning", health["error"]))
+        
+        informers = k8s_informers.peek(cluster.id, ("nodes", "namespaces", "pods"))
+        if informers is not None:
+            counts = {kind: len(informers.store(kind)) for kind in ("nodes", "namespaces", "pods")}
+            source = "informer缓存"
+        else:
+            counts = {"nodes": cluster.node_count, "namespaces": cluster.namespace_count, "pods": cluster.pod_count}
+            source = "最近一次同步"
+        checks.append(_check(
+            "资源统计", "pass",
+            f"节点: {counts['nodes']}, 命名空间: {counts['namespaces']}, Pod: {counts['pods']}（{source}）"
+        ))
+        return checks
+    
+    @staticmethod
+    def _recommend_for_error(error_msg: str) -> str:
+        """根据API连接错误给出建议"""
+        if "401" in error_msg or "认证失败" in error_msg:
+            return "认证失败：请检查Token或证书是否正确、是否过期"
+        if "403" in error_msg or "权限" in error_msg:
+            return "权限不足：请确保账号有足够的RBAC权限（至少需要list namespace的权限）"
+        if "timeout" in error_msg.lower() or "超时" in error_msg:
+            return "连接超时：请检查网络连接和防火墙设置"
+        if "certificate" in error_msg.lower():
+            return "证书问题：请检查CA证书是否正确"
+        return f"连接错误：{error_msg}"
+    
+    def diagnose(self, cluster, deadline: Optional[float] = None) -> Dict[str, Any]:
+        """
+        诊断单个集群（cluster应已与会话分离或在调用线程内使用）
+        
+        Args:
+            deadline: 整体期限（秒），默认K8S_DIAGNOSE_DEADLINE
+        
+        Returns:
+            {"cluster_id", "cluster_name", "checks", "overall_status", "recommendations", "duration_ms"}
+        """
+        started = time.monotonic()
+        budget = deadline or self.deadline
+        ends_at = started + budget
+        
+        address_checks, endpoint, recommendations = self._check_address(cluster)
+        auth_checks, auth_config_ok, auth_recommendations = self._check_auth(cluster)
+        recommendations += auth_recommendations
+        
+        # 网络与API检查并发执行
+        futures: Dict[str, Future] = {}
+        if endpoint is not None:
+            futures["network"] = self._executor.submit(self._check_network, endpoint[0], endpoint[1], ends_at)
+        if auth_config_ok:
+            futures["api"] = self._executor.submit(self._check_api, cluster)
+        wait(futures.values(), timeout=budget)
+        
+        results: Dict[str, List[Dict[str, Any]]] = {}
+        timeout_names = {"network": "网络连通性", "api": "K8s API连接"}
+        for key, future in futures.items():
+            if not future.done():
+                # 不等待（工作线程在各自的请求超时后结束）
+                results[key] = [_check(timeout_names[key], "timeout", f"超过诊断期限（{budget:g}s）仍未完成")]
+                continue
+            try:
+                results[key] = future.result()
+            except Exception as e:
+                results[key] = [_check(timeout_names[key], "error", f"测试异常: {type(e).__name__} - {str(e)}")]
+        
+        network_checks = results.get("network", [])
+        api_checks = results.get("api", [])
+        network_failed = any(c["status"] in ("fail", "timeout") for c in network_checks)
+        if network_failed:
+            recommendations.append("请检查: 1) API Server是否运行 2) 网络防火墙设置 3) 安全组配置")
+        
+        if not auth_config_ok:
+            overall_status = "config_error"
+            recommendations.append("请先完成认证配置")
+        elif api_checks and api_checks[0]["status"] == "pass":
+            overall_status = "healthy"
+        elif api_checks and api_checks[0]["status"] == "fail":
+            overall_status = "unhealthy"
+            recommendations.append(self._recommend_for_error(api_checks[0]["message"]))
+        elif api_checks and api_checks[0]["status"] == "timeout":
+            overall_status = "unhealthy"
+            if not network_failed:
+                recommendations.append("连接超时：请检查网络连接和防火墙设置")
+        else:
+            overall_status = "error"
+            recommendations.append("发生未预期的错误，请检查配置或查看后端日志")
+        
+        if not recommendations:
+            recommendations.append("集群配置正常，可以开始同步资源")
+        
+        return {
+            "cluster_id": cluster.id,
+            "cluster_name": cluster.name,
+            "checks": address_checks + network_checks + auth_checks + api_checks,
+            "overall_status": overall_status,
+            "recommendations": recommendations,
+            "duration_ms": round((time.monotonic() - started) * 1000),
+        }
+    
+    def diagnose_all(self, clusters: Iterable, deadline: Optional[float] = None) -> Iterator[Dict[str, Any]]:
+        """
+        并发诊断多个集群（对象应已与会话分离），按完成顺序逐个返回结果，
+        最后返回 {"type": "summary", ...}
+        """
+        started = time.monotonic()
+        clusters = list(clusters)
+        executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="k8s-diagnose-fleet")
+        try:
+            futures = {executor.submit(self.diagnose, cluster, deadline): cluster for cluster in clusters}
+            by_status: Dict[str, int] = {}
+            for future in as_completed(futures):
+                cluster = futures[future]
+                try:
+                    result = future.result()
+                except Exception as e:
+                    result = {
+                        "cluster_id": cluster.id,
+                        "cluster_name": cluster.name,
+                        "checks": [],
+                        "overall_status": "error",
+                        "recommendations": [f"诊断异常: {type(e).__name__} - {str(e)}"],
+                    }
+                by_status[result["overall_status"]] = by_status.get(result["overall_status"], 0) + 1
+                yield dict(result, type="cluster")
+            
+            yield {
+                "type": "summary",
+                "total": len(clusters),
+                "by_status": by_status,
+                "duration_ms": round((time.monotonic() - started) * 1000),
+            }
+        finally:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+
+# 全局诊断实例
+k8s_diagnosis_service = K8sDiagnosisService(
+    max_workers=settings.K8S_DIAGNOSE_MAX_WORKERS,
+    deadline=settings.K8S_DIAGNOSE_DEADLINE,
+    cache_ttl=settings.K8S_DIAGNOSE_CACHE_TTL,
+    request_timeout=settings.K8S_HEALTH_REQUEST_TIMEOUT
+)
@@ -0,0 +1,266 @@
+"""
+K8s集群健康巡检
+后台定期并发检查所有启用的集群：/version判断存活，/readyz判断就绪；
+资源数量从informer缓存读取，不再做全量list。各集群按ID错开检查时间，单集群有独立期限。
+"""
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, Future, wait, FIRST_COMPLETED
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from app.core.config import settings
+from app.core.database import SessionLocal
+from app.utils.k8s_client import k8s_clients
+from app.utils.k8s_informer import k8s_informers
+
+
+# 巡检读取数量的资源类型（只启动这些informer）
+COUNTED_KINDS = ("nodes", "namespaces", "pods")
+
+# 黄金分割比例，用于把集群ID均匀散布到错开窗口内
+_GOLDEN_RATIO = 0.6180339887
+
+
+class _Check:
+    """单个集群的检查任务"""
+    
+    def __init__(self, cluster, offset: float):
+        self.cluster = cluster
+        self.offset = offset
+        self.started_at: Optional[float] = None
+    
+    def run(self, service: "K8sHealthService") -> Dict[str, Any]:
+        self.started_at = time.monotonic()
+        return service.check_cluster(self.cluster)
+
+
+class K8sHealthService:
+    """集群健康巡检服务"""
+    
+    def __init__(self, max_workers: int = 16, cluster_timeout: float = 15,
+                 request_timeout: float = 5, stagger: float = 5, sweep_budget: float = 27):
+        self.max_workers = max_workers
+        self.cluster_timeout = cluster_timeout
+        self.request_timeout = request_timeout
+        self.stagger = stagger
+        self.sweep_budget = sweep_budget
+        
+        self._sweep_lock = threading.Lock()
+        self.history: deque = deque(maxlen=60)
+        # 集群ID -> 最近一次检查结果
+        self.health: Dict[int, Dict[str, Any]] = {}
+    
+    def _offset(self, cluster_id: int) -> float:
+        """集群在错开窗口内的固定偏移，每轮相同，保证各集群检查间隔稳定"""
+        return (cluster_id * _GOLDEN_RATIO) % 1 * self.stagger
+    
+    def check_cluster(self, cluster) -> Dict[str, Any]:
+        """
+        检查单个集群
+        
+        Returns:
+            {"status", "error_message", "version", "ready", "counts", "latency_ms", "checked_at"}
+        """
+        started = time.monotonic()
+        result: Dict[str, Any] = {
+            "status": "disconnected",
+            "error_message": None,
+            "version": None,
+            "ready": None,
+            "counts": None,
+        }
+        
+        k8s_client, error_msg = k8s_clients.get(cluster)
+        if k8s_client is None:
+            result["error_message"] = error_msg or "连接失败"
+        else:
+            health = k8s_client.check_health(self.request_timeout)
+            result["version"] = health["version"]
+            result["ready"] = health["ready"]
+            result["error_message"] = health["error"]
+            if health["live"]:
+                result["status"] = "error" if health["ready"] is False else "connected"
+            
+            informers = k8s_informers.peek(cluster.id, COUNTED_KINDS)
+            if informers is not None:
+                result["counts"] = {
+                    "node_count": len(informers.store('nodes')),
+                    "namespace_count": len(informers.store('namespaces')),
+                    "pod_count": len(informers.store('pods')),
+                }
+            elif result["status"] == "connected":
+                # 没有informer时用limit=1的请求验证认证和权限（/version和/readyz通常无需认证）
+                success, error_msg = k8s_client.probe(self.request_timeout)
+                if not success:
+                    result["status"] = "disconnected"
+                    result["error_message"] = error_msg
+                elif settings.K8S_INFORMER_ENABLED:
+                    # 后台启动informer，下一轮起从缓存读取数量
+                    threading.Thread(
+                        target=k8s_informers.get, args=(cluster, COUNTED_KINDS), kwargs={"wait": False}, daemon=True
+                    ).start()
+        
+        result["latency_ms"] = round((time.monotonic() - started) * 1000)
+        result["checked_at"] = datetime.utcnow()
+        return result
+    
+    @staticmethod
+    def apply_result(cluster, result: Dict[str, Any]):
+        """把检查结果写入集群记录（不提交）"""
+        cluster.status = result["status"]
+        cluster.error_message = result["error_message"]
+        if result["version"]:
+            cluster.version = result["version"]
+        if result["counts"]:
+            cluster.node_count = result["counts"]["node_count"]
+            cluster.namespace_count = result["counts"]["namespace_count"]
+            cluster.pod_count = result["counts"]["pod_count"]
+        cluster.last_check_time = result["checked_at"]
+    
+    def run_sweep(self) -> Optional[dict]:
+        """执行一轮巡检，上一轮未结束时直接跳过"""
+        if not self._sweep_lock.acquire(blocking=False):
+            print("⏭️  Previous K8s health sweep still running, skipping this run")
+            return None
+        try:
+            stats = self._sweep()
+            self.history.append(stats)
+            if stats["clusters"]:
+                print(
+                    f"☸️  K8s health sweep: {stats['connected']}/{stats['clusters']} connected, "
+                    f"{stats['unhealthy']} unhealthy, {stats['timeouts']} timeouts, {stats['skipped']} skipped, "
+                    f"took {stats['duration_ms']}ms"
+                )
+            return stats
+        finally:
+            self._sweep_lock.release()
+    
+    def _sweep(self) -> dict:
+        """并发检查，结果在本线程中统一写库"""
+        from app.models.kubernetes import K8sCluster
+        
+        sweep_start = time.monotonic()
+        stats = {
+            "started_at": datetime.utcnow().isoformat(),
+            "clusters": 0,
+            "connected": 0,
+            "unhealthy": 0,
+            "timeouts": 0,
+            "skipped": 0,
+        }
+        
+        db = SessionLocal()
+        executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="k8s-health")
+        try:
+            clusters = db.query(K8sCluster).filter(K8sCluster.is_active == True).all()
+            stats["clusters"] = len(clusters)
+            
+            # 工作线程只读取连接参数，使用与会话分离的副本
+            for cluster in clusters:
+                db.expunge(cluster)
+            # 按偏移排序，到点后再提交，错开等待不占用工作线程
+            scheduled = deque(sorted(
+                (_Check(cluster, self._offset(cluster.id)) for cluster in clusters), key=lambda c: c.offset
+            ))
+            checks: Dict[Future, _Check] = {}
+            
+            results: Dict[int, Dict[str, Any]] = {}
+            pending = set()
+            deadline = sweep_start + self.sweep_budget
+            while pending or scheduled:
+                now = time.monotonic()
+                while scheduled and sweep_start + scheduled[0].offset <= now and now <= deadline:
+                    check = scheduled.popleft()
+                    future = executor.submit(check.run, self)
+                    checks[future] = check
+                    pending.add(future)
+                if now > deadline and scheduled:
+                    # 预算内未到提交时间的检查不执行，保留原状态
+                    stats["skipped"] += len(scheduled)
+                    scheduled.clear()
+                
+                timeout = 0.5
+                if scheduled:
+                    timeout = min(timeout, max(0.0, sweep_start + scheduled[0].offset - now))
+                if not pending:
+                    time.sleep(timeout)
+                    continue
+                done, pending = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+                for future in done:
+                    cluster = checks[future].cluster
+                    try:
+                        results[cluster.id] = future.result()
+                    except Exception as e:
+                        results[cluster.id] = {
+                            "status": "error", "error_message": f"状态检测异常: {str(e)}",
+                            "version": None, "ready": None, "counts": None,
+                            "latency_ms": None, "checked_at": datetime.utcnow(),
+                        }
+                
+                # 超过单集群期限（从实际开始检查算起）或整轮预算的检查直接放弃
+                now = time.monotonic()
+                for future in list(pending):
+                    check = checks[future]
+                    started_at = check.started_at
+                    if now > deadline or (started_at is not None and now - started_at > self.cluster_timeout):
+                        pending.discard(future)
+                        if future.cancel():
+                            # 排队中尚未开始（工作线程已满），没有检查过，保留原状态
+                            stats["skipped"] += 1
+                            continue
+                        cluster = check.cluster
+                        stats["timeouts"] += 1
+                        results[cluster.id] = {
+                            "status": "disconnected", "error_message": f"健康检查超时（{self.cluster_timeout}s）",
+                            "version": None, "ready": None, "counts": None,
+                            "latency_ms": None, "checked_at": datetime.utcnow(),
+                        }
+            
+            for cluster in clusters:
+                result = results.get(cluster.id)
+                if result is None:
+                    continue
+                db_cluster = db.get(K8sCluster, cluster.id)
+                if db_cluster is None:
+                    continue
+                self.apply_result(db_cluster, result)
+                self.health[cluster.id] = result
+                if result["status"] == "connected":
+                    stats["connected"] += 1
+                else:
+                    stats["unhealthy"] += 1
+            db.commit()
+        
+        except Exception as e:
+            db.rollback()
+            print(f"❌ K8s health sweep error: {str(e)}")
+        finally:
+            executor.shutdown(wait=False, cancel_futures=True)
+            db.close()
+        
+        stats["duration_ms"] = round((time.monotonic() - sweep_start) * 1000)
+        return stats
+    
+    def get_health(self) -> List[dict]:
+        """各集群最近一次检查结果"""
+        return [dict(result, cluster_id=cluster_id) for cluster_id, result in self.health.items()]
+    
+    def get_stats(self, limit: int = 10) -> List[dict]:
+        """最近几轮巡检的统计信息（最新在前）"""
+        return list(self.history)[-limit:][::-1]
+    
+    def forget(self, cluster_id: int):
+        """集群删除后清理检查结果"""
+        self.health.pop(cluster_id, None)
+
+
+# 全局集群健康巡检实例
+k8s_health_service = K8sHealthService(
+    max_workers=settings.K8S_HEALTH_MAX_WORKERS,
+    cluster_timeout=settings.K8S_HEALTH_CLUSTER_TIMEOUT,
+    request_timeout=settings.K8S_HEALTH_REQUEST_TIMEOUT,
+    stagger=settings.K8S_HEALTH_STAGGER,
+    sweep_budget=settings.K8S_HEALTH_INTERVAL * 0.9
+)
@@ -0,0 +1,235 @@
+"""
+K8s标签倒排索引
+按 (标签键, 值) -> 对象ID集合 索引已同步的Pod和命名空间，资源同步时增量维护。
+支持完整的Kubernetes标签选择器语法（=、==、!=、in、notin、存在、不存在），
+查询时只做集合运算，不再逐行解析JSON。
+"""
+import re
+import threading
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from sqlalchemy.orm import Session
+
+
+# 索引的对象类型 -> 模型名（有labels列的模型）
+INDEXED_KINDS = ("pods", "namespaces")
+
+# 选择器操作符
+OP_EQUALS = "="
+OP_NOT_EQUALS = "!="
+OP_IN = "in"
+OP_NOT_IN = "notin"
+OP_EXISTS = "exists"
+OP_NOT_EXISTS = "!"
+
+_KEY = r"[A-Za-z0-9](?:[-A-Za-z0-9_./]*[A-Za-z0-9])?"
+_VALUE = r"(?:[A-Za-z0-9](?:[-A-Za-z0-9_.]*[A-Za-z0-9])?)?"
+_SET_TERM = re.compile(rf"^(?P<key>{_KEY})\s+(?P<op>in|notin)\s*\((?P<values>[^()]*)\)$")
+_EQ_TERM = re.compile(rf"^(?P<key>{_KEY})\s*(?P<op>==|=|!=)\s*(?P<value>{_VALUE})$")
+_EXISTS_TERM = re.compile(rf"^(?P<not>!?)\s*(?P<key>{_KEY})$")
+_VALUE_RE = re.compile(rf"^{_VALUE}$")
+
+
+class Requirement:
+    """选择器中的一个条件"""
+    
+    __slots__ = ("key", "op", "values")
+    
+    def __init__(self, key: str, op: str, values: Tuple[str, ...] = ()):
+        self.key = key
+        self.op = op
+        self.values = values
+    
+    @property
+    def negative(self) -> bool:
+        return self.op in (OP_NOT_EQUALS, OP_NOT_IN, OP_NOT_EXISTS)
+
+
+def _split_terms(selector: str) -> List[str]:
+    """按逗号拆分条件（忽略括号内的逗号）"""
+    terms, depth, start = [], 0, 0
+    for i, ch in enumerate(selector):
+        if ch == "(":
+            depth += 1
+        elif ch == ")":
+            depth -= 1
+        elif ch == "," and depth == 0:
+            terms.append(selector[start:i])
+            start = i + 1
+    terms.append(selector[start:])
+    return [term.strip() for term in terms if term.strip()]
+
+
+def parse_selector(selector: Optional[str]) -> List[Requirement]:
+    """
+    解析标签选择器，例如 "app=payments,tier!=canary,env in (prod,staging),!legacy"
+    
+    Raises:
+        ValueError: 语法无效
+    """
+    requirements = []
+    for term in _split_terms(selector or ""):
+        match = _SET_TERM.match(term)
+        if match:
+            values = tuple(v.strip() for v in match.group("values").split(",") if v.strip())
+            if not values or not all(_VALUE_RE.match(v) for v in values):
+                raise ValueError(f"无效的标签选择器: {term}")
+            op = OP_IN if match.group("op") == "in" else OP_NOT_IN
+            requirements.append(Requirement(match.group("key"), op, values))
+            continue
+        match = _EQ_TERM.match(term)
+        if match:
+            op = OP_NOT_EQUALS if match.group("op") == "!=" else OP_EQUALS
+            requirements.append(Requirement(match.group("key"), op, (match.group("value"),)))
+            continue
+        match = _EXISTS_TERM.match(term)
+        if match:
+            op = OP_NOT_EXISTS if match.group("not") else OP_EXISTS
+            requirements.append(Requirement(match.group("key"), op))
+            continue
+        raise ValueError(f"无效的标签选择器: {term}")
+    return requirements
+
+
+class _KindIndex:
+    """单个对象类型的倒排索引"""
+    
+    def __init__(self):
+        self.labels: Dict[int, Dict[str, str]] = {}
+        self.cluster_of: Dict[int, int] = {}
+        self.by_cluster: Dict[int, Set[int]] = {}
+        self.by_pair: Dict[Tuple[str, str], Set[int]] = {}
+        self.by_key: Dict[str, Set[int]] = {}
+    
+    def add(self, object_id: int, cluster_id: int, labels: Optional[Dict[str, str]]):
+        self.remove(object_id)
+        labels = dict(labels or {})
+        self.labels[object_id] = labels
+        self.cluster_of[object_id] = cluster_id
+        self.by_cluster.setdefault(cluster_id, set()).add(object_id)
+        for key, value in labels.items():
+            self.by_pair.setdefault((key, value), set()).add(object_id)
+            self.by_key.setdefault(key, set()).add(object_id)
+    
+    def remove(self, object_id: int):
+        labels = self.labels.pop(object_id, None)
+        if labels is None:
+            return
+        cluster_id = self.cluster_of.pop(object_id)
+        _discard(self.by_cluster, cluster_id, object_id)
+        for key, value in labels.items():
+            _discard(self.by_pair, (key, value), object_id)
+            _discard(self.by_key, key, object_id)
+    
+    def universe(self, cluster_id: Optional[int]) -> Set[int]:
+        if cluster_id is None:
+            return set(self.labels)
+        return set(self.by_cluster.get(cluster_id, ()))
+    
+    def ids_for(self, requirement: Requirement) -> Set[int]:
+        """满足条件“肯定形式”的对象ID（notin/!=/!的补集由调用方计算）"""
+        if requirement.op in (OP_EXISTS, OP_NOT_EXISTS):
+            return self.by_key.get(requirement.key, set())
+        sets = [self.by_pair.get((requirement.key, value), set()) for value in requirement.values]
+        return sets[0] if len(sets) == 1 else set().union(*sets)
+
+
+def _discard(index: dict, key, object_id: int):
+    ids = index.get(key)
+    if ids is not None:
+        ids.discard(object_id)
+        if not ids:
+            del index[key]
+
+
+class LabelIndex:
+    """Pod/命名空间标签倒排索引"""
+    
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._loaded = False
+        self._kinds: Dict[str, _KindIndex] = {kind: _KindIndex() for kind in INDEXED_KINDS}
+    
+    @staticmethod
+    def _model(kind: str):
+        from app.models.kubernetes import K8sNamespace, K8sPod
+        
+        return {"pods": K8sPod, "namespaces": K8sNamespace}[kind]
+    
+    def ensure_loaded(self, db: Session):
+        """首次使用时从数据库加载"""
+        if self._loaded:
+            return
+        with self._lock:
+            if self._loaded:
+                return
+            for kind, index in self._kinds.items():
+                model = self._model(kind)
+                for object_id, cluster_id, labels in db.query(model.id, model.cluster_id, model.labels):
+                    index.add(object_id, cluster_id, labels)
+            self._loaded = True
+    
+    def apply(self, kind: str, cluster_id: int, upserts: Iterable[Tuple[int, Optional[Dict[str, str]]]],
+              deleted_ids: Iterable[int] = ()):
+        """同步后增量更新（未加载时忽略，首次查询会全量加载）"""
+        if kind not in self._kinds:
+            return
+        with self._lock:
+            if not self._loaded:
+                return
+            index = self._kinds[kind]
+            for object_id in deleted_ids:
+                index.remove(object_id)
+            for object_id, labels in upserts:
+                index.add(object_id, cluster_id, labels)
+    
+    def drop_cluster(self, cluster_id: int):
+        """集群删除后移除其全部对象"""
+        with self._lock:
+            for index in self._kinds.values():
+                for object_id in list(index.by_cluster.get(cluster_id, ())):
+                    index.remove(object_id)
+    
+    def select(self, db: Session, kind: str, requirements: List[Requirement],
+               cluster_id: Optional[int] = None) -> Set[int]:
+        """
+        求满足全部条件的对象ID
+        
+        肯定条件按集合从小到大求交集，否定条件（!=、notin、!key）从结果中做差集；
+        与Kubernetes语义一致，!=和notin也匹配没有该标签键的对象
+        """
+        self.ensure_loaded(db)
+        with self._lock:
+            index = self._kinds[kind]
+            positive = sorted(
+                (index.ids_for(r) for r in requirements if not r.negative), key=len
+            )
+            if positive:
+                result = set(positive[0])
+                if cluster_id is not None:
+                    result &= index.by_cluster.get(cluster_id, set())
+                for ids in positive[1:]:
+                    if not result:
+                        break
+                    result &= ids
+            else:
+                result = index.universe(cluster_id)
+            
+            for requirement in requirements:
+                if requirement.negative and result:
+                    result -= index.ids_for(requirement)
+            return result
+    
+    def label_keys(self, db: Session, kind: str, cluster_id: Optional[int] = None) -> Dict[str, int]:
+        """标签键及对应的对象数"""
+        self.ensure_loaded(db)
+        with self._lock:
+            index = self._kinds[kind]
+            if cluster_id is None:
+                return {key: len(ids) for key, ids in index.by_key.items()}
+            scope = index.by_cluster.get(cluster_id, set())
+            return {key: n for key, ids in index.by_key.items() if (n := len(ids & scope))}
+
+
+# 全局标签索引实例
+label_index = LabelIndex()
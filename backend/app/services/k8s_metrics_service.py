@@ -0,0 +1,202 @@
+"""
+K8s资源使用量采集
+每个集群每轮只请求两次metrics.k8s.io（nodes、pods全量列表），批量解析数量后：
+- 按节点可分配资源计算CPU/内存使用率，写回K8sNode
+- 写回K8sPod的实时使用量
+- 节点和集群汇总写入独立的时序存储（复用MetricsStore的降采样与保留策略）
+"""
+import math
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+from kubernetes.client.rest import ApiException
+
+from app.core.config import settings
+from app.core.database import SessionLocal
+from app.utils.k8s_client import k8s_clients
+from app.utils.k8s_quantity import parse_quantities, parse_quantity
+from app.utils.metrics_store import MetricsStore
+
+
+# 时序列：使用率（%）和绝对使用量
+USAGE_METRICS = ("cpu", "memory", "cpu_cores", "memory_gib")
+
+# 批量更新Pod使用量时每批的行数
+POD_UPDATE_BATCH = 1000
+
+# 节点和集群汇总共用一个存储：节点用K8sNode.id，集群汇总用负的集群ID
+k8s_metrics_store = MetricsStore(settings.K8S_METRICS_DB_PATH, metrics=USAGE_METRICS, key="series_id")
+
+
+def cluster_series_id(cluster_id: int) -> int:
+    """集群汇总序列的ID"""
+    return -cluster_id
+
+
+def _percent(used: float, total: float) -> Optional[float]:
+    if math.isnan(used) or math.isnan(total) or total <= 0:
+        return None
+    return used / total * 100
+
+
+def _nansum(values) -> float:
+    return math.fsum(v for v in values if not math.isnan(v))
+
+
+class K8sMetricsService:
+    """集群资源使用量采集服务"""
+    
+    def __init__(self, max_workers: int = 8, timeout: float = 40):
+        self.max_workers = max_workers
+        self.timeout = timeout
+        self._lock = threading.Lock()
+        self.history: deque = deque(maxlen=60)
+    
+    @staticmethod
+    def fetch(cluster) -> Tuple[List[dict], List[dict]]:
+        """
+        获取集群的节点与Pod使用量（不访问数据库，可在工作线程中执行）
+        
+        Raises:
+            RuntimeError: 无法连接或集群未安装metrics-server
+        """
+        k8s_client, error_msg = k8s_clients.get(cluster)
+        if k8s_client is None:
+            raise RuntimeError(error_msg or "连接失败")
+        try:
+            return k8s_client.list_node_metrics(), k8s_client.list_pod_metrics()
+        except ApiException as e:
+            if e.status == 404:
+                raise RuntimeError("metrics.k8s.io不可用，请确认集群已安装metrics-server")
+            raise
+    
+    @staticmethod
+    def apply(db, cluster_id: int, node_metrics: List[dict], pod_metrics: List[dict],
+              ts: Optional[int] = None) -> Dict[str, Any]:
+        """写回节点/Pod使用量并记录历史（不提交）"""
+        from app.models.kubernetes import K8sNode, K8sPod
+        
+        ts = ts or int(time.time())
+        
+        # 节点：按名称匹配已同步的节点，批量解析后计算使用率
+        usage_by_name = {m['name']: m for m in node_metrics}
+        nodes = [
+            row for row in db.query(
+                K8sNode.id, K8sNode.node_name, K8sNode.cpu_allocatable, K8sNode.memory_allocatable
+            ).filter(K8sNode.cluster_id == cluster_id)
+            if row.node_name in usage_by_name
+        ]
+        cpu_used = parse_quantities(usage_by_name[n.node_name]['cpu'] for n in nodes)
+        memory_used = parse_quantities(usage_by_name[n.node_name]['memory'] for n in nodes)
+        cpu_total = parse_quantities(n.cpu_allocatable for n in nodes)
+        memory_total = parse_quantities(n.memory_allocatable for n in nodes)
+        
+        node_updates = []
+        for i, node in enumerate(nodes):
+            cpu_percent = _percent(cpu_used[i], cpu_total[i])
+            memory_percent = _percent(memory_used[i], memory_total[i])
+            node_updates.append({
+                'id': node.id,
+                'cpu_usage_percent': round(cpu_percent) if cpu_percent is not None else None,
+                'memory_usage_percent': round(memory_percent) if memory_percent is not None else None,
+            })
+            k8s_metrics_store.append_values(
+                node.id, ts, (cpu_percent, memory_percent, cpu_used[i], memory_used[i] / 2 ** 30)
+            )
+        if node_updates:
+            db.bulk_update_mappings(K8sNode, node_updates)
+        
+        # 集群汇总
+        cluster_cpu, cluster_memory = _nansum(cpu_used), _nansum(memory_used)
+        if nodes:
+            k8s_metrics_store.append_values(cluster_series_id(cluster_id), ts, (
+                _percent(cluster_cpu, _nansum(cpu_total)),
+                _percent(cluster_memory, _nansum(memory_total)),
+                cluster_cpu,
+                cluster_memory / 2 ** 30,
+            ))
+        
+        # Pod：按 (命名空间, 名称) 匹配
+        pod_ids = {
+            (namespace, name): pod_id for pod_id, namespace, name in db.query(
+                K8sPod.id, K8sPod.namespace, K8sPod.pod_name
+            ).filter(K8sPod.cluster_id == cluster_id)
+        }
+        pod_updates = []
+        for metric in pod_metrics:
+            pod_id = pod_ids.get((metric['namespace'], metric['name']))
+            if pod_id is None:
+                continue
+            cpu = _nansum(map(parse_quantity, metric['cpu']))
+            memory = _nansum(map(parse_quantity, metric['memory']))
+            pod_updates.append({'id': pod_id, 'cpu_usage': round(cpu * 1000), 'memory_usage': round(memory)})
+        for i in range(0, len(pod_updates), POD_UPDATE_BATCH):
+            db.bulk_update_mappings(K8sPod, pod_updates[i:i + POD_UPDATE_BATCH])
+        
+        return {
+            "nodes": len(node_updates),
+            "pods": len(pod_updates),
+            "cpu_cores": round(cluster_cpu, 2),
+            "memory_gib": round(cluster_memory / 2 ** 30, 2),
+        }
+    
+    def collect_all(self) -> Optional[dict]:
+        """采集所有启用集群的使用量，上一轮未结束时跳过"""
+        from app.models.kubernetes import K8sCluster
+        
+        if not self._lock.acquire(blocking=False):
+            print("⏭️  Previous K8s metrics collection still running, skipping this run")
+            return None
+        
+        started = time.monotonic()
+        stats = {"started_at": datetime.utcnow().isoformat(), "clusters": {}}
+        db = SessionLocal()
+        executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="k8s-metrics")
+        try:
+            clusters = db.query(K8sCluster).filter(
+                K8sCluster.is_active == True,
+                K8sCluster.status == "connected"
+            ).all()
+            for cluster in clusters:
+                db.expunge(cluster)
+            
+            # 并发拉取，串行写库
+            futures = {executor.submit(self.fetch, cluster): cluster for cluster in clusters}
+            done, not_done = wait(futures, timeout=self.timeout)
+            ts = int(time.time())
+            for future, cluster in futures.items():
+                if future in not_done:
+                    stats["clusters"][cluster.id] = {"error": f"采集超时（{self.timeout}s）"}
+                    continue
+                try:
+                    node_metrics, pod_metrics = future.result()
+                    stats["clusters"][cluster.id] = self.apply(db, cluster.id, node_metrics, pod_metrics, ts)
+                    db.commit()
+                except Exception as e:
+                    db.rollback()
+                    stats["clusters"][cluster.id] = {"error": str(e)}
+        except Exception as e:
+            print(f"❌ K8s metrics collection error: {str(e)}")
+        finally:
+            executor.shutdown(wait=False, cancel_futures=True)
+            db.close()
+            self._lock.release()
+        
+        stats["duration_ms"] = round((time.monotonic() - started) * 1000)
+        self.history.append(stats)
+        return stats
+    
+    def get_stats(self, limit: int = 10) -> List[dict]:
+        """最近几轮采集的统计信息（最新在前）"""
+        return list(self.history)[-limit:][::-1]
+
+
+# 全局使用量采集实例
+k8s_metrics_service = K8sMetricsService(
+    max_workers=settings.K8S_HEALTH_MAX_WORKERS,
+    timeout=settings.K8S_METRICS_INTERVAL * 0.9
+)
@@ -1,12 +1,45 @@
 from sqlalchemy.orm import Session
-from sqlalchemy import func
-from typing import List, Optional, Dict
+from sqlalchemy import bindparam, func, tuple_
+from typing import Any, List, Optional, Dict, Iterable, Iterator, Callable
 from datetime import datetime
+from collections import Counter
+import base64
+import json
+import re
+import time
 from app.models.kubernetes import K8sCluster, K8sNode, K8sNamespace, K8sPod
 from app.schemas.kubernetes import (
     K8sClusterCreate, K8sClusterUpdate, K8sClusterStats
 )
-from app.utils.k8s_client import K8sClient
+from app.core.config import settings
+from app.services.k8s_health_service import K8sHealthService, k8s_health_service
+from app.services.k8s_label_index import label_index, parse_selector
+from app.services.k8s_metrics_service import cluster_series_id, k8s_metrics_store
+from app.utils.k8s_client import k8s_clients
+from app.utils.k8s_informer import INFORMER_KINDS, ClusterInformers, k8s_informers
+
+
+# Pod分页查询返回的列（不加载完整ORM对象）
+POD_LIST_COLUMNS = (
+    K8sPod.id, K8sPod.namespace, K8sPod.pod_name, K8sPod.node_name, K8sPod.status,
+    K8sPod.ready_containers, K8sPod.total_containers, K8sPod.restart_count, K8sPod.pod_ip,
+    K8sPod.cpu_usage, K8sPod.memory_usage, K8sPod.start_time,
+)
+
+# 需要维护标签索引的模型 -> 索引中的对象类型
+LABEL_INDEX_KINDS = {K8sPod: "pods", K8sNamespace: "namespaces"}
+
+# 命名空间计数列 -> 资源类型
+NAMESPACE_COUNT_COLUMNS = {
+    "pod_count": "pods",
+    "service_count": "services",
+    "deployment_count": "deployments",
+    "configmap_count": "configmaps",
+    "secret_count": "secrets",
+}
+
+# 批量写入的对象数，以及批量删除时每条DELETE语句的id数（避免超出数据库参数上限）
+SYNC_BATCH_SIZE = 500
 
 
 class K8sService:
@@ -63,6 +96,10 @@ class K8sService:
         for field, value in update_data.items():
             setattr(db_cluster, field, value)
         
+        # 连接配置可能已变化，丢弃旧的informer和客户端（下次使用时重建）
+        k8s_informers.stop(cluster_id)
+        k8s_clients.invalidate(cluster_id)
+        
         db_cluster.updated_at = datetime.utcnow()
         db.commit()
         db.refresh(db_cluster)
@@ -79,59 +116,60 @@ class K8sService:
         if not db_cluster:
             return False
         
+        k8s_informers.stop(cluster_id)
+        k8s_clients.invalidate(cluster_id)
+        k8s_health_service.forget(cluster_id)
+        
+        # 删除使用量历史
+        for (node_id,) in db.query(K8sNode.id).filter(K8sNode.cluster_id == cluster_id):
+            k8s_metrics_store.drop_server(node_id)
+        k8s_metrics_store.drop_server(cluster_series_id(cluster_id))
+        
         # 删除相关数据
         db.query(K8sPod).filter(K8sPod.cluster_id == cluster_id).delete()
         db.query(K8sNamespace).filter(K8sNamespace.cluster_id == cluster_id).delete()
         db.query(K8sNode).filter(K8sNode.cluster_id == cluster_id).delete()
         db.delete(db_cluster)
         db.commit()
+        label_index.drop_cluster(cluster_id)
         return True
     
+    @staticmethod
+    def _get_informers(cluster, kinds: Iterable[str] = INFORMER_KINDS) -> Optional[ClusterInformers]:
+        """
+        获取集群的informer缓存（只启动kinds中的资源类型），未启用或暂不可用时返回None；
+        个别类型未同步（如无权限list）时调用方对该类型回退到直接list
+        """
+        if not settings.K8S_INFORMER_ENABLED or not cluster.is_active:
+            return None
+        return k8s_informers.get(cluster, kinds)
+    
+    @staticmethod
+    def _read_objects(informers: Optional[ClusterInformers], kind: str, list_raw: Callable) -> Iterable[Dict]:
+        """已同步的类型从informer缓存读取，否则分页流式读取（跳过模型反序列化）"""
+        if informers is not None and informers.is_synced(kind):
+            return informers.store(kind).list()
+        return list_raw(raw=True)
+    
     @staticmethod
     def update_cluster_status(db: Session, cluster: K8sCluster) -> K8sCluster:
-        """更新集群状态"""
+        """
+        更新集群状态（与后台健康巡检相同的检查）
+        
+        资源数量只取自informer缓存，缓存未同步（或未启用informer）时保留上次的数量，不做全量list
+        """
         try:
-            # 创建K8s客户端
-            k8s_client = K8sClient(
-                api_server=cluster.api_server,
-                auth_type=cluster.auth_type,
-                kubeconfig=cluster.kubeconfig,
-                token=cluster.token,
-                ca_cert=cluster.ca_cert,
-                client_cert=cluster.client_cert,
-                client_key=cluster.client_key
-            )
-            
-            # 尝试连接
-            success, error_msg = k8s_client.connect()
-            
-            if success:
-                cluster.status = "connected"
-                cluster.error_message = None
-                
-                # 获取版本
-                version = k8s_client.get_version()
-                if version:
-                    cluster.version = version
-                
-                # 获取统计信息
-                stats = k8s_client.get_cluster_stats()
-                cluster.node_count = stats.get('node_count', 0)
-                cluster.namespace_count = stats.get('namespace_count', 0)
-                cluster.pod_count = stats.get('pod_count', 0)
-                
-                k8s_client.close()
-            else:
-                cluster.status = "disconnected"
-                cluster.error_message = error_msg or "连接失败"
-                print(f"集群 {cluster.cluster_name} 连接失败: {cluster.error_message}")
-            
+            result = k8s_health_service.check_cluster(cluster)
+            K8sHealthService.apply_result(cluster, result)
+            if result["status"] != "connected":
+                print(f"集群 {cluster.name} 连接失败: {cluster.error_message}")
+        
         except Exception as e:
             cluster.status = "error"
             cluster.error_message = f"状态检测异常: {str(e)}"
-            print(f"集群 {cluster.cluster_name} 状态检测异常: {str(e)}")
+            cluster.last_check_time = datetime.utcnow()
+            print(f"集群 {cluster.name} 状态检测异常: {str(e)}")
         
-        cluster.last_check_time = datetime.utcnow()
         db.commit()
         db.refresh(cluster)
         return cluster
@@ -141,6 +179,8 @@ class K8sService:
         """
         同步集群资源信息
         
+        按uid比对resourceVersion增量同步，只写入新增、变化和已删除的对象
+        
         Returns:
             (成功/失败, 错误信息)
         """
@@ -149,19 +189,8 @@ class K8sService:
             return False, "集群不存在"
         
         try:
-            k8s_client = K8sClient(
-                api_server=cluster.api_server,
-                auth_type=cluster.auth_type,
-                kubeconfig=cluster.kubeconfig,
-                token=cluster.token,
-                ca_cert=cluster.ca_cert,
-                client_cert=cluster.client_cert,
-                client_key=cluster.client_key
-            )
-            
-            # 尝试连接
-            success, error_msg = k8s_client.connect()
-            if not success:
+            k8s_client, error_msg = k8s_clients.get(cluster)
+            if k8s_client is None:
                 # 更新集群状态
                 cluster.status = "disconnected"
                 cluster.error_message = error_msg
@@ -174,32 +203,24 @@ class K8sService:
             cluster.error_message = None
             cluster.last_check_time = datetime.utcnow()
             
-            # 同步节点
-            print(f"正在同步集群 {cluster.cluster_name} 的节点信息...")
-            nodes = k8s_client.list_nodes()
-            db.query(K8sNode).filter(K8sNode.cluster_id == cluster_id).delete()
-            
-            for node_data in nodes:
-                db_node = K8sNode(cluster_id=cluster_id, **node_data)
-                db.add(db_node)
-            
-            # 同步命名空间
-            print(f"正在同步集群 {cluster.cluster_name} 的命名空间信息...")
-            namespaces = k8s_client.list_namespaces()
-            db.query(K8sNamespace).filter(K8sNamespace.cluster_id == cluster_id).delete()
+            started = time.monotonic()
+            informers = K8sService._get_informers(cluster)
+            nodes = K8sService._read_objects(informers, 'nodes', k8s_client.list_nodes)
+            namespaces = K8sService._read_objects(informers, 'namespaces', k8s_client.list_namespaces)
+            pods = K8sService._read_objects(informers, 'pods', k8s_client.list_pods)
             
-            for ns_data in namespaces:
-                db_ns = K8sNamespace(cluster_id=cluster_id, **ns_data)
-                db.add(db_ns)
+            # Pod在同步过程中顺便按命名空间计数
+            pod_counts = Counter()
+            pods = _tally_namespaces(pods, pod_counts)
             
-            # 同步Pods（仅保存最近的数据，避免数据量过大）
-            print(f"正在同步集群 {cluster.cluster_name} 的Pod信息...")
-            pods = k8s_client.list_pods()
-            db.query(K8sPod).filter(K8sPod.cluster_id == cluster_id).delete()
-            
-            for pod_data in pods[:1000]:  # 限制数量
-                db_pod = K8sPod(cluster_id=cluster_id, **pod_data)
-                db.add(db_pod)
+            label_changes: Dict[str, tuple] = {}
+            result = {
+                "nodes": K8sService._sync_objects(db, K8sNode, cluster_id, nodes),
+                "namespaces": K8sService._sync_objects(db, K8sNamespace, cluster_id, namespaces, label_changes),
+                "pods": K8sService._sync_objects(db, K8sPod, cluster_id, pods, label_changes),
+            }
+            namespace_counts = K8sService._collect_namespace_counts(k8s_client, informers, pod_counts)
+            counts_updated = K8sService._apply_namespace_counts(db, cluster_id, namespace_counts)
             
             # 获取版本信息
             version = k8s_client.get_version()
@@ -207,23 +228,209 @@ class K8sService:
                 cluster.version = version
             
             # 更新集群统计
-            cluster.node_count = len(nodes)
-            cluster.namespace_count = len(namespaces)
-            cluster.pod_count = len(pods)
+            cluster.node_count = result["nodes"]["total"]
+            cluster.namespace_count = result["namespaces"]["total"]
+            cluster.pod_count = result["pods"]["total"]
+            cluster.last_sync_time = datetime.utcnow()
+            cluster.last_sync_result = result
             
             db.commit()
-            k8s_client.close()
             
-            print(f"集群 {cluster.cluster_name} 同步完成: {len(nodes)}个节点, {len(namespaces)}个命名空间, {len(pods)}个Pod")
-            return True, None
+            # 提交成功后再更新标签索引，回滚时索引保持与数据库一致
+            for kind, (upserts, deleted_ids) in label_changes.items():
+                label_index.apply(kind, cluster_id, upserts, deleted_ids)
             
+            summary = ", ".join(
+                f"{kind} +{r['added']} ~{r['updated']} -{r['deleted']}" for kind, r in result.items()
+            ) + f", namespace counts ~{counts_updated}"
+            print(f"集群 {cluster.name} 同步完成 ({time.monotonic() - started:.1f}s): {summary}")
+            return True, None
+        
         except Exception as e:
+            db.rollback()
             error_msg = f"同步集群资源失败: {str(e)}"
             print(error_msg)
             cluster.error_message = error_msg
             db.commit()
             return False, error_msg
     
+    @staticmethod
+    def _sync_objects(db: Session, model, cluster_id: int, items: Iterable[Dict],
+                      label_changes: Optional[Dict[str, tuple]] = None) -> Dict[str, int]:
+        """
+        将集群中的对象列表与数据库中的记录按uid比对
+        
+        - uid不存在的批量插入
+        - resourceVersion变化的批量更新
+        - 数据库中多出来的（包括旧版本同步的无uid记录）批量删除
+        
+        items可以是生成器，新增和变化的对象每SYNC_BATCH_SIZE个写入一次。
+        传入label_changes时，带标签的模型会把 (新增/变化的(id, labels), 删除的id) 记录到
+        label_changes[kind]，由调用方在提交后更新标签索引
+        
+        Returns:
+            {"added", "updated", "deleted", "unchanged", "total"}
+        """
+        existing: Dict[str, tuple] = {}
+        stale_ids: List[int] = []
+        for row_id, uid, resource_version in db.query(
+            model.id, model.uid, model.resource_version
+        ).filter(model.cluster_id == cluster_id):
+            if uid is None:
+                stale_ids.append(row_id)
+            else:
+                existing[uid] = (row_id, resource_version)
+        
+        kind = LABEL_INDEX_KINDS.get(model) if label_changes is not None else None
+        label_upserts: List[tuple] = []
+        
+        def flush_inserts(rows: List[Dict]):
+            # 需要维护索引时取回自增id
+            db.bulk_insert_mappings(model, rows, return_defaults=kind is not None)
+            if kind is not None:
+                label_upserts.extend((row['id'], row.get('labels')) for row in rows)
+        
+        def flush_updates(rows: List[Dict]):
+            db.bulk_update_mappings(model, rows)
+            if kind is not None:
+                label_upserts.extend((row['id'], row.get('labels')) for row in rows)
+        
+        now = datetime.utcnow()
+        inserts, updates = [], []
+        added = updated = 0
+        seen = set()
+        for item in items:
+            uid = item.get('uid')
+            seen.add(uid)
+            current = existing.get(uid)
+            if current is None:
+                inserts.append(dict(item, cluster_id=cluster_id, created_at=now, updated_at=now))
+            elif current[1] != item.get('resource_version'):
+                updates.append(dict(item, id=current[0], updated_at=now))
+            
+            if len(inserts) >= SYNC_BATCH_SIZE:
+                flush_inserts(inserts)
+                added += len(inserts)
+                inserts = []
+            if len(updates) >= SYNC_BATCH_SIZE:
+                flush_updates(updates)
+                updated += len(updates)
+                updates = []
+        
+        if inserts:
+            flush_inserts(inserts)
+            added += len(inserts)
+        if updates:
+            flush_updates(updates)
+            updated += len(updates)
+        
+        deleted_ids = stale_ids + [row_id for uid, (row_id, _) in existing.items() if uid not in seen]
+        for i in range(0, len(deleted_ids), SYNC_BATCH_SIZE):
+            db.query(model).filter(
+                model.id.in_(deleted_ids[i:i + SYNC_BATCH_SIZE])
+            ).delete(synchronize_session=False)
+        
+        if kind is not None:
+            label_changes[kind] = (label_upserts, deleted_ids)
+        
+        return {
+            "added": added,
+            "updated": updated,
+            "deleted": len(deleted_ids),
+            "unchanged": len(seen) - added - updated,
+            "total": len(seen),
+        }
+    
+    @staticmethod
+    def _collect_namespace_counts(k8s_client, informers: Optional[ClusterInformers],
+                                  pod_counts: Dict[str, int]) -> Dict[str, Dict[str, int]]:
+        """
+        按命名空间统计各类资源数：每种资源一次全集群list（只取元数据），在内存中分组；
+        Pod沿用同步时的计数，有informer缓存的资源直接读取命名空间索引
+        
+        Returns:
+            {计数列: {命名空间: 数量}}，获取失败（如无权限list secrets）的列不包含在内
+        """
+        counts = {"pod_count": dict(pod_counts)}
+        for column, kind in NAMESPACE_COUNT_COLUMNS.items():
+            if column in counts:
+                continue
+            if informers is not None and informers.is_synced(kind):
+                counts[column] = informers.store(kind).keys('namespace')
+                continue
+            try:
+                counts[column] = k8s_client.count_by_namespace(kind)
+            except Exception as e:
+                print(f"统计{kind}数量失败，保留原值: {str(e)}")
+        return counts
+    
+    @staticmethod
+    def _apply_namespace_counts(db: Session, cluster_id: int, counts: Dict[str, Dict[str, int]]) -> int:
+        """只更新计数有变化的命名空间（不提交），返回更新的行数"""
+        if not counts:
+            return 0
+        columns = list(counts)
+        updates = []
+        for row in db.query(
+            K8sNamespace.id, K8sNamespace.namespace_name, *(getattr(K8sNamespace, c) for c in columns)
+        ).filter(K8sNamespace.cluster_id == cluster_id):
+            values = {c: counts[c].get(row.namespace_name, 0) for c in columns}
+            if any(getattr(row, c) != value for c, value in values.items()):
+                updates.append(dict(values, id=row.id))
+        for i in range(0, len(updates), SYNC_BATCH_SIZE):
+            db.bulk_update_mappings(K8sNamespace, updates[i:i + SYNC_BATCH_SIZE])
+        return len(updates)
+    
+    @staticmethod
+    def build_log_matcher(
+        pattern: Optional[str],
+        regex: bool = False,
+        ignore_case: bool = False
+    ) -> Optional[Callable[[str], bool]]:
+        """
+        构建日志行过滤函数
+        
+        Raises:
+            ValueError: 正则表达式无效
+        """
+        if not pattern:
+            return None
+        flags = re.IGNORECASE if ignore_case else 0
+        try:
+            compiled = re.compile(pattern if regex else re.escape(pattern), flags)
+        except re.error as e:
+            raise ValueError(f"无效的正则表达式: {e}")
+        return lambda line: compiled.search(line) is not None
+    
+    @staticmethod
+    def filter_log_lines(
+        lines: Iterable[bytes],
+        matcher: Optional[Callable[[str], bool]] = None,
+        limit_bytes: Optional[int] = None
+    ) -> Iterator[bytes]:
+        """
+        逐行过滤日志并限制输出字节数
+        
+        输入可以是K8s日志流，过滤和截断都不缓存历史行，内存占用恒定
+        """
+        sent = 0
+        try:
+            for line in lines:
+                if matcher is not None and not matcher(line.decode('utf-8', errors='replace')):
+                    continue
+                if limit_bytes is not None and sent + len(line) > limit_bytes:
+                    remaining = limit_bytes - sent
+                    if remaining > 0:
+                        yield line[:remaining]
+                    return
+                sent += len(line)
+                yield line
+        finally:
+            # 提前结束时关闭上游日志流
+            close = getattr(lines, 'close', None)
+            if close is not None:
+                close()
+    
     @staticmethod
     def get_cluster_stats(db: Session) -> K8sClusterStats:
         """获取集群统计信息"""
@@ -262,8 +469,23 @@ class K8sService:
     
     @staticmethod
     def get_cluster_namespaces(db: Session, cluster_id: int) -> List[K8sNamespace]:
-        """获取集群命名空间列表"""
-        return db.query(K8sNamespace).filter(K8sNamespace.cluster_id == cluster_id).all()
+        """
+        获取集群命名空间列表
+        
+        informer运行中时，Pod和Deployment数取自informer的命名空间索引（随watch事件实时变化），
+        其余计数为最近一次同步的结果
+        """
+        namespaces = db.query(K8sNamespace).filter(K8sNamespace.cluster_id == cluster_id).all()
+        informers = k8s_informers.peek(cluster_id, ("pods", "deployments"))
+        if informers is not None:
+            pod_counts = informers.store('pods').keys('namespace')
+            deployment_counts = informers.store('deployments').keys('namespace')
+            for ns in namespaces:
+                # 只修改返回值，不写回数据库
+                db.expunge(ns)
+                ns.pod_count = pod_counts.get(ns.namespace_name, 0)
+                ns.deployment_count = deployment_counts.get(ns.namespace_name, 0)
+        return namespaces
     
     @staticmethod
     def get_cluster_pods(
@@ -278,4 +500,133 @@ class K8sService:
             query = query.filter(K8sPod.namespace == namespace)
         
         return query.order_by(K8sPod.created_at.desc()).limit(500).all()
+    
+    @staticmethod
+    def _encode_cursor(row) -> str:
+        raw = json.dumps([row.namespace, row.pod_name, row.id], separators=(",", ":"))
+        return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii")
+    
+    @staticmethod
+    def _decode_cursor(cursor: str) -> tuple:
+        try:
+            namespace, pod_name, pod_id = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+            return str(namespace), str(pod_name), int(pod_id)
+        except Exception:
+            raise ValueError("无效的游标")
+    
+    @staticmethod
+    def query_cluster_pods(
+        db: Session,
+        cluster_id: int,
+        namespace: Optional[str] = None,
+        node_name: Optional[str] = None,
+        status: Optional[str] = None,
+        name_prefix: Optional[str] = None,
+        label_selector: Optional[str] = None,
+        cursor: Optional[str] = None,
+        limit: int = 100,
+        include_labels: bool = False
+    ) -> Dict[str, Any]:
+        """
+        游标分页查询Pod
+        
+        按 (namespace, pod_name, id) 排序，游标为上一页最后一行的排序键，
+        每页只查询 limit+1 行投影列，翻页代价与页码无关。
+        标签选择器先在内存倒排索引中求出Pod ID集合，再按ID过滤
+        
+        Raises:
+            ValueError: 游标或标签选择器无效
+        
+        Returns:
+            {"items": [...], "next_cursor": str或None}
+        """
+        columns = list(POD_LIST_COLUMNS)
+        if include_labels:
+            columns.append(K8sPod.labels)
+        query = db.query(*columns).filter(K8sPod.cluster_id == cluster_id)
+        
+        if namespace:
+            query = query.filter(K8sPod.namespace == namespace)
+        if node_name:
+            query = query.filter(K8sPod.node_name == node_name)
+        if status:
+            query = query.filter(K8sPod.status == status)
+        if name_prefix:
+            # 范围条件可以使用索引（LIKE在SQLite上默认不区分大小写，无法走索引）
+            query = query.filter(K8sPod.pod_name >= name_prefix, K8sPod.pod_name < name_prefix + "\uffff")
+        requirements = parse_selector(label_selector)
+        if requirements:
+            pod_ids = label_index.select(db, "pods", requirements, cluster_id)
+            if not pod_ids:
+                return {"items": [], "next_cursor": None}
+            query = query.filter(K8sPod.id.in_(K8sService._id_list(pod_ids)))
+        if cursor:
+            query = query.filter(
+                tuple_(K8sPod.namespace, K8sPod.pod_name, K8sPod.id) > tuple_(*K8sService._decode_cursor(cursor))
+            )
+        
+        rows = query.order_by(K8sPod.namespace, K8sPod.pod_name, K8sPod.id).limit(limit + 1).all()
+        next_cursor = K8sService._encode_cursor(rows[limit - 1]) if len(rows) > limit else None
+        return {
+            "items": [row._asdict() for row in rows[:limit]],
+            "next_cursor": next_cursor,
+        }
+    
+    @staticmethod
+    def _id_list(ids: Iterable[int]):
+        """ID集合作为IN条件（整数直接渲染进SQL，不受数据库绑定参数个数上限限制）"""
+        return bindparam("ids", sorted(ids), expanding=True, literal_execute=True)
+    
+    @staticmethod
+    def select_by_labels(
+        db: Session,
+        kind: str,
+        label_selector: str,
+        cluster_id: Optional[int] = None,
+        limit: int = 500
+    ) -> Dict[str, Any]:
+        """
+        按标签选择器查询Pod或命名空间（可跨集群）
+        
+        Raises:
+            ValueError: 对象类型或标签选择器无效
+        
+        Returns:
+            {"total": 匹配数, "items": [...]}（items最多limit条，按集群、命名空间、名称排序）
+        """
+        if kind not in LABEL_INDEX_KINDS.values():
+            raise ValueError(f"不支持的对象类型: {kind}")
+        requirements = parse_selector(label_selector)
+        if not requirements:
+            raise ValueError("标签选择器不能为空")
+        
+        ids = label_index.select(db, kind, requirements, cluster_id)
+        if not ids:
+            return {"total": 0, "items": []}
+        
+        if kind == "pods":
+            columns = (K8sPod.cluster_id, *POD_LIST_COLUMNS, K8sPod.labels)
+            order_by = (K8sPod.cluster_id, K8sPod.namespace, K8sPod.pod_name)
+            model = K8sPod
+        else:
+            columns = (K8sNamespace.id, K8sNamespace.cluster_id, K8sNamespace.namespace_name,
+                       K8sNamespace.status, K8sNamespace.labels)
+            order_by = (K8sNamespace.cluster_id, K8sNamespace.namespace_name)
+            model = K8sNamespace
+        
+        rows = db.query(*columns).filter(
+            model.id.in_(K8sService._id_list(ids))
+        ).order_by(*order_by).limit(limit).all()
+        return {
+            "total": len(ids),
+            "items": [row._asdict() for row in rows],
+        }
+
 
+def _tally_namespaces(items: Iterable[Dict], counts: Counter) -> Iterator[Dict]:
+    """透传对象，同时按命名空间计数"""
+    for item in items:
+        namespace = item.get('namespace')
+        if namespace:
+            counts[namespace] += 1
+        yield item
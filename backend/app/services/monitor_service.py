@@ -0,0 +1,245 @@
+"""
+服务器监控巡检
+使用有界线程池并发采集所有在线服务器的资源使用情况，并在主线程中串行处理告警
+"""
+import math
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, Future, wait, FIRST_COMPLETED
+from datetime import datetime, timezone
+from typing import Dict, List, Optional
+
+from app.core.config import settings
+from app.core.database import SessionLocal
+from app.schemas.server import ServerStatus
+from app.utils.ssh_client import CommandTimeout
+
+
+def percentile(values: List[float], pct: float) -> Optional[float]:
+    """最近秩法计算百分位数"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = max(1, math.ceil(pct / 100 * len(ordered)))
+    return ordered[rank - 1]
+
+
+class _Probe:
+    """单台服务器的采集任务"""
+    
+    def __init__(self, server, delay: float = 0):
+        self.server = server
+        self.delay = delay
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+    
+    def run(self, timeout: float, deadline: float) -> Optional[ServerStatus]:
+        from app.services.server_service import ServerService
+        
+        self.started_at = time.monotonic()
+        # 远程命令超时不超过单机期限和整轮剩余预算，被放弃的任务不会一直占用线程和连接
+        timeout = max(0.1, min(timeout, deadline - self.started_at))
+        try:
+            return ServerService.probe_server_status(self.server, timeout)
+        finally:
+            self.finished_at = time.monotonic()
+    
+    @property
+    def latency(self) -> Optional[float]:
+        if self.started_at is None or self.finished_at is None:
+            return None
+        return self.finished_at - self.started_at
+
+
+class MonitorService:
+    """服务器资源巡检服务"""
+    
+    def __init__(self, max_workers: int = 32, host_timeout: float = 20,
+                 jitter: float = 2.0, sweep_budget: float = 54):
+        self.max_workers = max_workers
+        self.host_timeout = host_timeout
+        self.jitter = jitter
+        self.sweep_budget = sweep_budget
+        
+        # 保证同一时刻只有一轮巡检在运行
+        self._sweep_lock = threading.Lock()
+        self.history: deque = deque(maxlen=60)
+    
+    def run_sweep(self) -> Optional[dict]:
+        """执行一轮巡检，上一轮未结束时直接跳过"""
+        if not self._sweep_lock.acquire(blocking=False):
+            print("⏭️  Previous monitoring sweep still running, skipping this run")
+            return None
+        try:
+            stats = self._sweep()
+            self.history.append(stats)
+            print(
+                f"📊 Monitoring sweep: {stats['probed']}/{stats['hosts']} probed, "
+                f"{stats['offline']} offline, {stats['timeouts']} timeouts, "
+                f"p50={stats['latency_p50_ms']}ms p99={stats['latency_p99_ms']}ms, "
+                f"took {stats['duration_ms']}ms"
+            )
+            return stats
+        finally:
+            self._sweep_lock.release()
+    
+    def _sweep(self) -> dict:
+        """并发采集并处理告警"""
+        from app.models.server import Server
+        
+        sweep_start = time.monotonic()
+        stats = {
+            "started_at": datetime.utcnow().isoformat(),
+            "hosts": 0,
+            "probed": 0,
+            "offline": 0,
+            "errors": 0,
+            "timeouts": 0,
+            "skipped": 0,
+            "alerts": 0,
+        }
+        latencies: List[float] = []
+        
+        db = SessionLocal()
+        executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="monitor")
+        try:
+            # 获取所有在线服务器，与会话分离后交给工作线程只读使用
+            servers = db.query(Server).filter(Server.status == 'online').all()
+            for server in servers:
+                db.expunge(server)
+            stats["hosts"] = len(servers)
+            
+            # 随机抖动避免所有主机在同一时刻被握手；由本线程到点提交，抖动不占用工作线程
+            scheduled = deque(sorted(
+                (_Probe(server, random.uniform(0, self.jitter) if self.jitter > 0 else 0) for server in servers),
+                key=lambda p: p.delay
+            ))
+            probes: Dict[Future, _Probe] = {}
+            
+            pending = set()
+            deadline = sweep_start + self.sweep_budget
+            while pending or scheduled:
+                now = time.monotonic()
+                while scheduled and sweep_start + scheduled[0].delay <= now:
+                    probe = scheduled.popleft()
+                    future = executor.submit(probe.run, self.host_timeout, deadline)
+                    probes[future] = probe
+                    pending.add(future)
+                
+                timeout = 0.5
+                if scheduled:
+                    timeout = min(timeout, max(0.0, sweep_start + scheduled[0].delay - now))
+                if not pending:
+                    time.sleep(timeout)
+                    continue
+                done, pending = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+                
+                for future in done:
+                    probe = probes[future]
+                    if probe.latency is not None:
+                        latencies.append(probe.latency)
+                    try:
+                        status = future.result()
+                    except CommandTimeout:
+                        # 采集命令在单机期限或整轮预算内未完成
+                        print(f"⏱️  Monitoring server {probe.server.id} timed out")
+                        stats["timeouts"] += 1
+                        continue
+                    except Exception as e:
+                        print(f"❌ Failed to monitor server {probe.server.id}: {str(e)}")
+                        stats["errors"] += 1
+                        continue
+                    
+                    if status is None:
+                        stats["errors"] += 1
+                    elif status.status != 'online':
+                        stats["offline"] += 1
+                    else:
+                        stats["probed"] += 1
+                        stats["alerts"] += self._handle_status(db, probe.server, status)
+                
+                # 超过单机期限的任务直接放弃，不再等待
+                now = time.monotonic()
+                for future in list(pending):
+                    probe = probes[future]
+                    if probe.started_at is not None and now - probe.started_at > self.host_timeout:
+                        pending.discard(future)
+                        stats["timeouts"] += 1
+                        print(f"⏱️  Monitoring server {probe.server.id} exceeded {self.host_timeout}s, abandoned")
+                
+                # 整轮巡检超出预算，剩余任务不再执行
+                if now > deadline:
+                    for future in pending:
+                        if future.cancel():
+                            stats["skipped"] += 1
+                        else:
+                            stats["timeouts"] += 1
+                    pending = set()
+                    stats["skipped"] += len(scheduled)
+                    scheduled.clear()
+        
+        except Exception as e:
+            print(f"❌ Monitoring job error: {str(e)}")
+        finally:
+            # 不等待被放弃的任务，避免阻塞下一轮
+            executor.shutdown(wait=False, cancel_futures=True)
+            db.close()
+        
+        p50 = percentile(latencies, 50)
+        p99 = percentile(latencies, 99)
+        stats["latency_p50_ms"] = round(p50 * 1000) if p50 is not None else None
+        stats["latency_p99_ms"] = round(p99 * 1000) if p99 is not None else None
+        stats["duration_ms"] = round((time.monotonic() - sweep_start) * 1000)
+        return stats
+    
+    @staticmethod
+    def _handle_status(db, server, status: ServerStatus) -> int:
+        """根据采集结果检查告警规则，返回触发的告警数"""
+        from app.services.alert_service import AlertService
+        from app.utils.metrics_store import metrics_store
+        
+        try:
+            # 写入时序存储
+            metrics_store.append(
+                server.id,
+                int(status.check_time.replace(tzinfo=timezone.utc).timestamp()),
+                cpu=status.cpu_percent,
+                memory=status.memory_percent,
+                disk=status.disk_percent,
+                load=status.load_1
+            )
+            
+            # 构建指标字典
+            metrics = {
+                'cpu': status.cpu_percent or 0,
+                'memory': status.memory_percent or 0,
+                'disk': status.disk_percent or 0
+            }
+            
+            # 检查告警规则并触发告警
+            alerts = AlertService.check_server_alerts_with_rules(db, server.id, metrics)
+            
+            if alerts:
+                print(f"⚠️  Triggered {len(alerts)} alert(s) for server {server.name} (ID: {server.id})")
+                for alert in alerts:
+                    print(f"   - [{alert.level.upper()}] {alert.title}: {alert.message}")
+            return len(alerts)
+        except Exception as e:
+            db.rollback()
+            print(f"❌ Failed to check alerts for server {server.id}: {str(e)}")
+            return 0
+    
+    def get_stats(self, limit: int = 10) -> List[dict]:
+        """最近几轮巡检的统计信息（最新在前）"""
+        return list(self.history)[-limit:][::-1]
+
+
+# 全局监控实例
+monitor_service = MonitorService(
+    max_workers=settings.MONITOR_MAX_WORKERS,
+    host_timeout=settings.MONITOR_HOST_TIMEOUT,
+    jitter=settings.MONITOR_JITTER,
+    sweep_budget=settings.MONITOR_INTERVAL * 0.9
+)
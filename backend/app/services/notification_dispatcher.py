@@ -0,0 +1,495 @@
+"""
+告警通知异步投递
+通知先以 pending 状态写入 alert_notifications 表（持久化队列），后台线程领取到期的通知后交给发送线程池：
+- 邮件复用同一个SMTP会话连续发送，空闲超时后断开
+- Webhook 使用带连接池的 requests.Session
+- 发送失败按指数退避重新排队，超过最大次数后标记为 failed
+- 按目标（邮箱/URL）令牌桶限流，超出速率的通知延后发送
+- 领取时记录时间，超过租约仍处于 sending 的通知（进程退出或状态更新失败）重新排队
+"""
+import random
+import smtplib
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+
+import requests
+from requests.adapters import HTTPAdapter
+from sqlalchemy import or_
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.core.database import SessionLocal
+from app.models.alert import Alert
+from app.models.alert_rule import AlertNotification, AlertRule
+
+
+class DeliveryError(Exception):
+    """发送失败；retryable为False时不再重试"""
+    
+    def __init__(self, message: str, retryable: bool = True):
+        super().__init__(message)
+        self.retryable = retryable
+
+
+class _RateLimiter:
+    """按目标的令牌桶"""
+    
+    def __init__(self, rate_per_minute: int, burst: Optional[int] = None):
+        self.rate = rate_per_minute / 60.0
+        self.burst = burst or max(1, rate_per_minute // 4)
+        self._lock = threading.Lock()
+        # 目标 -> (剩余令牌, 更新时间)
+        self._buckets: Dict[str, Tuple[float, float]] = {}
+    
+    def acquire(self, target: str) -> float:
+        """取一个令牌，成功返回0，否则返回需要等待的秒数"""
+        if self.rate <= 0:
+            return 0.0
+        with self._lock:
+            now = time.monotonic()
+            tokens, updated = self._buckets.get(target, (float(self.burst), now))
+            tokens = min(self.burst, tokens + (now - updated) * self.rate)
+            if tokens >= 1:
+                self._buckets[target] = (tokens - 1, now)
+                return 0.0
+            self._buckets[target] = (tokens, now)
+            return (1 - tokens) / self.rate
+
+
+class _SMTPSession:
+    """可复用的SMTP会话，多封邮件共用一次握手和登录"""
+    
+    def __init__(self, idle_timeout: int = 60):
+        self.idle_timeout = idle_timeout
+        self._lock = threading.Lock()
+        self._server: Optional[smtplib.SMTP] = None
+        self._last_used = 0.0
+    
+    @staticmethod
+    def _connect() -> smtplib.SMTP:
+        print(f"📧 连接SMTP服务器 {settings.SMTP_HOST}:{settings.SMTP_PORT}")
+        server = smtplib.SMTP(settings.SMTP_HOST, settings.SMTP_PORT, timeout=30)
+        try:
+            server.starttls()
+            server.login(settings.SMTP_USER, settings.SMTP_PASSWORD)
+        except Exception:
+            server.close()
+            raise
+        return server
+    
+    def _disconnect(self):
+        """断开会话（需持有锁）"""
+        if self._server is None:
+            return
+        try:
+            self._server.quit()
+        except Exception:
+            self._server.close()
+        self._server = None
+    
+    def send(self, msg):
+        """发送一封邮件，会话被服务器断开时重连一次"""
+        with self._lock:
+            if self._server is not None and time.monotonic() - self._last_used > self.idle_timeout:
+                self._disconnect()
+            for attempt in range(2):
+                if self._server is None:
+                    self._server = self._connect()
+                try:
+                    self._server.send_message(msg)
+                    self._last_used = time.monotonic()
+                    return
+                except smtplib.SMTPServerDisconnected:
+                    # 连接已断开，关闭残留的套接字后重连
+                    try:
+                        self._server.close()
+                    except Exception:
+                        pass
+                    self._server = None
+                    if attempt:
+                        raise
+                except smtplib.SMTPRecipientsRefused:
+                    # 仅该收件人被拒绝，会话仍可继续使用
+                    self._last_used = time.monotonic()
+                    raise
+                except Exception:
+                    # 会话状态未知，下次重新握手
+                    self._disconnect()
+                    raise
+    
+    def close_idle(self):
+        """断开空闲超时的会话"""
+        with self._lock:
+            if self._server is not None and time.monotonic() - self._last_used > self.idle_timeout:
+                self._disconnect()
+    
+    def close(self):
+        with self._lock:
+            self._disconnect()
+
+
+class _Job:
+    """已领取的待发送通知"""
+    
+    __slots__ = ("id", "notification_type", "recipient", "attempts", "claimed_at", "message", "payload", "headers")
+    
+    def __init__(self, notification: AlertNotification, claimed_at: Optional[datetime] = None):
+        self.id = notification.id
+        self.notification_type = notification.notification_type
+        self.recipient = notification.recipient
+        self.attempts = notification.attempts or 0
+        self.claimed_at = claimed_at
+        self.message = None
+        self.payload = None
+        self.headers = None
+
+
+class NotificationDispatcher:
+    """通知投递队列"""
+    
+    def __init__(self, workers: int = 4, max_attempts: int = 5, retry_base: int = 30,
+                 retry_max: int = 1800, rate_per_minute: int = 20,
+                 poll_interval: float = 5, smtp_idle_timeout: int = 60, claim_lease: int = 300):
+        self.workers = workers
+        self.max_attempts = max_attempts
+        self.retry_base = retry_base
+        self.retry_max = retry_max
+        self.poll_interval = poll_interval
+        self.claim_lease = claim_lease
+        
+        self._limiter = _RateLimiter(rate_per_minute)
+        self._smtp = _SMTPSession(smtp_idle_timeout)
+        self._http = requests.Session()
+        adapter = HTTPAdapter(pool_connections=workers, pool_maxsize=workers)
+        self._http.mount("http://", adapter)
+        self._http.mount("https://", adapter)
+        
+        self._wakeup = threading.Event()
+        self._stopping = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._inflight = 0
+        self._inflight_lock = threading.Lock()
+        self._last_reclaim: Optional[float] = None
+    
+    def enqueue(self, db: Session, alert: Alert, rule) -> List[AlertNotification]:
+        """按规则配置为告警创建待发送通知，立即返回"""
+        now = datetime.utcnow()
+        notifications = []
+        
+        if rule.enable_email and rule.email_recipients:
+            for recipient in rule.email_recipients:
+                notifications.append(AlertNotification(
+                    alert_id=alert.id,
+                    rule_id=rule.id,
+                    notification_type="email",
+                    recipient=recipient,
+                    status="pending",
+                    attempts=0,
+                    next_attempt_at=now
+                ))
+        
+        if rule.enable_webhook and rule.webhook_url:
+            notifications.append(AlertNotification(
+                alert_id=alert.id,
+                rule_id=rule.id,
+                notification_type="webhook",
+                recipient=rule.webhook_url,
+                status="pending",
+                attempts=0,
+                next_attempt_at=now
+            ))
+        
+        if notifications:
+            db.add_all(notifications)
+            db.commit()
+            self.wake()
+        return notifications
+    
+    def requeue(self, db: Session, notification: AlertNotification) -> AlertNotification:
+        """将失败的通知重新放入队列，重置重试次数"""
+        notification.status = "pending"
+        notification.attempts = 0
+        notification.next_attempt_at = datetime.utcnow()
+        notification.error_message = None
+        db.commit()
+        db.refresh(notification)
+        self.wake()
+        return notification
+    
+    def wake(self):
+        """唤醒投递线程"""
+        self._wakeup.set()
+    
+    def start(self):
+        """启动投递线程（租约过期的sending通知由投递线程重新排队，不影响其他进程正在发送的通知）"""
+        if self._thread is not None and self._thread.is_alive():
+            return
+        
+        self._stopping.clear()
+        self._last_reclaim = None
+        self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="notify")
+        self._thread = threading.Thread(target=self._run, name="notify-dispatcher", daemon=True)
+        self._thread.start()
+    
+    def stop(self):
+        """停止投递，未发送的通知保留在队列中"""
+        self._stopping.set()
+        self._wakeup.set()
+        if self._thread is not None:
+            self._thread.join(timeout=10)
+            self._thread = None
+        if self._executor is not None:
+            self._executor.shutdown(wait=True, cancel_futures=True)
+            self._executor = None
+        self._smtp.close()
+        self._http.close()
+    
+    def _run(self):
+        while not self._stopping.is_set():
+            self._wakeup.clear()
+            claimed = 0
+            try:
+                self._reclaim_expired()
+                claimed = self._dispatch_due()
+            except Exception as e:
+                print(f"❌ Notification dispatch error: {str(e)}")
+            self._smtp.close_idle()
+            # 领满一批说明队列里可能还有到期通知，发送线程空出后再领
+            self._wakeup.wait(self.poll_interval if claimed == 0 else 0.5)
+    
+    def _reclaim_expired(self):
+        """
+        租约过期的sending通知重新排队（每半个租约检查一次）
+        
+        领取后进程退出、或发送后状态更新失败的通知都会停留在sending，租约过期后按未发送处理，
+        可能重复发送一次；旧版本留下的没有领取时间的sending通知同样视为过期
+        """
+        now_mono = time.monotonic()
+        if self._last_reclaim is not None and now_mono - self._last_reclaim < self.claim_lease / 2:
+            return
+        self._last_reclaim = now_mono
+        
+        now = datetime.utcnow()
+        db = SessionLocal()
+        try:
+            reclaimed = db.query(AlertNotification).filter(
+                AlertNotification.status == "sending",
+                or_(AlertNotification.claimed_at == None,
+                    AlertNotification.claimed_at < now - timedelta(seconds=self.claim_lease))
+            ).update({"status": "pending", "claimed_at": None, "next_attempt_at": now}, synchronize_session=False)
+            db.commit()
+        finally:
+            db.close()
+        if reclaimed:
+            print(f"♻️  Requeued {reclaimed} notifications whose delivery lease expired")
+    
+    def _capacity(self) -> int:
+        with self._inflight_lock:
+            return max(0, self.workers * 2 - self._inflight)
+    
+    def _dispatch_due(self) -> int:
+        """领取到期的通知并提交给发送线程"""
+        capacity = self._capacity()
+        if capacity == 0:
+            return 0
+        
+        db = SessionLocal()
+        jobs: List[_Job] = []
+        try:
+            # 领取时间精确到秒，状态更新时按其比对（部分数据库的DATETIME不保存微秒）
+            now = datetime.utcnow().replace(microsecond=0)
+            candidates = db.query(AlertNotification).filter(
+                AlertNotification.status == "pending",
+                or_(AlertNotification.next_attempt_at == None, AlertNotification.next_attempt_at <= now)
+            ).order_by(AlertNotification.id).limit(capacity).all()
+            if not candidates:
+                return 0
+            
+            alerts = {
+                alert.id: alert for alert in db.query(Alert).filter(
+                    Alert.id.in_({n.alert_id for n in candidates})
+                ).all()
+            }
+            rule_ids = {n.rule_id for n in candidates if n.rule_id}
+            rules = {
+                rule.id: rule for rule in db.query(AlertRule).filter(AlertRule.id.in_(rule_ids)).all()
+            } if rule_ids else {}
+            
+            for notification in candidates:
+                # 条件更新领取，多进程部署时同一通知只会被领取一次
+                claimed = db.query(AlertNotification).filter(
+                    AlertNotification.id == notification.id,
+                    AlertNotification.status == "pending"
+                ).update({"status": "sending", "claimed_at": now}, synchronize_session=False)
+                if not claimed:
+                    continue
+                
+                alert = alerts.get(notification.alert_id)
+                skip_reason = self._skip_reason(notification, alert)
+                if skip_reason:
+                    notification.status = "skipped"
+                    notification.error_message = skip_reason
+                    print(f"⚠️  {skip_reason}，跳过发送到 {notification.recipient}")
+                    continue
+                
+                job = self._build_job(notification, alert, rules.get(notification.rule_id))
+                job.claimed_at = now
+                jobs.append(job)
+            db.commit()
+        finally:
+            db.close()
+        
+        for job in jobs:
+            with self._inflight_lock:
+                self._inflight += 1
+            self._executor.submit(self._deliver, job)
+        return len(jobs)
+    
+    @staticmethod
+    def _skip_reason(notification: AlertNotification, alert: Optional[Alert]) -> Optional[str]:
+        if alert is None:
+            return "关联告警不存在"
+        if notification.notification_type == "email":
+            if not settings.SMTP_ENABLED:
+                return "邮件通知未启用 (SMTP_ENABLED=False)"
+            if not settings.SMTP_USER or not settings.SMTP_PASSWORD:
+                return "SMTP账号未配置 (SMTP_USER或SMTP_PASSWORD为空)"
+        elif notification.notification_type != "webhook":
+            return f"不支持的通知类型: {notification.notification_type}"
+        return None
+    
+    @staticmethod
+    def _build_job(notification: AlertNotification, alert: Alert, rule: Optional[AlertRule]) -> _Job:
+        """在会话内渲染通知内容，发送线程不再访问数据库对象"""
+        from app.services.notification_service import NotificationService
+        
+        job = _Job(notification)
+        if job.notification_type == "email":
+            job.message = NotificationService.build_email_message(alert, notification.recipient)
+        else:
+            job.payload = NotificationService.build_webhook_payload(alert)
+            job.headers = dict(rule.webhook_headers or {}) if rule else {}
+        return job
+    
+    def _deliver(self, job: _Job):
+        """发送线程：发送一条通知并更新状态"""
+        try:
+            wait = self._limiter.acquire(job.recipient)
+            if wait > 0:
+                # 超出目标速率，不计入重试次数
+                self._update(job, status="pending",
+                             next_attempt_at=datetime.utcnow() + timedelta(seconds=wait))
+                return
+            
+            try:
+                if job.notification_type == "email":
+                    self._send_email(job)
+                else:
+                    self._send_webhook(job)
+            except Exception as e:
+                self._handle_failure(job, e)
+                return
+            
+            self._update(job, status="sent", attempts=job.attempts + 1,
+                         sent_at=datetime.utcnow(), error_message=None)
+            print(f"✅ {job.notification_type}通知发送成功到 {job.recipient}")
+        except Exception as e:
+            print(f"❌ Failed to deliver notification {job.id}: {str(e)}")
+        finally:
+            with self._inflight_lock:
+                self._inflight -= 1
+            self.wake()
+    
+    def _send_email(self, job: _Job):
+        try:
+            self._smtp.send(job.message)
+        except smtplib.SMTPAuthenticationError as e:
+            raise DeliveryError(f"SMTP认证失败: {str(e)}", retryable=False)
+        except smtplib.SMTPRecipientsRefused as e:
+            raise DeliveryError(f"收件人被拒绝: {str(e)}", retryable=False)
+        except smtplib.SMTPException as e:
+            raise DeliveryError(f"SMTP错误: {str(e)}")
+    
+    def _send_webhook(self, job: _Job):
+        request_headers = {
+            "Content-Type": "application/json",
+            "User-Agent": "DevOps-Platform/1.0"
+        }
+        request_headers.update(job.headers or {})
+        
+        try:
+            response = self._http.post(job.recipient, json=job.payload, headers=request_headers, timeout=10)
+        except requests.exceptions.Timeout:
+            raise DeliveryError("请求超时")
+        except requests.exceptions.RequestException as e:
+            raise DeliveryError(f"请求失败: {str(e)}")
+        
+        if response.status_code not in (200, 201, 202, 204):
+            # 4xx（除超时和限流外）属于配置错误，重试无意义
+            retryable = response.status_code >= 500 or response.status_code in (408, 429)
+            raise DeliveryError(f"HTTP {response.status_code}: {response.text[:500]}", retryable=retryable)
+    
+    def _retry_delay(self, attempts: int) -> float:
+        """指数退避（带±20%抖动）"""
+        delay = min(self.retry_max, self.retry_base * 2 ** (attempts - 1))
+        return delay * random.uniform(0.8, 1.2)
+    
+    def _handle_failure(self, job: _Job, error: Exception):
+        attempts = job.attempts + 1
+        message = str(error)[:1000]
+        retryable = getattr(error, "retryable", True)
+        
+        if retryable and attempts < self.max_attempts:
+            delay = self._retry_delay(attempts)
+            self._update(job, status="pending", attempts=attempts, error_message=message,
+                         next_attempt_at=datetime.utcnow() + timedelta(seconds=delay))
+            print(f"⚠️  {job.notification_type}通知发送失败 ({attempts}/{self.max_attempts})，"
+                  f"{delay:.0f}秒后重试: {message}")
+        else:
+            self._update(job, status="failed", attempts=attempts, error_message=message)
+            print(f"❌ {job.notification_type}通知发送失败到 {job.recipient}: {message}")
+    
+    @staticmethod
+    def _update(job: _Job, **fields):
+        """更新已领取通知的状态；租约已过期并被重新领取时不覆盖"""
+        fields.setdefault("claimed_at", None)
+        db = SessionLocal()
+        try:
+            updated = db.query(AlertNotification).filter(
+                AlertNotification.id == job.id,
+                AlertNotification.status == "sending",
+                AlertNotification.claimed_at == job.claimed_at
+            ).update(fields, synchronize_session=False)
+            db.commit()
+        finally:
+            db.close()
+        if not updated:
+            print(f"⚠️  Notification {job.id} lease expired before its status was saved")
+    
+    def stats(self) -> dict:
+        """队列状态"""
+        with self._inflight_lock:
+            inflight = self._inflight
+        db = SessionLocal()
+        try:
+            pending = db.query(AlertNotification).filter(AlertNotification.status == "pending").count()
+        finally:
+            db.close()
+        return {"pending": pending, "inflight": inflight, "workers": self.workers}
+
+
+# 全局通知投递实例
+notification_dispatcher = NotificationDispatcher(
+    workers=settings.NOTIFY_WORKERS,
+    max_attempts=settings.NOTIFY_MAX_ATTEMPTS,
+    retry_base=settings.NOTIFY_RETRY_BASE,
+    retry_max=settings.NOTIFY_RETRY_MAX,
+    rate_per_minute=settings.NOTIFY_RATE_PER_MINUTE,
+    poll_interval=settings.NOTIFY_POLL_INTERVAL,
+    smtp_idle_timeout=settings.SMTP_IDLE_TIMEOUT,
+    claim_lease=settings.NOTIFY_CLAIM_LEASE
+)
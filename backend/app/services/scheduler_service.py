@@ -3,8 +3,10 @@ from apscheduler.triggers.cron import CronTrigger
 from apscheduler.triggers.interval import IntervalTrigger
 from sqlalchemy.orm import Session
 from datetime import datetime
+from app.core.config import settings
 from app.core.database import SessionLocal
 from app.models.task import Task, TaskExecution
+from app.services.execution_output_service import ExecutionOutputService
 from app.services.script_service import ScriptService
 
 
@@ -17,6 +19,11 @@ class SchedulerService:
         
         # 添加系统级监控任务
         self._add_system_monitoring_job()
+        self._add_ssh_pool_maintenance_job()
+        self._add_metrics_store_jobs()
+        self._add_script_output_retention_job()
+        self._add_k8s_health_job()
+        self._add_k8s_metrics_job()
     
     def add_task(self, task_id: int, cron_expression: str):
         """添加定时任务"""
@@ -73,16 +80,15 @@ class SchedulerService:
                 
                 if result:
                     execution.status = result.status
-                    execution.output = result.output
-                    execution.error = result.error
+                    ExecutionOutputService.copy(db, "script", result.id, "task", execution.id)
                 else:
                     execution.status = "failed"
-                    execution.error = "Failed to execute script"
+                    ExecutionOutputService.save(db, "task", execution.id, stderr="Failed to execute script")
             
             elif task.task_type == "command" and task.command:
                 # 执行命令（TODO: 实现命令执行逻辑）
                 execution.status = "success"
-                execution.output = "Command executed"
+                ExecutionOutputService.save(db, "task", execution.id, stdout="Command executed")
             
             execution.end_time = datetime.utcnow()
             
@@ -96,7 +102,7 @@ class SchedulerService:
             print(f"Task execution failed: {str(e)}")
             if execution:
                 execution.status = "failed"
-                execution.error = str(e)
+                ExecutionOutputService.save(db, "task", execution.id, stderr=str(e))
                 execution.end_time = datetime.utcnow()
                 db.commit()
         finally:
@@ -104,59 +110,94 @@ class SchedulerService:
     
     def _add_system_monitoring_job(self):
         """添加系统级的监控任务"""
-        # 每分钟检查一次所有服务器的资源使用情况并触发告警
+        # 定期并发检查所有服务器的资源使用情况并触发告警
         self.scheduler.add_job(
             func=self._monitor_servers,
-            trigger=IntervalTrigger(minutes=1),
+            trigger=IntervalTrigger(seconds=settings.MONITOR_INTERVAL),
             id='system_monitoring',
             name='System Resource Monitoring',
+            replace_existing=True,
+            max_instances=1,
+            coalesce=True
+        )
+        print(f"✅ System monitoring job added: Check servers every {settings.MONITOR_INTERVAL} seconds")
+    
+    def _add_ssh_pool_maintenance_job(self):
+        """添加SSH连接池回收任务"""
+        from app.utils.ssh_pool import ssh_pool
+        
+        self.scheduler.add_job(
+            func=ssh_pool.evict_idle,
+            trigger=IntervalTrigger(minutes=1),
+            id='ssh_pool_maintenance',
+            name='SSH Connection Pool Maintenance',
             replace_existing=True
         )
-        print("✅ System monitoring job added: Check servers every 1 minute")
     
-    def _monitor_servers(self):
-        """监控所有服务器的资源使用情况并触发告警"""
-        from app.models.server import Server
-        from app.services.server_service import ServerService
-        from app.services.alert_service import AlertService
+    def _add_metrics_store_jobs(self):
+        """添加时序存储落盘与过期清理任务"""
+        from app.utils.metrics_store import metrics_store
+        from app.services.k8s_metrics_service import k8s_metrics_store
         
-        db = SessionLocal()
+        for name, store in (('metrics_store', metrics_store), ('k8s_metrics_store', k8s_metrics_store)):
+            self.scheduler.add_job(
+                func=store.flush,
+                trigger=IntervalTrigger(minutes=1),
+                id=f'{name}_flush',
+                name=f'{name} flush',
+                replace_existing=True
+            )
+            self.scheduler.add_job(
+                func=store.enforce_retention,
+                trigger=IntervalTrigger(hours=1),
+                id=f'{name}_retention',
+                name=f'{name} retention',
+                replace_existing=True
+            )
+    
+    def _add_script_output_retention_job(self):
+        """添加脚本落盘输出清理任务"""
+        self.scheduler.add_job(
+            func=ScriptService.enforce_output_retention,
+            trigger=IntervalTrigger(hours=1),
+            id='script_output_retention',
+            name='Script output retention',
+            replace_existing=True
+        )
+    
+    def _add_k8s_health_job(self):
+        """添加K8s集群健康巡检任务"""
+        from app.services.k8s_health_service import k8s_health_service
         
-        try:
-            # 获取所有在线服务器
-            servers = db.query(Server).filter(Server.status == 'online').all()
-            
-            for server in servers:
-                try:
-                    # 获取服务器实时状态
-                    status = ServerService.get_server_status(db, server.id)
-                    
-                    if status and status.status == 'online':
-                        # 构建指标字典
-                        metrics = {
-                            'cpu': status.cpu_percent or 0,
-                            'memory': status.memory_percent or 0,
-                            'disk': status.disk_percent or 0
-                        }
-                        
-                        # 检查告警规则并触发告警
-                        alerts = AlertService.check_server_alerts_with_rules(
-                            db, server.id, metrics
-                        )
-                        
-                        if alerts:
-                            print(f"⚠️  Triggered {len(alerts)} alert(s) for server {server.name} (ID: {server.id})")
-                            for alert in alerts:
-                                print(f"   - [{alert.level.upper()}] {alert.title}: {alert.message}")
-                        
-                except Exception as e:
-                    print(f"❌ Failed to monitor server {server.id}: {str(e)}")
-                    continue
+        self.scheduler.add_job(
+            func=k8s_health_service.run_sweep,
+            trigger=IntervalTrigger(seconds=settings.K8S_HEALTH_INTERVAL),
+            id='k8s_health',
+            name='K8s Cluster Health Check',
+            replace_existing=True,
+            max_instances=1,
+            coalesce=True
+        )
+    
+    def _add_k8s_metrics_job(self):
+        """添加K8s资源使用量采集任务"""
+        from app.services.k8s_metrics_service import k8s_metrics_service
         
-        except Exception as e:
-            print(f"❌ Monitoring job error: {str(e)}")
-        finally:
-            db.close()
+        self.scheduler.add_job(
+            func=k8s_metrics_service.collect_all,
+            trigger=IntervalTrigger(seconds=settings.K8S_METRICS_INTERVAL),
+            id='k8s_metrics',
+            name='K8s Resource Usage Collection',
+            replace_existing=True,
+            max_instances=1,
+            coalesce=True
+        )
+    
+    def _monitor_servers(self):
+        """监控所有服务器的资源使用情况并触发告警"""
+        from app.services.monitor_service import monitor_service
+        
+        monitor_service.run_sweep()
     
     def load_tasks(self):
         """从数据库加载所有启用的任务"""
@@ -1,14 +1,26 @@
 from sqlalchemy.orm import Session
-from typing import List, Optional
+from typing import Callable, Iterator, List, Optional, Tuple
 from datetime import datetime
+from app.core.config import settings
+from app.core.database import SessionLocal
+from app.services.execution_output_service import ExecutionOutputService
 from app.models.script import Script, ScriptExecution
 from app.models.server import Server
 from app.schemas.script import ScriptCreate
-from app.utils.ssh_client import SSHClient
-import tempfile
+from app.utils.output_capture import OutputCapture, enforce_retention, ensure_dir, remove_spill
+from app.utils.script_cache import remote_script_cache
+from app.utils.ssh_client import CommandTimeout
+from app.utils.ssh_pool import ssh_pool
+import codecs
+import queue
+import threading
 import os
 
 
+# 实时输出流无输出多久（秒）后发送一次心跳
+STREAM_KEEPALIVE_SECONDS = 15
+
+
 class ScriptService:
     """脚本服务"""
     
@@ -53,13 +65,55 @@ class ScriptService:
         if not db_script:
             return False
         
+        # 执行记录随脚本一起删除（包括压缩输出和落盘文件）
+        executions = db.query(ScriptExecution.id, ScriptExecution.output_path).filter(
+            ScriptExecution.script_id == script_id
+        ).all()
+        ScriptService._delete_executions(db, executions)
         db.delete(db_script)
         db.commit()
         return True
     
     @staticmethod
-    def execute_script(db: Session, script_id: int, server_id: int, user_id: int) -> Optional[ScriptExecution]:
-        """执行脚本"""
+    def _delete_executions(db: Session, executions: List[Tuple[int, Optional[str]]]):
+        """删除执行记录及其输出（不提交）"""
+        ids = [execution_id for execution_id, _ in executions]
+        if not ids:
+            return
+        ExecutionOutputService.delete(db, "script", ids)
+        db.query(ScriptExecution).filter(ScriptExecution.id.in_(ids)).delete(synchronize_session=False)
+        for _, output_path in executions:
+            remove_spill(output_path)
+    
+    @staticmethod
+    def enforce_output_retention() -> int:
+        """按保留天数和总大小清理落盘输出，返回删除的文件数"""
+        deleted = enforce_retention(
+            settings.SCRIPT_OUTPUT_DIR,
+            settings.SCRIPT_OUTPUT_RETENTION_DAYS * 86400,
+            settings.SCRIPT_OUTPUT_MAX_BYTES
+        )
+        if deleted:
+            print(f"🧹 Removed {deleted} expired script output files")
+        return deleted
+    
+    @staticmethod
+    def execute_script(
+        db: Session,
+        script_id: int,
+        server_id: int,
+        user_id: int,
+        on_output: Optional[Callable[[bool, bytes], None]] = None
+    ) -> Optional[ScriptExecution]:
+        """执行脚本（on_output见run_execution）"""
+        execution = ScriptService.start_execution(db, script_id, server_id, user_id)
+        if not execution:
+            return None
+        return ScriptService.run_execution(db, execution, on_output)
+    
+    @staticmethod
+    def start_execution(db: Session, script_id: int, server_id: int, user_id: int) -> Optional[ScriptExecution]:
+        """校验脚本和服务器，创建running状态的执行记录"""
         script = ScriptService.get_script(db, script_id)
         if not script:
             return None
@@ -79,91 +133,192 @@ class ScriptService:
         db.add(execution)
         db.commit()
         db.refresh(execution)
+        return execution
+    
+    @staticmethod
+    def run_execution(
+        db: Session,
+        execution: ScriptExecution,
+        on_output: Optional[Callable[[bool, bytes], None]] = None
+    ) -> ScriptExecution:
+        """
+        在远程服务器上运行脚本并更新执行记录
         
-        # 连接服务器并执行脚本
-        ssh = SSHClient(
-            host=server.host,
-            port=server.port,
-            username=server.username,
-            password=server.password,
-            ssh_key=server.ssh_key
-        )
+        stdout/stderr边读边处理：执行记录只保存开头和结尾（SCRIPT_OUTPUT_HEAD/TAIL），
+        超出上限的完整输出落盘到SCRIPT_OUTPUT_DIR，内存占用与输出大小无关
         
-        if not ssh.connect():
-            execution.status = "failed"
-            execution.error = "Failed to connect to server"
-            execution.end_time = datetime.utcnow()
-            db.commit()
-            return execution
+        Args:
+            on_output: 输出到达时的回调 (是否为stderr, 数据块)，在执行线程中调用，不应阻塞
+        """
+        script = ScriptService.get_script(db, execution.script_id)
+        server = db.query(Server).filter(Server.id == execution.server_id).first()
         
-        try:
-            # 根据脚本类型确定文件后缀和执行命令
-            script_type = script.script_type or 'shell'
-            
-            # 文件后缀映射
-            suffix_map = {
-                'shell': '.sh',
-                'bash': '.sh',
-                'python': '.py',
-                'python3': '.py',
-                'perl': '.pl',
-                'ruby': '.rb'
-            }
-            suffix = suffix_map.get(script_type, '.sh')
-            
-            # 执行命令映射
-            command_map = {
-                'shell': 'bash',
-                'bash': 'bash',
-                'python': 'python3',
-                'python3': 'python3',
-                'perl': 'perl',
-                'ruby': 'ruby'
-            }
-            interpreter = command_map.get(script_type, 'bash')
-            
-            # 将脚本上传到远程服务器
-            with tempfile.NamedTemporaryFile(mode='w', suffix=suffix, delete=False) as f:
-                f.write(script.content)
-                local_path = f.name
-            
-            remote_path = f"/tmp/script_{execution.id}{suffix}"
-            
-            if not ssh.upload_file(local_path, remote_path):
+        # 从连接池借用连接并执行脚本
+        with ssh_pool.connection(server) as ssh:
+            if not ssh:
                 execution.status = "failed"
-                execution.error = "Failed to upload script"
+                ExecutionOutputService.save(db, "script", execution.id, stderr="Failed to connect to server")
                 execution.end_time = datetime.utcnow()
                 db.commit()
                 return execution
             
-            # 根据脚本类型执行
-            print(f"📝 执行{script_type}脚本: {interpreter} {remote_path}")
-            stdout, stderr, exit_code = ssh.execute_command(f"{interpreter} {remote_path}")
-            
-            # 清理远程脚本文件
-            ssh.execute_command(f"rm {remote_path}")
-            
-            # 更新执行记录
-            execution.output = stdout
-            execution.error = stderr
-            execution.exit_code = exit_code
-            execution.status = "success" if exit_code == 0 else "failed"
-            execution.end_time = datetime.utcnow()
-            
-            # 清理本地临时文件
-            os.unlink(local_path)
+            try:
+                # 根据脚本类型确定文件后缀和执行命令
+                script_type = script.script_type or 'shell'
+                
+                # 文件后缀映射
+                suffix_map = {
+                    'shell': '.sh',
+                    'bash': '.sh',
+                    'python': '.py',
+                    'python3': '.py',
+                    'perl': '.pl',
+                    'ruby': '.rb'
+                }
+                suffix = suffix_map.get(script_type, '.sh')
+                
+                # 执行命令映射
+                command_map = {
+                    'shell': 'bash',
+                    'bash': 'bash',
+                    'python': 'python3',
+                    'python3': 'python3',
+                    'perl': 'perl',
+                    'ruby': 'ruby'
+                }
+                interpreter = command_map.get(script_type, 'bash')
+                
+                # 根据脚本类型执行
+                print(f"📝 执行{script_type}脚本: {interpreter} (script {script.id})")
+                capture = OutputCapture(
+                    settings.SCRIPT_OUTPUT_HEAD,
+                    settings.SCRIPT_OUTPUT_TAIL,
+                    os.path.join(ensure_dir(settings.SCRIPT_OUTPUT_DIR), f"script_{execution.id}")
+                )
+                
+                def feed(is_stderr: bool, data: bytes):
+                    capture.feed(is_stderr, data)
+                    if on_output is not None:
+                        on_output(is_stderr, data)
+                
+                timed_out = False
+                try:
+                    # 脚本按内容哈希缓存在远程主机上，内容不变时不再传输
+                    exit_code = remote_script_cache.run(
+                        ssh, script.content, suffix, interpreter, feed, settings.SCRIPT_TIMEOUT
+                    )
+                except CommandTimeout:
+                    exit_code, timed_out = -1, True
+                finally:
+                    capture.close()
+                
+                # 更新执行记录
+                error = capture.stderr.render()
+                if timed_out:
+                    error += f"\n脚本执行超时（{settings.SCRIPT_TIMEOUT:g}s）"
+                ExecutionOutputService.save(db, "script", execution.id, stdout=capture.stdout.render(), stderr=error)
+                execution.output_bytes = capture.stdout.total
+                execution.error_bytes = capture.stderr.total
+                execution.output_truncated = capture.stdout.truncated or capture.stderr.truncated
+                execution.output_path = capture.spill_base if capture.spilled else None
+                execution.exit_code = exit_code
+                execution.status = "success" if exit_code == 0 else "failed"
+                execution.end_time = datetime.utcnow()
             
-        except Exception as e:
-            execution.status = "failed"
-            execution.error = str(e)
-            execution.end_time = datetime.utcnow()
-        finally:
-            ssh.close()
+            except Exception as e:
+                execution.status = "failed"
+                ExecutionOutputService.save(db, "script", execution.id, stderr=str(e))
+                execution.end_time = datetime.utcnow()
         
         db.commit()
         db.refresh(execution)
         return execution
     
+    @staticmethod
+    def stream_execution(execution_id: int) -> Iterator[Tuple[str, Optional[dict]]]:
+        """
+        在后台线程中运行已创建的执行记录，实时产出输出事件：
+        
+        - ("output", {"stream", "text"})  按到达顺序的输出片段（UTF-8增量解码）
+        - ("dropped", {"bytes"})          客户端读取过慢被丢弃的实时输出累计字节数（执行记录和落盘文件不受影响）
+        - ("keepalive", None)             长时间无输出时的心跳
+        - ("end", {...})                  执行结束后的记录摘要
+        
+        调用方停止迭代（如客户端断开）后脚本继续执行，执行记录照常更新
+        """
+        chunks: queue.Queue = queue.Queue(maxsize=settings.SCRIPT_STREAM_QUEUE)
+        dropped = [0]
+        done = threading.Event()
+        
+        def on_output(is_stderr: bool, data: bytes):
+            try:
+                chunks.put_nowait((is_stderr, data))
+            except queue.Full:
+                dropped[0] += len(data)
+        
+        def run():
+            db = SessionLocal()
+            try:
+                execution = db.query(ScriptExecution).filter(ScriptExecution.id == execution_id).first()
+                ScriptService.run_execution(db, execution, on_output)
+            except Exception as e:
+                print(f"❌ Script execution {execution_id} error: {str(e)}")
+            finally:
+                db.close()
+                done.set()
+        
+        threading.Thread(target=run, name=f"script-exec-{execution_id}", daemon=True).start()
+        
+        decoders = {
+            is_stderr: codecs.getincrementaldecoder('utf-8')(errors='replace') for is_stderr in (False, True)
+        }
+        reported_dropped = 0
+        idle = 0
+        while True:
+            try:
+                is_stderr, data = chunks.get(timeout=1)
+            except queue.Empty:
+                if done.is_set() and chunks.empty():
+                    break
+                idle += 1
+                if idle >= STREAM_KEEPALIVE_SECONDS:
+                    idle = 0
+                    yield "keepalive", None
+                continue
+            
+            idle = 0
+            text = decoders[is_stderr].decode(data)
+            if text:
+                yield "output", {"stream": "stderr" if is_stderr else "stdout", "text": text}
+            if dropped[0] > reported_dropped:
+                reported_dropped = dropped[0]
+                yield "dropped", {"bytes": reported_dropped}
+        
+        for is_stderr, decoder in decoders.items():
+            text = decoder.decode(b"", final=True)
+            if text:
+                yield "output", {"stream": "stderr" if is_stderr else "stdout", "text": text}
+        if dropped[0] > reported_dropped:
+            yield "dropped", {"bytes": dropped[0]}
+        
+        db = SessionLocal()
+        try:
+            execution = db.query(ScriptExecution).filter(ScriptExecution.id == execution_id).first()
+            yield "end", {
+                "execution_id": execution_id,
+                "status": execution.status,
+                "exit_code": execution.exit_code,
+                "output_bytes": execution.output_bytes,
+                "error_bytes": execution.error_bytes,
+                "output_truncated": execution.output_truncated,
+                "error": (
+                    ExecutionOutputService.load_text(db, "script", execution_id, "stderr")
+                    if execution.exit_code is None else None
+                ),
+            }
+        finally:
+            db.close()
+    
     @staticmethod
     def get_executions(db: Session, skip: int = 0, limit: int = 100) -> List[ScriptExecution]:
         """获取执行记录列表"""
@@ -3,7 +3,10 @@ from typing import List, Optional
 from datetime import datetime
 from app.models.server import Server
 from app.schemas.server import ServerCreate, ServerUpdate, ServerStatus
-from app.utils.ssh_client import SSHClient
+from app.utils.ssh_client import CommandTimeout
+from app.utils.ssh_pool import ssh_pool
+from app.utils.metrics_store import metrics_store
+from app.services.alert_rule_index import alert_rule_index
 
 
 class ServerService:
@@ -48,6 +51,11 @@ class ServerService:
         
         db.commit()
         db.refresh(db_server)
+        
+        # 连接参数变更后丢弃池中的旧连接
+        if update_data.keys() & {"host", "port", "username", "password", "ssh_key"}:
+            ssh_pool.invalidate(server_id)
+        
         return db_server
     
     @staticmethod
@@ -59,6 +67,9 @@ class ServerService:
         
         db.delete(db_server)
         db.commit()
+        ssh_pool.invalidate(server_id)
+        metrics_store.drop_server(server_id)
+        alert_rule_index.remove_server(server_id)
         return True
     
     @staticmethod
@@ -68,23 +79,18 @@ class ServerService:
         if not server:
             return {"success": False, "message": "Server not found"}
         
-        ssh = SSHClient(
-            host=server.host,
-            port=server.port,
-            username=server.username,
-            password=server.password,
-            ssh_key=server.ssh_key
-        )
+        # 测试连接时强制重新握手，成功的连接留在池中供后续复用
+        ssh_pool.invalidate(server_id)
+        with ssh_pool.connection(server) as ssh:
+            connected = ssh is not None
         
-        if ssh.connect():
-            ssh.close()
+        server.last_check_time = datetime.utcnow()
+        if connected:
             server.status = "online"
-            server.last_check_time = datetime.utcnow()
             db.commit()
             return {"success": True, "message": "Connection successful"}
         else:
             server.status = "offline"
-            server.last_check_time = datetime.utcnow()
             db.commit()
             return {"success": False, "message": "Connection failed"}
     
@@ -95,36 +101,27 @@ class ServerService:
         if not server:
             return False
         
-        ssh = SSHClient(
-            host=server.host,
-            port=server.port,
-            username=server.username,
-            password=server.password,
-            ssh_key=server.ssh_key
-        )
-        
-        if not ssh.connect():
-            server.status = "offline"
-            server.last_check_time = datetime.utcnow()
-            db.commit()
-            return False
-        
-        try:
-            info = ssh.get_system_info()
-            server.os_type = info.get('os_type')
-            server.os_version = info.get('os_version')
-            server.cpu_cores = info.get('cpu_cores')
-            server.memory_total = info.get('memory_total')
-            server.disk_total = info.get('disk_total')
-            server.status = "online"
-            server.last_check_time = datetime.utcnow()
-            db.commit()
-            return True
-        except Exception as e:
-            print(f"Failed to update server info: {str(e)}")
-            return False
-        finally:
-            ssh.close()
+        with ssh_pool.connection(server) as ssh:
+            if not ssh:
+                server.status = "offline"
+                server.last_check_time = datetime.utcnow()
+                db.commit()
+                return False
+            
+            try:
+                info = ssh.get_system_info()
+                server.os_type = info.get('os_type')
+                server.os_version = info.get('os_version')
+                server.cpu_cores = info.get('cpu_cores')
+                server.memory_total = info.get('memory_total')
+                server.disk_total = info.get('disk_total')
+                server.status = "online"
+                server.last_check_time = datetime.utcnow()
+                db.commit()
+                return True
+            except Exception as e:
+                print(f"Failed to update server info: {str(e)}")
+                return False
     
     @staticmethod
     def get_server_status(db: Session, server_id: int) -> Optional[ServerStatus]:
@@ -133,39 +130,47 @@ class ServerService:
         if not server:
             return None
         
-        ssh = SSHClient(
-            host=server.host,
-            port=server.port,
-            username=server.username,
-            password=server.password,
-            ssh_key=server.ssh_key
-        )
+        return ServerService.probe_server_status(server)
+    
+    @staticmethod
+    def probe_server_status(server: Server, timeout: Optional[float] = None) -> Optional[ServerStatus]:
+        """
+        通过SSH采集服务器实时状态
         
-        if not ssh.connect():
-            return ServerStatus(
-                server_id=server_id,
-                status="offline",
-                check_time=datetime.utcnow()
-            )
+        不访问数据库，可在监控线程池中并发调用；timeout为远程采集命令的整体超时（秒）
         
-        try:
-            usage = ssh.get_resource_usage()
-            return ServerStatus(
-                server_id=server_id,
-                status="online",
-                cpu_percent=usage.get('cpu_percent'),
-                memory_percent=usage.get('memory_percent'),
-                memory_used=usage.get('memory_used'),
-                memory_total=usage.get('memory_total'),
-                disk_percent=usage.get('disk_percent'),
-                disk_used=usage.get('disk_used'),
-                disk_total=usage.get('disk_total'),
-                uptime=usage.get('uptime'),
-                check_time=datetime.utcnow()
-            )
-        except Exception as e:
-            print(f"Failed to get server status: {str(e)}")
-            return None
-        finally:
-            ssh.close()
+        Raises:
+            CommandTimeout: 远程采集命令超时（由调用方计入超时而非失败）
+        """
+        with ssh_pool.connection(server) as ssh:
+            if not ssh:
+                return ServerStatus(
+                    server_id=server.id,
+                    status="offline",
+                    check_time=datetime.utcnow()
+                )
+            
+            try:
+                usage = ssh.get_resource_usage(timeout)
+                return ServerStatus(
+                    server_id=server.id,
+                    status="online",
+                    cpu_percent=usage.get('cpu_percent'),
+                    memory_percent=usage.get('memory_percent'),
+                    memory_used=usage.get('memory_used'),
+                    memory_total=usage.get('memory_total'),
+                    disk_percent=usage.get('disk_percent'),
+                    disk_used=usage.get('disk_used'),
+                    disk_total=usage.get('disk_total'),
+                    load_1=usage.get('load_1'),
+                    load_5=usage.get('load_5'),
+                    load_15=usage.get('load_15'),
+                    uptime=usage.get('uptime'),
+                    check_time=datetime.utcnow()
+                )
+            except CommandTimeout:
+                raise
+            except Exception as e:
+                print(f"Failed to get server status: {str(e)}")
+                return None
 
@@ -83,4 +83,8 @@ class TaskService:
             query = query.filter(TaskExecution.task_id == task_id)
         
         return query.order_by(TaskExecution.start_time.desc()).offset(skip).limit(limit).all()
-
+    
+    @staticmethod
+    def get_execution(db: Session, execution_id: int) -> Optional[TaskExecution]:
+        """获取单个执行记录"""
+        return db.query(TaskExecution).filter(TaskExecution.id == execution_id).first()
@@ -0,0 +1,93 @@
+"""
+HTTP字节范围请求（Range: bytes=...）
+只支持单个范围；多个范围或无法解析时按完整内容返回
+"""
+import re
+from typing import Callable, Iterator, Optional, Tuple
+
+from fastapi import HTTPException
+from fastapi.responses import Response, StreamingResponse
+
+_RANGE_RE = re.compile(r"^bytes=(\d*)-(\d*)$")
+
+# 从文件读取范围时每次读取的字节数
+FILE_CHUNK_SIZE = 64 * 1024
+
+
+def parse_range(header: Optional[str], size: int) -> Optional[Tuple[int, int]]:
+    """
+    解析Range请求头
+    
+    Returns:
+        (起始, 结束)闭区间；没有Range或无法解析时为None
+    
+    Raises:
+        HTTPException: 416，范围超出内容大小
+    """
+    match = _RANGE_RE.match((header or "").strip())
+    if not match or match.groups() == ("", ""):
+        return None
+    first, last = match.groups()
+    if first:
+        start = int(first)
+        end = min(int(last), size - 1) if last else size - 1
+        if last and int(last) < start:
+            return None
+    else:
+        # bytes=-N：最后N个字节
+        start = max(size - int(last), 0)
+        end = size - 1
+    if start >= size or end < start:
+        raise HTTPException(
+            status_code=416,
+            detail="Requested range not satisfiable",
+            headers={"Content-Range": f"bytes */{size}"}
+        )
+    return start, end
+
+
+def range_response(
+    range_header: Optional[str],
+    size: int,
+    read: Callable[[int, int], Iterator[bytes]],
+    media_type: str = "text/plain; charset=utf-8",
+    filename: Optional[str] = None
+) -> Response:
+    """
+    按Range请求头返回完整内容（200）或部分内容（206）
+    
+    Args:
+        read: read(起始, 长度) 产出该范围内的数据块
+    """
+    headers = {"Accept-Ranges": "bytes"}
+    if filename:
+        headers["Content-Disposition"] = f'attachment; filename="{filename}"'
+    
+    byte_range = parse_range(range_header, size)
+    status_code, start, length = 200, 0, size
+    if byte_range is not None:
+        start, end = byte_range
+        status_code, length = 206, end - start + 1
+        headers["Content-Range"] = f"bytes {start}-{end}/{size}"
+    headers["Content-Length"] = str(length)
+    return StreamingResponse(read(start, length), status_code=status_code, media_type=media_type, headers=headers)
+
+
+def bytes_reader(data: bytes) -> Callable[[int, int], Iterator[bytes]]:
+    def read(start: int, length: int) -> Iterator[bytes]:
+        yield data[start:start + length]
+    return read
+
+
+def file_reader(path: str) -> Callable[[int, int], Iterator[bytes]]:
+    def read(start: int, length: int) -> Iterator[bytes]:
+        with open(path, "rb") as f:
+            f.seek(start)
+            while length > 0:
+                chunk = f.read(min(FILE_CHUNK_SIZE, length))
+                if not chunk:
+                    break
+                length -= len(chunk)
+                yield chunk
+    return read
+
@@ -1,13 +1,43 @@
 """
 Kubernetes客户端工具类
 """
-import tempfile
+import base64
+import copy
+import hashlib
+import json
+import math
 import os
-from typing import Optional, List, Dict, Any
+import ssl
+import tempfile
+import threading
+from collections import Counter
+from datetime import datetime
+from typing import Optional, List, Dict, Any, Callable, Tuple, Iterator, Iterable
 from kubernetes import client, config
 from kubernetes.client.rest import ApiException
+import urllib3
 import yaml
 
+from app.core.config import settings
+from app.utils.k8s_quantity import parse_quantity, format_cpu, format_memory
+
+
+# 日志流每次读取的字节数，以及单行最大缓冲字节数
+LOG_CHUNK_SIZE = 16 * 1024
+LOG_MAX_LINE_BYTES = 64 * 1024
+
+# 按命名空间计数的资源 -> 全集群list路径
+COUNTED_RESOURCE_PATHS = {
+    'pods': '/api/v1/pods',
+    'services': '/api/v1/services',
+    'deployments': '/apis/apps/v1/deployments',
+    'configmaps': '/api/v1/configmaps',
+    'secrets': '/api/v1/secrets',
+}
+
+# 只返回对象元数据（不含spec和ConfigMap/Secret的数据内容）
+METADATA_ACCEPT = "application/json;as=PartialObjectMetadataList;v=v1;g=meta.k8s.io,application/json"
+
 
 class K8sClient:
     """Kubernetes客户端封装"""
@@ -20,7 +50,8 @@ class K8sClient:
         token: Optional[str] = None,
         ca_cert: Optional[str] = None,
         client_cert: Optional[str] = None,
-        client_key: Optional[str] = None
+        client_key: Optional[str] = None,
+        page_size: Optional[int] = None
     ):
         """
         初始化K8s客户端
@@ -33,6 +64,7 @@ class K8sClient:
             ca_cert: CA证书
             client_cert: 客户端证书
             client_key: 客户端密钥
+            page_size: list接口每页对象数（limit），默认取K8S_LIST_PAGE_SIZE
         """
         self.api_server = api_server
         self.auth_type = auth_type
@@ -41,6 +73,7 @@ class K8sClient:
         self.ca_cert = ca_cert
         self.client_cert = client_cert
         self.client_key = client_key
+        self.page_size = page_size or settings.K8S_LIST_PAGE_SIZE
         
         self._api_client = None
         self._core_v1 = None
@@ -50,25 +83,31 @@ class K8sClient:
         """
         连接到K8s集群
         
+        凭据只在内存中使用：每个客户端有独立的Configuration和连接池，不修改全局默认配置
+        
         Returns:
             (连接成功/失败, 错误信息)
         """
-        self._temp_files = []  # 存储临时文件路径，用于清理
-        
         try:
             configuration = client.Configuration()
+            ssl_context = None
             
+            verify = bool(self.ca_cert)
             if self.auth_type == "kubeconfig" and self.kubeconfig:
-                # 使用kubeconfig
-                kubeconfig_file = tempfile.NamedTemporaryFile(mode='w', delete=False, suffix='.yaml')
-                kubeconfig_file.write(self.kubeconfig)
-                kubeconfig_file.close()
-                self._temp_files.append(kubeconfig_file.name)
-                
+                # 使用kubeconfig：证书和密钥从当前上下文中取出，在内存中构建SSLContext；
+                # 其余部分（地址、token、exec插件等）加载到本客户端的Configuration。
+                # 不能把*-data字段交给kube_config，它会把证书写入临时文件且进程退出前不删除
                 try:
-                    config.load_kube_config(config_file=kubeconfig_file.name)
-                    # 获取当前配置
-                    configuration = client.Configuration.get_default_copy()
+                    kubeconfig, ca_cert, client_cert, client_key, insecure = _split_kubeconfig(
+                        yaml.safe_load(self.kubeconfig)
+                    )
+                    config.load_kube_config_from_dict(
+                        kubeconfig,
+                        client_configuration=configuration,
+                        persist_config=False
+                    )
+                    verify = not insecure
+                    ssl_context = self._build_ssl_context(ca_cert, client_cert, client_key, verify)
                 except Exception as e:
                     return False, f"Kubeconfig加载失败: {str(e)}"
             
@@ -79,73 +118,39 @@ class K8sClient:
                 
                 configuration.host = self.api_server
                 configuration.api_key = {"authorization": f"Bearer {self.token}"}
-                
-                if self.ca_cert:
-                    ca_cert_file = tempfile.NamedTemporaryFile(mode='w', delete=False, suffix='.crt')
-                    ca_cert_file.write(self.ca_cert)
-                    ca_cert_file.close()
-                    self._temp_files.append(ca_cert_file.name)
-                    configuration.ssl_ca_cert = ca_cert_file.name
-                else:
-                    # 跳过SSL验证（仅用于测试环境）
-                    configuration.verify_ssl = False
-                    import urllib3
-                    urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
+                ssl_context = self._build_ssl_context(self.ca_cert, self.client_cert, self.client_key, verify)
             
             elif self.auth_type == "cert":
                 # 使用证书认证
                 if not self.api_server:
                     return False, "API Server地址不能为空"
+                if not (self.client_cert and self.client_key):
+                    return False, "客户端证书和密钥不能为空"
                 
                 configuration.host = self.api_server
-                
-                if self.ca_cert:
-                    ca_cert_file = tempfile.NamedTemporaryFile(mode='w', delete=False, suffix='.crt')
-                    ca_cert_file.write(self.ca_cert)
-                    ca_cert_file.close()
-                    self._temp_files.append(ca_cert_file.name)
-                    configuration.ssl_ca_cert = ca_cert_file.name
-                
-                if self.client_cert and self.client_key:
-                    client_cert_file = tempfile.NamedTemporaryFile(mode='w', delete=False, suffix='.crt')
-                    client_cert_file.write(self.client_cert)
-                    client_cert_file.close()
-                    self._temp_files.append(client_cert_file.name)
-                    configuration.cert_file = client_cert_file.name
-                    
-                    client_key_file = tempfile.NamedTemporaryFile(mode='w', delete=False, suffix='.key')
-                    client_key_file.write(self.client_key)
-                    client_key_file.close()
-                    self._temp_files.append(client_key_file.name)
-                    configuration.key_file = client_key_file.name
-                else:
-                    return False, "客户端证书和密钥不能为空"
+                ssl_context = self._build_ssl_context(self.ca_cert, self.client_cert, self.client_key, verify)
             else:
                 return False, f"不支持的认证类型: {self.auth_type}"
             
-            # 设置超时
-            configuration.timeout = 10
+            # 长连接池，大小需容纳informer的watch连接和并发请求
+            configuration.connection_pool_maxsize = settings.K8S_CONNECTION_POOL_SIZE
             
             # 创建API客户端
             self._api_client = client.ApiClient(configuration)
+            if ssl_context is not None:
+                # 证书内容在内存中，替换为使用该SSLContext的连接池
+                self._api_client.rest_client.pool_manager = urllib3.PoolManager(
+                    num_pools=4,
+                    maxsize=configuration.connection_pool_maxsize,
+                    ssl_context=ssl_context,
+                    cert_reqs=ssl.CERT_REQUIRED if verify else ssl.CERT_NONE,
+                    assert_hostname=None if verify else False
+                )
             self._core_v1 = client.CoreV1Api(self._api_client)
             self._apps_v1 = client.AppsV1Api(self._api_client)
             
-            # 测试连接 - 尝试获取命名空间列表
-            try:
-                self._core_v1.list_namespace(limit=1, _request_timeout=5)
-            except ApiException as e:
-                if e.status == 401:
-                    return False, "认证失败：Token或证书无效"
-                elif e.status == 403:
-                    return False, "权限不足：请检查账号权限"
-                elif e.status == 404:
-                    return False, "API端点不存在：请检查API Server地址"
-                else:
-                    return False, f"API调用失败 ({e.status}): {e.reason}"
-            
-            return True, None
-            
+            return self.probe()
+        
         except ApiException as e:
             error_msg = f"Kubernetes API错误 ({e.status}): {e.reason}"
             print(error_msg)
@@ -155,6 +160,87 @@ class K8sClient:
             print(error_msg)
             return False, error_msg
     
+    def probe(self, timeout: float = 5) -> tuple[bool, Optional[str]]:
+        """测试连接 - 尝试获取命名空间列表（同时验证认证和权限）"""
+        try:
+            self._core_v1.list_namespace(limit=1, _request_timeout=timeout)
+        except ApiException as e:
+            return False, self._describe_api_error(e)
+        except Exception as e:
+            return False, f"连接失败: {type(e).__name__} - {str(e)}"
+        return True, None
+    
+    def check_health(self, timeout: float = 5) -> Dict[str, Any]:
+        """
+        轻量健康检查：/version判断存活，/readyz判断API Server是否就绪
+        
+        Returns:
+            {"live", "ready"(无权限或不支持时为None), "version", "error"}
+        """
+        result = {'live': False, 'ready': None, 'version': None, 'error': None}
+        try:
+            version_info = client.VersionApi(self._api_client).get_code(_request_timeout=timeout)
+            result['version'] = version_info.git_version
+            result['live'] = True
+        except ApiException as e:
+            result['error'] = self._describe_api_error(e)
+            return result
+        except Exception as e:
+            result['error'] = f"连接失败: {type(e).__name__} - {str(e)}"
+            return result
+        
+        try:
+            response = self._api_client.call_api(
+                '/readyz', 'GET',
+                auth_settings=['BearerToken'],
+                _preload_content=False,
+                _request_timeout=timeout
+            )
+            response.release_conn()
+            result['ready'] = True
+        except ApiException as e:
+            if e.status not in (401, 403, 404):
+                # 未就绪时响应体列出失败的检查项
+                body = e.body.decode('utf-8', errors='replace') if isinstance(e.body, bytes) else e.body
+                result['ready'] = False
+                result['error'] = f"API Server未就绪 ({e.status}): {(body or e.reason or '')[:500]}"
+        except Exception as e:
+            result['ready'] = False
+            result['error'] = f"就绪检查失败: {type(e).__name__} - {str(e)}"
+        return result
+    
+    @staticmethod
+    def _describe_api_error(e: ApiException) -> str:
+        if e.status == 401:
+            return "认证失败：Token或证书无效"
+        elif e.status == 403:
+            return "权限不足：请检查账号权限"
+        elif e.status == 404:
+            return "API端点不存在：请检查API Server地址"
+        return f"API调用失败 ({e.status}): {e.reason}"
+    
+    @staticmethod
+    def _build_ssl_context(ca_cert: Optional[str], client_cert: Optional[str],
+                           client_key: Optional[str], verify: bool) -> ssl.SSLContext:
+        """
+        从内存中的CA和客户端证书构建SSLContext
+        
+        Args:
+            verify: 是否校验服务端证书；校验且没有CA证书时使用系统CA
+        """
+        if verify:
+            context = ssl.create_default_context(cadata=ca_cert) if ca_cert else ssl.create_default_context()
+        else:
+            # 跳过SSL验证（仅用于测试环境）
+            context = ssl.create_default_context()
+            context.check_hostname = False
+            context.verify_mode = ssl.CERT_NONE
+            urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
+        
+        if client_cert and client_key:
+            _load_cert_chain(context, client_cert, client_key)
+        return context
+    
     def get_version(self) -> Optional[str]:
         """获取Kubernetes版本"""
         try:
@@ -165,95 +251,351 @@ class K8sClient:
             print(f"获取版本失败: {str(e)}")
             return None
     
-    def list_nodes(self) -> List[Dict[str, Any]]:
-        """获取节点列表"""
-        try:
-            nodes = self._core_v1.list_node()
-            result = []
-            
-            for node in nodes.items:
-                node_info = {
-                    'node_name': node.metadata.name,
-                    'node_ip': self._get_node_ip(node),
-                    'status': self._get_node_status(node),
-                    'roles': self._get_node_roles(node),
-                    'cpu_capacity': node.status.capacity.get('cpu', '0'),
-                    'memory_capacity': node.status.capacity.get('memory', '0'),
-                    'cpu_allocatable': node.status.allocatable.get('cpu', '0'),
-                    'memory_allocatable': node.status.allocatable.get('memory', '0'),
-                    'pod_capacity': int(node.status.capacity.get('pods', 0)),
-                    'os_image': node.status.node_info.os_image,
-                    'kernel_version': node.status.node_info.kernel_version,
-                    'container_runtime': node.status.node_info.container_runtime_version,
-                    'kubelet_version': node.status.node_info.kubelet_version,
-                }
-                result.append(node_info)
-            
-            return result
-        except Exception as e:
-            print(f"获取节点列表失败: {str(e)}")
-            return []
+    def list_nodes(self, raw: bool = False) -> Iterator[Dict[str, Any]]:
+        """逐个返回节点（分页获取，异常向上抛出）"""
+        to_dict = self._node_from_raw if raw else self._node_to_dict
+        for items, _ in self.list_pages(self._core_v1.list_node, raw):
+            for node in items:
+                yield to_dict(node)
     
-    def list_namespaces(self) -> List[Dict[str, Any]]:
-        """获取命名空间列表"""
-        try:
-            namespaces = self._core_v1.list_namespace()
-            result = []
-            
-            for ns in namespaces.items:
-                ns_info = {
-                    'namespace_name': ns.metadata.name,
-                    'status': ns.status.phase,
-                    'labels': ns.metadata.labels or {},
-                }
-                result.append(ns_info)
-            
-            return result
-        except Exception as e:
-            print(f"获取命名空间列表失败: {str(e)}")
-            return []
+    def list_namespaces(self, raw: bool = False) -> Iterator[Dict[str, Any]]:
+        """逐个返回命名空间（分页获取，异常向上抛出）"""
+        to_dict = self._namespace_from_raw if raw else self._namespace_to_dict
+        for items, _ in self.list_pages(self._core_v1.list_namespace, raw):
+            for ns in items:
+                yield to_dict(ns)
     
-    def list_pods(self, namespace: Optional[str] = None) -> List[Dict[str, Any]]:
-        """获取Pod列表"""
-        try:
-            if namespace:
-                pods = self._core_v1.list_namespaced_pod(namespace)
+    def list_pods(self, namespace: Optional[str] = None, raw: bool = False) -> Iterator[Dict[str, Any]]:
+        """逐个返回Pod（分页获取，异常向上抛出）"""
+        to_dict = self._pod_from_raw if raw else self._pod_to_dict
+        if namespace:
+            pages = self.list_pages(self._core_v1.list_namespaced_pod, raw, namespace=namespace)
+        else:
+            pages = self.list_pages(self._core_v1.list_pod_for_all_namespaces, raw)
+        for items, _ in pages:
+            for pod in items:
+                yield to_dict(pod)
+    
+    def list_pages(self, list_func: Callable, raw: bool = False, **kwargs) -> Iterator[Tuple[list, str]]:
+        """
+        按limit/continue分页调用list接口，内存占用以单页为上限
+        
+        Args:
+            list_func: CoreV1Api/AppsV1Api的list方法
+            raw: 为True时跳过OpenAPI模型反序列化，直接解析JSON（对象为camelCase字典）
+        
+        Yields:
+            (本页对象列表, 列表的resourceVersion)
+        """
+        _continue = None
+        while True:
+            if raw:
+                response = list_func(
+                    limit=self.page_size, _continue=_continue, _preload_content=False, **kwargs
+                )
+                body = json.loads(response.data)
+                response.release_conn()
+                items = body.get('items') or []
+                metadata = body.get('metadata') or {}
+                resource_version = metadata.get('resourceVersion')
+                _continue = metadata.get('continue')
             else:
-                pods = self._core_v1.list_pod_for_all_namespaces()
-            
-            result = []
-            for pod in pods.items:
-                pod_info = {
-                    'pod_name': pod.metadata.name,
-                    'namespace': pod.metadata.namespace,
-                    'node_name': pod.spec.node_name,
-                    'status': pod.status.phase,
-                    'pod_ip': pod.status.pod_ip,
-                    'host_ip': pod.status.host_ip,
-                    'labels': pod.metadata.labels or {},
-                    'start_time': pod.status.start_time,
-                    'ready_containers': self._count_ready_containers(pod),
-                    'total_containers': len(pod.spec.containers),
-                    'restart_count': self._get_restart_count(pod),
-                }
-                result.append(pod_info)
+                response = list_func(limit=self.page_size, _continue=_continue, **kwargs)
+                items = response.items
+                resource_version = response.metadata.resource_version
+                _continue = response.metadata._continue
             
-            return result
-        except Exception as e:
-            print(f"获取Pod列表失败: {str(e)}")
-            return []
+            yield items, resource_version
+            if not _continue:
+                break
+    
+    def list_metadata_pages(self, kind: str) -> Iterator[Tuple[List[dict], str]]:
+        """
+        分页获取全集群对象的元数据（PartialObjectMetadataList），用于计数等只需要名称/命名空间的场景
+        
+        Args:
+            kind: COUNTED_RESOURCE_PATHS中的资源类型
+        
+        Yields:
+            (本页对象列表（原始JSON）, 列表的resourceVersion)
+        """
+        _continue = None
+        while True:
+            query_params = [('limit', self.page_size)]
+            if _continue:
+                query_params.append(('continue', _continue))
+            response, _, _ = self._api_client.call_api(
+                COUNTED_RESOURCE_PATHS[kind], 'GET',
+                query_params=query_params,
+                header_params={'Accept': METADATA_ACCEPT},
+                auth_settings=['BearerToken'],
+                _preload_content=False,
+                _request_timeout=60
+            )
+            try:
+                body = json.loads(response.data)
+            finally:
+                response.release_conn()
+            metadata = body.get('metadata') or {}
+            _continue = metadata.get('continue')
+            yield body.get('items') or [], metadata.get('resourceVersion')
+            if not _continue:
+                break
+    
+    def count_by_namespace(self, kind: str) -> Dict[str, int]:
+        """一次全集群list（只取元数据），按命名空间统计对象数"""
+        counts = Counter()
+        for items, _ in self.list_metadata_pages(kind):
+            counts.update((item.get('metadata') or {}).get('namespace') for item in items)
+        counts.pop(None, None)
+        return dict(counts)
+    
+    def resource_source(self, kind: str) -> Tuple[Callable, Callable[[Any], Dict[str, Any]]]:
+        """
+        获取资源类型的全集群list函数和转换函数（供informer做list + watch）
+        
+        Args:
+            kind: nodes, namespaces, pods, deployments
+        """
+        sources = {
+            'nodes': (self._core_v1.list_node, self._node_to_dict),
+            'namespaces': (self._core_v1.list_namespace, self._namespace_to_dict),
+            'pods': (self._core_v1.list_pod_for_all_namespaces, self._pod_to_dict),
+            'deployments': (self._apps_v1.list_deployment_for_all_namespaces, self._deployment_to_dict),
+        }
+        return sources[kind]
+    
+    def iter_resource_pages(self, kind: str) -> Iterator[Tuple[List[Dict[str, Any]], str]]:
+        """
+        分页获取资源类型的全部对象（原始JSON解析），逐页返回转换后的字典
+        
+        Yields:
+            (本页对象字典列表, 列表的resourceVersion)
+        """
+        list_func, _ = self.resource_source(kind)
+        from_raw = {
+            'nodes': self._node_from_raw,
+            'namespaces': self._namespace_from_raw,
+            'pods': self._pod_from_raw,
+            'deployments': self._deployment_from_raw,
+        }[kind]
+        for items, resource_version in self.list_pages(list_func, raw=True):
+            yield [from_raw(item) for item in items], resource_version
+    
+    def _node_to_dict(self, node) -> Dict[str, Any]:
+        return {
+            'uid': node.metadata.uid,
+            'resource_version': node.metadata.resource_version,
+            'node_name': node.metadata.name,
+            'node_ip': self._get_node_ip(node),
+            'status': self._get_node_status(node),
+            'roles': self._get_node_roles(node),
+            'cpu_capacity': node.status.capacity.get('cpu', '0'),
+            'memory_capacity': node.status.capacity.get('memory', '0'),
+            'cpu_allocatable': node.status.allocatable.get('cpu', '0'),
+            'memory_allocatable': node.status.allocatable.get('memory', '0'),
+            'pod_capacity': int(node.status.capacity.get('pods', 0)),
+            'os_image': node.status.node_info.os_image,
+            'kernel_version': node.status.node_info.kernel_version,
+            'container_runtime': node.status.node_info.container_runtime_version,
+            'kubelet_version': node.status.node_info.kubelet_version,
+        }
+    
+    @staticmethod
+    def _namespace_to_dict(ns) -> Dict[str, Any]:
+        return {
+            'uid': ns.metadata.uid,
+            'resource_version': ns.metadata.resource_version,
+            'namespace_name': ns.metadata.name,
+            'status': ns.status.phase,
+            'labels': ns.metadata.labels or {},
+        }
+    
+    def _pod_to_dict(self, pod) -> Dict[str, Any]:
+        return {
+            'uid': pod.metadata.uid,
+            'resource_version': pod.metadata.resource_version,
+            'pod_name': pod.metadata.name,
+            'namespace': pod.metadata.namespace,
+            'node_name': pod.spec.node_name,
+            'status': pod.status.phase,
+            'pod_ip': pod.status.pod_ip,
+            'host_ip': pod.status.host_ip,
+            'labels': pod.metadata.labels or {},
+            'start_time': pod.status.start_time,
+            'ready_containers': self._count_ready_containers(pod),
+            'total_containers': len(pod.spec.containers),
+            'restart_count': self._get_restart_count(pod),
+            **_sum_container_resources(
+                (c.resources.requests, c.resources.limits) if c.resources else (None, None)
+                for c in pod.spec.containers
+            ),
+        }
+    
+    @staticmethod
+    def _deployment_to_dict(deploy) -> Dict[str, Any]:
+        return {
+            'uid': deploy.metadata.uid,
+            'resource_version': deploy.metadata.resource_version,
+            'name': deploy.metadata.name,
+            'namespace': deploy.metadata.namespace,
+            'replicas': deploy.spec.replicas,
+            'ready_replicas': deploy.status.ready_replicas or 0,
+            'available_replicas': deploy.status.available_replicas or 0,
+            'labels': deploy.metadata.labels or {},
+            'created_at': deploy.metadata.creation_timestamp,
+        }
+    
+    @staticmethod
+    def _parse_time(value: Optional[str]) -> Optional[datetime]:
+        """解析RFC3339时间（原始JSON中的时间字段）"""
+        if not value:
+            return None
+        return datetime.fromisoformat(value.replace('Z', '+00:00'))
+    
+    @staticmethod
+    def _node_from_raw(node: dict) -> Dict[str, Any]:
+        metadata = node.get('metadata') or {}
+        status = node.get('status') or {}
+        labels = metadata.get('labels') or {}
+        capacity = status.get('capacity') or {}
+        allocatable = status.get('allocatable') or {}
+        node_info = status.get('nodeInfo') or {}
+        
+        node_ip = next(
+            (a.get('address') for a in status.get('addresses') or [] if a.get('type') == "InternalIP"), ""
+        )
+        node_status = "Unknown"
+        for condition in status.get('conditions') or []:
+            if condition.get('type') == "Ready":
+                node_status = "Ready" if condition.get('status') == "True" else "NotReady"
+                break
+        roles = [key.split("/")[1] for key in labels if key.startswith("node-role.kubernetes.io/")]
+        
+        return {
+            'uid': metadata.get('uid'),
+            'resource_version': metadata.get('resourceVersion'),
+            'node_name': metadata.get('name'),
+            'node_ip': node_ip,
+            'status': node_status,
+            'roles': roles or ["worker"],
+            'cpu_capacity': capacity.get('cpu', '0'),
+            'memory_capacity': capacity.get('memory', '0'),
+            'cpu_allocatable': allocatable.get('cpu', '0'),
+            'memory_allocatable': allocatable.get('memory', '0'),
+            'pod_capacity': int(capacity.get('pods', 0)),
+            'os_image': node_info.get('osImage'),
+            'kernel_version': node_info.get('kernelVersion'),
+            'container_runtime': node_info.get('containerRuntimeVersion'),
+            'kubelet_version': node_info.get('kubeletVersion'),
+        }
+    
+    @staticmethod
+    def _namespace_from_raw(ns: dict) -> Dict[str, Any]:
+        metadata = ns.get('metadata') or {}
+        return {
+            'uid': metadata.get('uid'),
+            'resource_version': metadata.get('resourceVersion'),
+            'namespace_name': metadata.get('name'),
+            'status': (ns.get('status') or {}).get('phase'),
+            'labels': metadata.get('labels') or {},
+        }
+    
+    @staticmethod
+    def _pod_from_raw(pod: dict) -> Dict[str, Any]:
+        metadata = pod.get('metadata') or {}
+        spec = pod.get('spec') or {}
+        status = pod.get('status') or {}
+        container_statuses = status.get('containerStatuses') or []
+        return {
+            'uid': metadata.get('uid'),
+            'resource_version': metadata.get('resourceVersion'),
+            'pod_name': metadata.get('name'),
+            'namespace': metadata.get('namespace'),
+            'node_name': spec.get('nodeName'),
+            'status': status.get('phase'),
+            'pod_ip': status.get('podIP'),
+            'host_ip': status.get('hostIP'),
+            'labels': metadata.get('labels') or {},
+            'start_time': K8sClient._parse_time(status.get('startTime')),
+            'ready_containers': sum(1 for c in container_statuses if c.get('ready')),
+            'total_containers': len(spec.get('containers') or []),
+            'restart_count': sum(c.get('restartCount', 0) for c in container_statuses),
+            **_sum_container_resources(
+                ((c.get('resources') or {}).get('requests'), (c.get('resources') or {}).get('limits'))
+                for c in spec.get('containers') or []
+            ),
+        }
+    
+    @staticmethod
+    def _deployment_from_raw(deploy: dict) -> Dict[str, Any]:
+        metadata = deploy.get('metadata') or {}
+        status = deploy.get('status') or {}
+        return {
+            'uid': metadata.get('uid'),
+            'resource_version': metadata.get('resourceVersion'),
+            'name': metadata.get('name'),
+            'namespace': metadata.get('namespace'),
+            'replicas': (deploy.get('spec') or {}).get('replicas'),
+            'ready_replicas': status.get('readyReplicas') or 0,
+            'available_replicas': status.get('availableReplicas') or 0,
+            'labels': metadata.get('labels') or {},
+            'created_at': K8sClient._parse_time(metadata.get('creationTimestamp')),
+        }
+    
+    def _list_usage(self, plural: str) -> List[dict]:
+        """一次请求获取metrics.k8s.io中的全部对象（原始JSON）"""
+        response = client.CustomObjectsApi(self._api_client).list_cluster_custom_object(
+            'metrics.k8s.io', 'v1beta1', plural,
+            _preload_content=False,
+            _request_timeout=30
+        )
+        try:
+            return json.loads(response.data).get('items') or []
+        finally:
+            response.release_conn()
+    
+    def list_node_metrics(self) -> List[Dict[str, Any]]:
+        """
+        获取全部节点的实时使用量（需要metrics-server，未安装时抛出404 ApiException）
+        
+        Returns:
+            [{"name", "cpu", "memory"}]，数量为原始字符串（如 "250m"、"1024Ki"）
+        """
+        return [
+            {
+                'name': item['metadata']['name'],
+                'cpu': item.get('usage', {}).get('cpu'),
+                'memory': item.get('usage', {}).get('memory'),
+            }
+            for item in self._list_usage('nodes')
+        ]
+    
+    def list_pod_metrics(self) -> List[Dict[str, Any]]:
+        """
+        获取全部Pod的实时使用量（一次请求）
+        
+        Returns:
+            [{"namespace", "name", "cpu": [各容器], "memory": [各容器]}]
+        """
+        result = []
+        for item in self._list_usage('pods'):
+            containers = item.get('containers') or []
+            result.append({
+                'namespace': item['metadata']['namespace'],
+                'name': item['metadata']['name'],
+                'cpu': [(c.get('usage') or {}).get('cpu') for c in containers],
+                'memory': [(c.get('usage') or {}).get('memory') for c in containers],
+            })
+        return result
     
     def get_cluster_stats(self) -> Dict[str, Any]:
-        """获取集群统计信息"""
+        """获取集群统计信息（只计数，不保留对象）"""
         try:
-            nodes = self.list_nodes()
-            namespaces = self.list_namespaces()
-            pods = self.list_pods()
-            
             return {
-                'node_count': len(nodes),
-                'namespace_count': len(namespaces),
-                'pod_count': len(pods),
+                'node_count': sum(1 for _ in self.list_nodes(raw=True)),
+                'namespace_count': sum(1 for _ in self.list_namespaces(raw=True)),
+                'pod_count': sum(1 for _ in self.list_pods(raw=True)),
             }
         except Exception as e:
             print(f"获取集群统计失败: {str(e)}")
@@ -314,6 +656,64 @@ class K8sClient:
         except Exception as e:
             return f"获取日志失败: {str(e)}"
     
+    def stream_pod_logs(
+        self,
+        namespace: str,
+        pod_name: str,
+        container: Optional[str] = None,
+        follow: bool = False,
+        since_seconds: Optional[int] = None,
+        tail_lines: Optional[int] = None,
+        limit_bytes: Optional[int] = None,
+        timestamps: bool = False
+    ) -> Iterator[bytes]:
+        """
+        打开Pod日志流，返回逐行读取的生成器
+        
+        请求在调用时立即发出（Pod不存在等错误以ApiException抛出），之后按到达顺序逐行产出，
+        内存占用与日志总量无关。生成器关闭时断开与API Server的连接。
+        """
+        if follow:
+            # 跟随模式只限制连接时间，读取超时为日志静默多久后结束
+            request_timeout = (10, settings.K8S_LOG_FOLLOW_IDLE_TIMEOUT)
+        else:
+            request_timeout = (10, 60)
+        response = self._core_v1.read_namespaced_pod_log(
+            name=pod_name,
+            namespace=namespace,
+            container=container,
+            follow=follow,
+            since_seconds=since_seconds,
+            tail_lines=tail_lines,
+            limit_bytes=limit_bytes,
+            timestamps=timestamps,
+            _preload_content=False,
+            _request_timeout=request_timeout
+        )
+        return self._iter_log_lines(response)
+    
+    @staticmethod
+    def _iter_log_lines(response) -> Iterator[bytes]:
+        pending = b''
+        try:
+            for chunk in response.stream(LOG_CHUNK_SIZE, decode_content=True):
+                pending += chunk
+                *lines, pending = pending.split(b'\n')
+                for line in lines:
+                    yield line + b'\n'
+                # 超长的单行直接输出，避免缓冲无限增长
+                if len(pending) > LOG_MAX_LINE_BYTES:
+                    yield pending
+                    pending = b''
+            if pending:
+                yield pending
+        except urllib3.exceptions.ReadTimeoutError:
+            # 跟随模式下长时间没有新日志，结束本次流（客户端可带since_seconds重连）
+            return
+        finally:
+            response.close()
+            response.release_conn()
+    
     def delete_pod(self, namespace: str, pod_name: str) -> bool:
         """删除Pod（重启）"""
         try:
@@ -326,69 +726,242 @@ class K8sClient:
             print(f"删除Pod失败: {str(e)}")
             return False
     
-    def list_deployments(self, namespace: Optional[str] = None) -> List[Dict[str, Any]]:
-        """获取Deployment列表"""
-        try:
-            if namespace:
-                deployments = self._apps_v1.list_namespaced_deployment(namespace)
-            else:
-                deployments = self._apps_v1.list_deployment_for_all_namespaces()
-            
-            result = []
-            for deploy in deployments.items:
-                deploy_info = {
-                    'name': deploy.metadata.name,
-                    'namespace': deploy.metadata.namespace,
-                    'replicas': deploy.spec.replicas,
-                    'ready_replicas': deploy.status.ready_replicas or 0,
-                    'available_replicas': deploy.status.available_replicas or 0,
-                    'labels': deploy.metadata.labels or {},
-                    'created_at': deploy.metadata.creation_timestamp,
-                }
-                result.append(deploy_info)
-            
-            return result
-        except Exception as e:
-            print(f"获取Deployment列表失败: {str(e)}")
-            return []
+    def list_deployments(self, namespace: Optional[str] = None, raw: bool = False,
+                         label_selector: Optional[str] = None) -> Iterator[Dict[str, Any]]:
+        """逐个返回Deployment（分页获取，异常向上抛出；label_selector由API Server过滤）"""
+        to_dict = self._deployment_from_raw if raw else self._deployment_to_dict
+        kwargs = {'label_selector': label_selector} if label_selector else {}
+        if namespace:
+            pages = self.list_pages(self._apps_v1.list_namespaced_deployment, raw, namespace=namespace, **kwargs)
+        else:
+            pages = self.list_pages(self._apps_v1.list_deployment_for_all_namespaces, raw, **kwargs)
+        for items, _ in pages:
+            for deploy in items:
+                yield to_dict(deploy)
     
     def scale_deployment(self, namespace: str, deployment_name: str, replicas: int) -> bool:
         """伸缩Deployment"""
         try:
-            # 获取deployment
-            deployment = self._apps_v1.read_namespaced_deployment(
-                name=deployment_name,
-                namespace=namespace
-            )
-            
-            # 更新副本数
-            deployment.spec.replicas = replicas
-            
-            # 应用更新
-            self._apps_v1.patch_namespaced_deployment(
-                name=deployment_name,
-                namespace=namespace,
-                body=deployment
-            )
+            self.patch_deployment_replicas(namespace, deployment_name, replicas)
             return True
         except Exception as e:
             print(f"伸缩Deployment失败: {str(e)}")
             return False
     
+    def patch_deployment_replicas(self, namespace: str, deployment_name: str, replicas: int,
+                                  timeout: Optional[float] = None) -> Dict[str, Any]:
+        """
+        通过scale子资源设置副本数（单次PATCH，不先读取对象，异常向上抛出）
+        
+        Returns:
+            {"replicas": 期望副本数, "resource_version"}
+        """
+        response = self._apps_v1.patch_namespaced_deployment_scale(
+            name=deployment_name,
+            namespace=namespace,
+            body={'spec': {'replicas': replicas}},
+            _preload_content=False,
+            _request_timeout=timeout
+        )
+        try:
+            scale = json.loads(response.data)
+        finally:
+            response.release_conn()
+        return {
+            'replicas': (scale.get('spec') or {}).get('replicas'),
+            'resource_version': (scale.get('metadata') or {}).get('resourceVersion'),
+        }
+    
+    def restart_deployment(self, namespace: str, deployment_name: str,
+                           timeout: Optional[float] = None) -> Dict[str, Any]:
+        """
+        滚动重启Deployment（与kubectl rollout restart相同，修改Pod模板的restartedAt注解；
+        单次PATCH，异常向上抛出）
+        
+        Returns:
+            {"restarted_at", "resource_version"}
+        """
+        restarted_at = datetime.utcnow().strftime('%Y-%m-%dT%H:%M:%SZ')
+        response = self._apps_v1.patch_namespaced_deployment(
+            name=deployment_name,
+            namespace=namespace,
+            body={'spec': {'template': {'metadata': {'annotations': {
+                'kubectl.kubernetes.io/restartedAt': restarted_at
+            }}}}},
+            _preload_content=False,
+            _request_timeout=timeout
+        )
+        try:
+            metadata = json.loads(response.data).get('metadata') or {}
+        finally:
+            response.release_conn()
+        return {'restarted_at': restarted_at, 'resource_version': metadata.get('resourceVersion')}
+    
     def close(self):
-        """关闭连接并清理临时文件"""
+        """关闭连接池"""
         if self._api_client:
             try:
                 self._api_client.rest_client.pool_manager.clear()
-            except:
+            except Exception:
                 pass
+
+
+def _sum_container_resources(pairs: Iterable[Tuple[Optional[dict], Optional[dict]]]) -> Dict[str, Optional[str]]:
+    """汇总Pod各容器的requests/limits（CPU为毫核，内存为Mi；没有容器声明时为None）"""
+    totals: Dict[str, float] = {}
+    for requests, limits in pairs:
+        for kind, values in (('request', requests), ('limit', limits)):
+            for resource in ('cpu', 'memory'):
+                quantity = parse_quantity((values or {}).get(resource))
+                if not math.isnan(quantity):
+                    key = f"{resource}_{kind}"
+                    totals[key] = totals.get(key, 0.0) + quantity
+    return {
+        'cpu_request': format_cpu(totals['cpu_request']) if 'cpu_request' in totals else None,
+        'memory_request': format_memory(totals['memory_request']) if 'memory_request' in totals else None,
+        'cpu_limit': format_cpu(totals['cpu_limit']) if 'cpu_limit' in totals else None,
+        'memory_limit': format_memory(totals['memory_limit']) if 'memory_limit' in totals else None,
+    }
+
+
+def _load_cert_chain(context: ssl.SSLContext, cert: str, key: str):
+    """
+    加载客户端证书和私钥
+    
+    ssl模块只能从路径加载，Linux上使用memfd（不落盘），其他平台写入临时目录并在加载后立即删除
+    """
+    content = f"{cert.strip()}\n{key.strip()}\n".encode('utf-8')
+    if hasattr(os, 'memfd_create'):
+        fd = os.memfd_create("k8s-client-cert")
+        try:
+            os.write(fd, content)
+            context.load_cert_chain(f"/proc/self/fd/{fd}")
+        finally:
+            os.close(fd)
+        return
+    
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = os.path.join(tmp_dir, "client.pem")
+        with open(path, 'wb') as f:
+            f.write(content)
+        context.load_cert_chain(path)
+
+
+def _read_pem(entry: dict, data_key: str, path_key: str) -> Optional[str]:
+    """读取kubeconfig中的证书：*-data为base64内容，否则为文件路径"""
+    if entry.get(data_key):
+        return base64.b64decode(entry[data_key]).decode('utf-8')
+    if entry.get(path_key):
+        with open(os.path.expanduser(entry[path_key]), 'r') as f:
+            return f.read()
+    return None
+
+
+def _split_kubeconfig(kubeconfig: dict) -> Tuple[dict, Optional[str], Optional[str], Optional[str], bool]:
+    """
+    取出当前上下文的CA证书、客户端证书和密钥，返回去掉这些字段后的kubeconfig副本
+    
+    Returns:
+        (kubeconfig副本, CA证书, 客户端证书, 客户端密钥, 是否跳过服务端证书校验)
+    """
+    kubeconfig = copy.deepcopy(kubeconfig or {})
+    contexts = {c.get('name'): c.get('context') or {} for c in kubeconfig.get('contexts') or []}
+    context_name = kubeconfig.get('current-context') or next(iter(contexts), None)
+    context = contexts.get(context_name) or {}
+    
+    def find(section: str, name: Optional[str]) -> dict:
+        for item in kubeconfig.get(section) or []:
+            if item.get('name') == name:
+                return item.setdefault(section[:-1], {}) or {}
+        return {}
+    
+    cluster = find('clusters', context.get('cluster'))
+    user = find('users', context.get('user'))
+    ca_cert = _read_pem(cluster, 'certificate-authority-data', 'certificate-authority')
+    client_cert = _read_pem(user, 'client-certificate-data', 'client-certificate')
+    client_key = _read_pem(user, 'client-key-data', 'client-key')
+    for entry, keys in (
+        (cluster, ('certificate-authority-data', 'certificate-authority')),
+        (user, ('client-certificate-data', 'client-certificate', 'client-key-data', 'client-key')),
+    ):
+        for key in keys:
+            entry.pop(key, None)
+    return kubeconfig, ca_cert, client_cert, client_key, bool(cluster.get('insecure-skip-tls-verify'))
+
+
+def cluster_fingerprint(cluster) -> str:
+    """集群连接参数的摘要，凭据变化后摘要随之变化"""
+    raw = "\0".join(str(v or "") for v in (
+        cluster.api_server, cluster.auth_type, cluster.kubeconfig, cluster.token,
+        cluster.ca_cert, cluster.client_cert, cluster.client_key
+    ))
+    return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+
+class K8sClientRegistry:
+    """按集群缓存已连接的K8sClient，凭据不变时复用ApiClient和连接池"""
+    
+    def __init__(self):
+        self._lock = threading.Lock()
+        # 集群ID -> (凭据摘要, 客户端)
+        self._clients: Dict[int, Tuple[str, K8sClient]] = {}
+        self._connect_locks: Dict[int, threading.Lock] = {}
+    
+    def get(self, cluster) -> Tuple[Optional[K8sClient], Optional[str]]:
+        """
+        获取集群的客户端，首次使用或凭据变化时建立连接
         
-        # 清理临时文件
-        if hasattr(self, '_temp_files'):
-            for temp_file in self._temp_files:
-                try:
-                    if os.path.exists(temp_file):
-                        os.unlink(temp_file)
-                except Exception as e:
-                    print(f"清理临时文件失败 {temp_file}: {e}")
+        Returns:
+            (客户端, 错误信息)，连接失败时客户端为None（失败结果不缓存）
+        """
+        fingerprint = cluster_fingerprint(cluster)
+        entry = self._clients.get(cluster.id)
+        if entry is not None and entry[0] == fingerprint:
+            return entry[1], None
+        
+        with self._lock:
+            connect_lock = self._connect_locks.setdefault(cluster.id, threading.Lock())
+        
+        # 每个集群一把连接锁，连接慢的集群不影响其他集群
+        with connect_lock:
+            entry = self._clients.get(cluster.id)
+            if entry is not None and entry[0] == fingerprint:
+                return entry[1], None
+            
+            k8s_client = K8sClient(
+                api_server=cluster.api_server,
+                auth_type=cluster.auth_type,
+                kubeconfig=cluster.kubeconfig,
+                token=cluster.token,
+                ca_cert=cluster.ca_cert,
+                client_cert=cluster.client_cert,
+                client_key=cluster.client_key
+            )
+            success, error_msg = k8s_client.connect()
+            if not success:
+                k8s_client.close()
+                return None, error_msg
+            
+            with self._lock:
+                old = self._clients.get(cluster.id)
+                self._clients[cluster.id] = (fingerprint, k8s_client)
+            if old is not None:
+                old[1].close()
+            return k8s_client, None
+    
+    def invalidate(self, cluster_id: int):
+        """丢弃集群的客户端（集群更新或删除时调用）"""
+        with self._lock:
+            entry = self._clients.pop(cluster_id, None)
+        if entry is not None:
+            entry[1].close()
+    
+    def close_all(self):
+        with self._lock:
+            clients, self._clients = self._clients, {}
+        for _, k8s_client in clients.values():
+            k8s_client.close()
+
 
+# 全局K8s客户端注册表
+k8s_clients = K8sClientRegistry()
@@ -0,0 +1,391 @@
+"""
+Kubernetes informer缓存
+每个集群每种资源做一次全量list，之后从list返回的resourceVersion开始watch增量事件，
+维护按命名空间、节点、标签索引的内存对象存储。接口和资源同步直接读取缓存，不再反复全量list
+"""
+import functools
+import random
+import threading
+import time
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+from kubernetes import watch
+from kubernetes.client.rest import ApiException
+
+from app.core.config import settings
+from app.utils.k8s_client import K8sClient, cluster_fingerprint, k8s_clients
+
+
+INFORMER_KINDS = ("nodes", "namespaces", "pods", "deployments")
+
+
+def _index_namespace(obj: dict) -> Iterable[str]:
+    namespace = obj.get('namespace')
+    return (namespace,) if namespace else ()
+
+
+def _index_node(obj: dict) -> Iterable[str]:
+    node_name = obj.get('node_name')
+    return (node_name,) if node_name else ()
+
+
+def _index_label(obj: dict) -> Iterable[str]:
+    return (f"{key}={value}" for key, value in (obj.get('labels') or {}).items())
+
+
+# 索引名 -> 计算索引键的函数
+INDEXERS: Dict[str, Callable[[dict], Iterable[str]]] = {
+    "namespace": _index_namespace,
+    "node": _index_node,
+    "label": _index_label,
+}
+
+
+def _describe_error(e: Exception) -> str:
+    if isinstance(e, ApiException):
+        return K8sClient._describe_api_error(e)
+    return f"{type(e).__name__}: {str(e)}"
+
+
+class ObjectStore:
+    """按uid存放对象，并维护二级索引"""
+    
+    def __init__(self, indexers: Dict[str, Callable[[dict], Iterable[str]]] = None):
+        self._lock = threading.RLock()
+        self._objects: Dict[str, dict] = {}
+        self._indexers = indexers or INDEXERS
+        # 索引名 -> 索引键 -> uid集合
+        self._indices: Dict[str, Dict[str, Set[str]]] = {name: {} for name in self._indexers}
+    
+    def _add_to_indices(self, uid: str, obj: dict):
+        for name, indexer in self._indexers.items():
+            index = self._indices[name]
+            for key in indexer(obj):
+                index.setdefault(key, set()).add(uid)
+    
+    def _remove_from_indices(self, uid: str, obj: dict):
+        for name, indexer in self._indexers.items():
+            index = self._indices[name]
+            for key in indexer(obj):
+                uids = index.get(key)
+                if uids is not None:
+                    uids.discard(uid)
+                    if not uids:
+                        del index[key]
+    
+    def upsert(self, obj: dict):
+        uid = obj['uid']
+        with self._lock:
+            old = self._objects.get(uid)
+            if old is not None:
+                self._remove_from_indices(uid, old)
+            self._objects[uid] = obj
+            self._add_to_indices(uid, obj)
+    
+    def delete(self, uid: str):
+        with self._lock:
+            old = self._objects.pop(uid, None)
+            if old is not None:
+                self._remove_from_indices(uid, old)
+    
+    def replace(self, objects: Iterable[dict]):
+        """全量替换（重新list后调用）"""
+        with self._lock:
+            self._objects = {}
+            self._indices = {name: {} for name in self._indexers}
+            for obj in objects:
+                self._objects[obj['uid']] = obj
+                self._add_to_indices(obj['uid'], obj)
+    
+    def list(self, namespace: Optional[str] = None, node: Optional[str] = None,
+             labels: Optional[Dict[str, str]] = None) -> List[dict]:
+        """按条件列出对象，多个条件取交集"""
+        with self._lock:
+            candidates: Optional[Set[str]] = None
+            conditions = []
+            if namespace:
+                conditions.append(("namespace", namespace))
+            if node:
+                conditions.append(("node", node))
+            for key, value in (labels or {}).items():
+                conditions.append(("label", f"{key}={value}"))
+            
+            for name, key in conditions:
+                uids = self._indices[name].get(key, set())
+                candidates = set(uids) if candidates is None else candidates & uids
+                if not candidates:
+                    return []
+            
+            if candidates is None:
+                return list(self._objects.values())
+            return [self._objects[uid] for uid in candidates]
+    
+    def keys(self, index: str) -> Dict[str, int]:
+        """索引键及对应的对象数，例如各命名空间的Pod数"""
+        with self._lock:
+            return {key: len(uids) for key, uids in self._indices[index].items()}
+    
+    def __len__(self) -> int:
+        return len(self._objects)
+
+
+class Informer:
+    """单个资源类型的 list + watch 循环"""
+    
+    def __init__(self, cluster_id: int, kind: str, list_func: Callable, to_dict: Callable,
+                 pages: Callable[[], Iterator[Tuple[List[dict], str]]], watch_timeout: int = 300):
+        self.cluster_id = cluster_id
+        self.kind = kind
+        self.list_func = list_func
+        self.to_dict = to_dict
+        self.pages = pages
+        self.watch_timeout = watch_timeout
+        
+        self.store = ObjectStore()
+        self.resource_version: Optional[str] = None
+        self.synced = threading.Event()
+        # 首次list完成、失败或等待超时后置位，之后的调用不再等待（失败时后台继续重试）
+        self.settled = threading.Event()
+        self.last_error: Optional[str] = None
+        self.list_error: Optional[str] = None
+        self.events = 0
+        self.relists = 0
+        
+        self._stopping = threading.Event()
+        self._watch: Optional[watch.Watch] = None
+        self._thread: Optional[threading.Thread] = None
+    
+    def start(self):
+        self._thread = threading.Thread(
+            target=self._run, name=f"informer-{self.cluster_id}-{self.kind}", daemon=True
+        )
+        self._thread.start()
+    
+    def stop(self):
+        self._stopping.set()
+        if self._watch is not None:
+            self._watch.stop()
+    
+    def _list(self):
+        """分页全量list并替换缓存，记录resourceVersion作为watch起点"""
+        objects = []
+        resource_version = None
+        for items, resource_version in self.pages():
+            objects.extend(items)
+        self.store.replace(objects)
+        self.resource_version = resource_version
+        self.relists += 1
+        self.list_error = None
+        self.synced.set()
+        self.settled.set()
+    
+    def _watch_once(self):
+        """从resource_version开始watch，直到服务端超时或出错"""
+        self._watch = watch.Watch()
+        stream = self._watch.stream(
+            self.list_func,
+            resource_version=self.resource_version,
+            timeout_seconds=self.watch_timeout,
+            allow_watch_bookmarks=True,
+            _request_timeout=self.watch_timeout + 30
+        )
+        for event in stream:
+            if self._stopping.is_set():
+                break
+            event_type = event['type']
+            if event_type == 'ERROR':
+                raw = event.get('raw_object') or {}
+                raise ApiException(status=raw.get('code', 500), reason=raw.get('message'))
+            
+            if event_type == 'BOOKMARK':
+                # 书签事件只携带resourceVersion
+                self.resource_version = event['raw_object']['metadata']['resourceVersion']
+                continue
+            
+            data = self.to_dict(event['object'])
+            if event_type == 'DELETED':
+                self.store.delete(data['uid'])
+            else:
+                self.store.upsert(data)
+            self.resource_version = data['resource_version']
+            self.events += 1
+    
+    def _run(self):
+        backoff = 1
+        while not self._stopping.is_set():
+            try:
+                if self.resource_version is None:
+                    try:
+                        self._list()
+                    except Exception as e:
+                        # 记录list失败，等待中的调用立即返回，不必等到超时
+                        self.list_error = _describe_error(e)
+                        self.settled.set()
+                        raise
+                self._watch_once()
+                backoff = 1
+                self.last_error = None
+            except ApiException as e:
+                if e.status == 410:
+                    # resourceVersion过旧，重新list
+                    self.resource_version = None
+                    continue
+                self._on_error(f"API错误 ({e.status}): {e.reason}")
+            except Exception as e:
+                self._on_error(f"{type(e).__name__}: {str(e)}")
+            else:
+                continue
+            
+            self._stopping.wait(backoff + random.uniform(0, backoff))
+            backoff = min(backoff * 2, 60)
+    
+    def _on_error(self, message: str):
+        self.last_error = message
+        print(f"集群 {self.cluster_id} {self.kind} informer异常: {message}")
+
+
+class ClusterInformers:
+    """一个集群的informer，按资源类型在首次使用时启动"""
+    
+    def __init__(self, cluster_id: int, k8s_client: K8sClient, fingerprint: str, watch_timeout: int):
+        self.cluster_id = cluster_id
+        self.client = k8s_client
+        self.fingerprint = fingerprint
+        self.watch_timeout = watch_timeout
+        self.informers: Dict[str, Informer] = {}
+    
+    def ensure(self, kinds: Iterable[str]):
+        """启动尚未运行的资源类型（调用方持有该集群的启动锁）"""
+        for kind in kinds:
+            if kind in self.informers:
+                continue
+            list_func, to_dict = self.client.resource_source(kind)
+            pages = functools.partial(self.client.iter_resource_pages, kind)
+            informer = Informer(self.cluster_id, kind, list_func, to_dict, pages, self.watch_timeout)
+            self.informers[kind] = informer
+            informer.start()
+    
+    def stop(self):
+        # 客户端由k8s_clients管理，这里不关闭
+        for informer in list(self.informers.values()):
+            informer.stop()
+    
+    def wait(self, kinds: Iterable[str], timeout: float) -> Set[str]:
+        """
+        等待指定类型完成首次list，返回已同步的类型
+        
+        list失败的类型立即返回；超时未完成的类型记为已等待过，之后的调用不再等待
+        """
+        deadline = time.monotonic() + timeout
+        synced = set()
+        for kind in kinds:
+            informer = self.informers.get(kind)
+            if informer is None:
+                continue
+            if not informer.settled.wait(max(0.0, deadline - time.monotonic())):
+                informer.settled.set()
+                print(f"集群 {self.cluster_id} {kind} informer首次同步超时，暂时回退到直接list")
+            if informer.synced.is_set():
+                synced.add(kind)
+        return synced
+    
+    def is_synced(self, kind: str) -> bool:
+        informer = self.informers.get(kind)
+        return informer is not None and informer.synced.is_set()
+    
+    def store(self, kind: str) -> ObjectStore:
+        return self.informers[kind].store
+    
+    def stats(self) -> dict:
+        return {
+            kind: {
+                "synced": informer.synced.is_set(),
+                "objects": len(informer.store),
+                "events": informer.events,
+                "relists": informer.relists,
+                "resource_version": informer.resource_version,
+                "list_error": informer.list_error,
+                "last_error": informer.last_error,
+            }
+            for kind, informer in list(self.informers.items())
+        }
+
+
+class InformerManager:
+    """按集群管理informer（凭据变化后自动重建）"""
+    
+    def __init__(self, watch_timeout: int = 300, sync_timeout: float = 30):
+        self.watch_timeout = watch_timeout
+        self.sync_timeout = sync_timeout
+        self._lock = threading.Lock()
+        self._clusters: Dict[int, ClusterInformers] = {}
+        self._start_locks: Dict[int, threading.Lock] = {}
+    
+    def get(self, cluster, kinds: Iterable[str] = INFORMER_KINDS, wait: bool = True) -> Optional[ClusterInformers]:
+        """
+        获取集群的informer，只启动kinds中尚未运行的资源类型
+        
+        Args:
+            wait: 是否等待这些类型完成首次list（list失败的类型不等待，见ClusterInformers.wait）
+        
+        Returns:
+            连接失败时返回None；否则返回集群informer，调用方用is_synced判断各类型是否可读，
+            未同步的类型回退到直接list
+        """
+        kinds = tuple(kinds)
+        fingerprint = cluster_fingerprint(cluster)
+        with self._lock:
+            start_lock = self._start_locks.setdefault(cluster.id, threading.Lock())
+        
+        # 每个集群一把启动锁，连接慢的集群不影响其他集群
+        with start_lock:
+            informers = self._clusters.get(cluster.id)
+            if informers is not None and informers.fingerprint != fingerprint:
+                self.stop(cluster.id)
+                informers = None
+            
+            if informers is None:
+                k8s_client, error_msg = k8s_clients.get(cluster)
+                if k8s_client is None:
+                    print(f"集群 {cluster.id} informer启动失败: {error_msg}")
+                    return None
+                informers = ClusterInformers(cluster.id, k8s_client, fingerprint, self.watch_timeout)
+                with self._lock:
+                    self._clusters[cluster.id] = informers
+            informers.ensure(kinds)
+        
+        if wait:
+            informers.wait(kinds, self.sync_timeout)
+        return informers
+    
+    def peek(self, cluster_id: int, kinds: Iterable[str] = INFORMER_KINDS) -> Optional[ClusterInformers]:
+        """获取已启动且指定类型都已同步的informer，不会新建或等待"""
+        informers = self._clusters.get(cluster_id)
+        if informers is not None and all(informers.is_synced(kind) for kind in kinds):
+            return informers
+        return None
+    
+    def stop(self, cluster_id: int):
+        """停止集群的informer（集群更新或删除时调用）"""
+        with self._lock:
+            informers = self._clusters.pop(cluster_id, None)
+        if informers is not None:
+            informers.stop()
+    
+    def stop_all(self):
+        with self._lock:
+            clusters, self._clusters = self._clusters, {}
+        for informers in clusters.values():
+            informers.stop()
+    
+    def stats(self) -> dict:
+        with self._lock:
+            clusters = dict(self._clusters)
+        return {cluster_id: informers.stats() for cluster_id, informers in clusters.items()}
+
+
+# 全局informer管理实例
+k8s_informers = InformerManager(
+    watch_timeout=settings.K8S_WATCH_TIMEOUT,
+    sync_timeout=settings.K8S_INFORMER_SYNC_TIMEOUT
+)
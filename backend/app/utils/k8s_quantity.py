@@ -0,0 +1,52 @@
+"""
+Kubernetes资源数量（Quantity）解析
+CPU统一换算为核，内存统一换算为字节。集群内的数量字符串高度重复（"100m"、"128Mi"），
+批量解析时按字符串缓存结果，同一值只解析一次。
+"""
+from array import array
+from functools import lru_cache
+from typing import Iterable, Optional
+
+# 后缀 -> 倍数
+_SUFFIXES = {
+    "n": 1e-9, "u": 1e-6, "m": 1e-3, "": 1.0,
+    "k": 1e3, "M": 1e6, "G": 1e9, "T": 1e12, "P": 1e15, "E": 1e18,
+    "Ki": 2 ** 10, "Mi": 2 ** 20, "Gi": 2 ** 30, "Ti": 2 ** 40, "Pi": 2 ** 50, "Ei": 2 ** 60,
+}
+
+
+@lru_cache(maxsize=4096)
+def parse_quantity(value: Optional[str]) -> float:
+    """
+    解析单个数量字符串，例如 "250m" -> 0.25、"1Gi" -> 1073741824、"1e3" -> 1000
+    
+    无法解析或为空时返回 NaN
+    """
+    if not value:
+        return float("nan")
+    value = value.strip()
+    if value[-2:] in _SUFFIXES and len(value) > 2:
+        number, suffix = value[:-2], value[-2:]
+    elif value[-1:] in _SUFFIXES and not value[-1:].isdigit():
+        number, suffix = value[:-1], value[-1:]
+    else:
+        number, suffix = value, ""
+    try:
+        return float(number) * _SUFFIXES[suffix]
+    except ValueError:
+        return float("nan")
+
+
+def parse_quantities(values: Iterable[Optional[str]]) -> array:
+    """批量解析，返回 array('d')（无法解析的为 NaN）"""
+    return array("d", map(parse_quantity, values))
+
+
+def format_cpu(cores: float) -> str:
+    """CPU核数格式化为毫核，例如 0.25 -> "250m" """
+    return f"{round(cores * 1000)}m"
+
+
+def format_memory(size: float) -> str:
+    """字节数格式化为Mi，例如 536870912 -> "512Mi" """
+    return f"{round(size / 2 ** 20)}Mi"
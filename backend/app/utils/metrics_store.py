@@ -0,0 +1,364 @@
+"""
+服务器资源时序存储
+按服务器追加写入 cpu/memory/disk/load 采样，数据以列式块存放在独立的SQLite文件中，
+避免撑大业务库 devops.db：
+- 时间戳按差值编码（array('I')），指标值为 float32 列（array('f')），整块zlib压缩
+- 写入时同步聚合出 1m/5m/1h 降采样（avg/max），每个序列常数时间更新
+- 各精度独立保留期，查询时按时间跨度自动选择精度
+"""
+import math
+import sqlite3
+import struct
+import threading
+import time
+import zlib
+from array import array
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from app.core.config import settings
+
+
+METRICS = ("cpu", "memory", "disk", "load")
+
+# 精度（秒，0表示原始采样） -> 名称
+RESOLUTIONS = {0: "raw", 60: "1m", 300: "5m", 3600: "1h"}
+RESOLUTION_BY_NAME = {name: res for res, name in RESOLUTIONS.items()}
+
+# 各精度保留时间（秒）
+RETENTION = {
+    0: 2 * 86400,
+    60: 7 * 86400,
+    300: 30 * 86400,
+    3600: 365 * 86400,
+}
+
+# 自动选择精度时，每种精度适用的最大查询跨度（秒）
+AUTO_RESOLUTION_SPAN = (
+    (6 * 3600, 0),
+    (2 * 86400, 60),
+    (14 * 86400, 300),
+)
+
+# 每块最多行数，写满后封块落盘
+CHUNK_ROWS = 240
+
+_HEADER = struct.Struct("<II")
+
+
+def to_utc(value: datetime) -> datetime:
+    """转为带时区的UTC时间（不带时区的时间按UTC处理）"""
+    if value.tzinfo is None:
+        return value.replace(tzinfo=timezone.utc)
+    return value.astimezone(timezone.utc)
+
+
+def query_range(start: Optional[datetime], end: Optional[datetime],
+                default_span: int = 3600) -> Tuple[int, int]:
+    """
+    把查询参数中的时间范围转为时间戳（end默认当前时间，start默认end前default_span秒）
+    
+    Raises:
+        ValueError: start不早于end
+    """
+    end_ts = int(to_utc(end).timestamp()) if end else int(datetime.now(timezone.utc).timestamp())
+    start_ts = int(to_utc(start).timestamp()) if start else end_ts - default_span
+    if start_ts >= end_ts:
+        raise ValueError("start must be earlier than end")
+    return start_ts, end_ts
+
+
+def columns_for(resolution: int, metrics: Sequence[str] = METRICS) -> Tuple[str, ...]:
+    """指定精度的列名"""
+    if resolution == 0:
+        return tuple(metrics)
+    return tuple(f"{m}_{agg}" for m in metrics for agg in ("avg", "max"))
+
+
+class _Chunk:
+    """列式数据块：差值编码时间戳 + float32 列"""
+    
+    __slots__ = ("start_ts", "last_ts", "deltas", "columns")
+    
+    def __init__(self, start_ts: int, ncols: int):
+        self.start_ts = start_ts
+        self.last_ts = start_ts
+        self.deltas = array("I")
+        self.columns = [array("f") for _ in range(ncols)]
+    
+    def __len__(self) -> int:
+        return len(self.deltas)
+    
+    def append(self, ts: int, values: Sequence[float]):
+        self.deltas.append(ts - self.last_ts)
+        self.last_ts = ts
+        for column, value in zip(self.columns, values):
+            column.append(value)
+    
+    def encode(self) -> bytes:
+        payload = [_HEADER.pack(len(self.deltas), len(self.columns)), self.deltas.tobytes()]
+        payload.extend(column.tobytes() for column in self.columns)
+        return zlib.compress(b"".join(payload))
+    
+    def rows(self) -> Tuple[List[int], List[array]]:
+        """展开为 (时间戳列表, 列数组列表)"""
+        timestamps = []
+        ts = self.start_ts
+        for delta in self.deltas:
+            ts += delta
+            timestamps.append(ts)
+        return timestamps, self.columns
+    
+    @classmethod
+    def decode(cls, start_ts: int, blob: bytes) -> "_Chunk":
+        raw = zlib.decompress(blob)
+        nrows, ncols = _HEADER.unpack_from(raw)
+        chunk = cls(start_ts, 0)
+        offset = _HEADER.size
+        chunk.deltas.frombytes(raw[offset:offset + nrows * chunk.deltas.itemsize])
+        offset += nrows * chunk.deltas.itemsize
+        for _ in range(ncols):
+            column = array("f")
+            column.frombytes(raw[offset:offset + nrows * column.itemsize])
+            offset += nrows * column.itemsize
+            chunk.columns.append(column)
+        chunk.last_ts = start_ts + sum(chunk.deltas)
+        return chunk
+
+
+class _Bucket:
+    """降采样聚合桶（avg/max）"""
+    
+    __slots__ = ("start", "counts", "sums", "maxs")
+    
+    def __init__(self, start: int, ncols: int):
+        self.start = start
+        self.counts = [0] * ncols
+        self.sums = [0.0] * ncols
+        self.maxs = [-math.inf] * ncols
+    
+    def add(self, values: Sequence[float]):
+        for i, value in enumerate(values):
+            if math.isnan(value):
+                continue
+            self.counts[i] += 1
+            self.sums[i] += value
+            if value > self.maxs[i]:
+                self.maxs[i] = value
+    
+    def result(self) -> List[float]:
+        row = []
+        for count, total, peak in zip(self.counts, self.sums, self.maxs):
+            if count:
+                row.extend((total / count, peak))
+            else:
+                row.extend((math.nan, math.nan))
+        return row
+
+
+class MetricsStore:
+    """
+    嵌入式时序存储
+    
+    Args:
+        path: SQLite文件路径
+        metrics: 每条采样的指标名（列顺序）
+        key: 序列ID在查询结果中的字段名
+    """
+    
+    def __init__(self, path: str, metrics: Sequence[str] = METRICS, key: str = "server_id"):
+        self.path = path
+        self.metrics = tuple(metrics)
+        self.key = key
+        self._lock = threading.RLock()
+        self._conn: Optional[sqlite3.Connection] = None
+        # (server_id, resolution) -> 未封块的当前数据块 / 正在聚合的桶
+        self._heads: Dict[Tuple[int, int], _Chunk] = {}
+        self._buckets: Dict[Tuple[int, int], _Bucket] = {}
+        self._dirty: set = set()
+    
+    def _connection(self) -> sqlite3.Connection:
+        if self._conn is None:
+            self._conn = sqlite3.connect(self.path, check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS metric_chunks (
+                    server_id INTEGER NOT NULL,
+                    resolution INTEGER NOT NULL,
+                    start_ts INTEGER NOT NULL,
+                    end_ts INTEGER NOT NULL,
+                    row_count INTEGER NOT NULL,
+                    data BLOB NOT NULL,
+                    PRIMARY KEY (server_id, resolution, start_ts)
+                ) WITHOUT ROWID
+                """
+            )
+            self._conn.execute(
+                "CREATE INDEX IF NOT EXISTS ix_metric_chunks_end ON metric_chunks (resolution, end_ts)"
+            )
+        return self._conn
+    
+    def _write_chunk(self, server_id: int, resolution: int, chunk: _Chunk):
+        self._connection().execute(
+            "INSERT OR REPLACE INTO metric_chunks "
+            "(server_id, resolution, start_ts, end_ts, row_count, data) VALUES (?, ?, ?, ?, ?, ?)",
+            (server_id, resolution, chunk.start_ts, chunk.last_ts, len(chunk), chunk.encode())
+        )
+    
+    def _append_row(self, server_id: int, resolution: int, ts: int, values: Sequence[float]) -> bool:
+        key = (server_id, resolution)
+        head = self._heads.get(key)
+        if head is not None and ts <= head.last_ts:
+            # 时间戳回退的采样直接丢弃，保证块内单调递增
+            return False
+        if head is None:
+            head = self._heads[key] = _Chunk(ts, len(values))
+        head.append(ts, values)
+        self._dirty.add(key)
+        
+        if len(head) >= CHUNK_ROWS:
+            # 写满封块
+            self._write_chunk(server_id, resolution, head)
+            self._connection().commit()
+            del self._heads[key]
+            self._dirty.discard(key)
+        return True
+    
+    def append(self, server_id: int, ts: int, cpu: Optional[float], memory: Optional[float],
+               disk: Optional[float], load: Optional[float]):
+        """追加一条服务器原始采样（ts为Unix秒）"""
+        self.append_values(server_id, ts, (cpu, memory, disk, load))
+    
+    def append_values(self, server_id: int, ts: int, values: Sequence[Optional[float]]):
+        """追加一条原始采样，values与metrics顺序一致（None表示缺失）"""
+        values = [math.nan if v is None else float(v) for v in values]
+        
+        with self._lock:
+            if not self._append_row(server_id, 0, ts, values):
+                return
+            
+            # 同步更新各级降采样
+            for resolution in RESOLUTIONS:
+                if resolution == 0:
+                    continue
+                key = (server_id, resolution)
+                bucket_start = ts - ts % resolution
+                bucket = self._buckets.get(key)
+                if bucket is not None and bucket.start != bucket_start:
+                    self._append_row(server_id, resolution, bucket.start, bucket.result())
+                    bucket = None
+                if bucket is None:
+                    bucket = self._buckets[key] = _Bucket(bucket_start, len(values))
+                bucket.add(values)
+    
+    def flush(self):
+        """将未封块的数据块落盘（重复flush会覆盖同一块）"""
+        with self._lock:
+            if not self._dirty:
+                return
+            for key in self._dirty:
+                head = self._heads.get(key)
+                if head is not None:
+                    self._write_chunk(key[0], key[1], head)
+            self._connection().commit()
+            self._dirty.clear()
+    
+    def enforce_retention(self, now: Optional[int] = None) -> int:
+        """删除超过保留期的数据块，返回删除的块数"""
+        now = now or int(time.time())
+        deleted = 0
+        with self._lock:
+            conn = self._connection()
+            for resolution, retention in RETENTION.items():
+                cursor = conn.execute(
+                    "DELETE FROM metric_chunks WHERE resolution = ? AND end_ts < ?",
+                    (resolution, now - retention)
+                )
+                deleted += cursor.rowcount
+            conn.commit()
+        return deleted
+    
+    def drop_server(self, server_id: int):
+        """删除服务器的全部时序数据"""
+        with self._lock:
+            for key in [k for k in self._heads if k[0] == server_id]:
+                del self._heads[key]
+                self._dirty.discard(key)
+            for key in [k for k in self._buckets if k[0] == server_id]:
+                del self._buckets[key]
+            conn = self._connection()
+            conn.execute("DELETE FROM metric_chunks WHERE server_id = ?", (server_id,))
+            conn.commit()
+    
+    @staticmethod
+    def pick_resolution(start: int, end: int) -> int:
+        """按查询跨度选择精度"""
+        span = end - start
+        now = int(time.time())
+        for max_span, resolution in AUTO_RESOLUTION_SPAN:
+            # 起点早于该精度保留期时继续使用更粗的精度
+            if span <= max_span and start >= now - RETENTION[resolution]:
+                return resolution
+        return 3600
+    
+    def query(self, server_id: int, start: int, end: int,
+              resolution: Optional[int] = None) -> dict:
+        """
+        查询时间范围内的数据
+        
+        Returns:
+            {"server_id", "resolution", "timestamps": [...], "series": {列名: [...]}}
+        """
+        if resolution is None:
+            resolution = self.pick_resolution(start, end)
+        names = columns_for(resolution, self.metrics)
+        
+        timestamps: List[int] = []
+        series: Dict[str, List[Optional[float]]] = {name: [] for name in names}
+        
+        with self._lock:
+            rows = self._connection().execute(
+                "SELECT start_ts, data FROM metric_chunks "
+                "WHERE server_id = ? AND resolution = ? AND start_ts <= ? AND end_ts >= ? "
+                "ORDER BY start_ts",
+                (server_id, resolution, end, start)
+            ).fetchall()
+            head = self._heads.get((server_id, resolution))
+            chunks = [
+                _Chunk.decode(start_ts, data) for start_ts, data in rows
+                if head is None or start_ts != head.start_ts
+            ]
+            if head is not None and head.start_ts <= end and head.last_ts >= start:
+                # 当前块可能尚未落盘，直接从内存读取
+                chunks.append(_Chunk.decode(head.start_ts, head.encode()))
+        
+        for chunk in chunks:
+            chunk_ts, columns = chunk.rows()
+            for i, ts in enumerate(chunk_ts):
+                if ts < start or ts > end:
+                    continue
+                timestamps.append(ts)
+                for name, column in zip(names, columns):
+                    value = column[i]
+                    series[name].append(None if math.isnan(value) else round(value, 2))
+        
+        return {
+            self.key: server_id,
+            "resolution": RESOLUTIONS[resolution],
+            "timestamps": timestamps,
+            "series": series,
+        }
+    
+    def close(self):
+        """落盘并关闭"""
+        with self._lock:
+            self.flush()
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+
+# 全局时序存储实例
+metrics_store = MetricsStore(settings.METRICS_DB_PATH)
@@ -0,0 +1,153 @@
+"""
+远程命令输出捕获
+stdout/stderr按块增量处理：内存中只保留开头和结尾各一段，超出部分的完整输出顺序写入落盘文件，
+数据库中保存截断后的内容（开头 + 省略说明 + 结尾）。任意大小的输出，内存占用都有上限。
+"""
+import os
+import time
+from typing import Optional
+
+# 落盘文件写缓冲大小
+SPILL_BUFFER_SIZE = 256 * 1024
+
+# 输出流 -> 落盘文件后缀
+STREAM_SUFFIXES = {"stdout": ".out", "stderr": ".err"}
+
+
+class StreamCapture:
+    """单个输出流的头尾缓冲与落盘"""
+
+    def __init__(self, head_bytes: int, tail_bytes: int, spill_path: Optional[str] = None):
+        self.head_bytes = head_bytes
+        self.tail_bytes = tail_bytes
+        self.spill_path = spill_path
+        self.head = bytearray()
+        self.tail = bytearray()
+        self.total = 0
+        self._file = None
+
+    def feed(self, data: bytes):
+        if not data:
+            return
+        self.total += len(data)
+        if self._file is not None:
+            self._file.write(data)
+
+        room = self.head_bytes - len(self.head)
+        if room > 0:
+            self.head += data[:room]
+            data = data[room:]
+        if data:
+            self.tail += data
+
+        if self._file is None and self.spill_path and self.total > self.head_bytes + self.tail_bytes:
+            # 首次超出上限：此前的数据都还在内存里，整体写入后改为边收边写
+            self._file = open(self.spill_path, "wb", buffering=SPILL_BUFFER_SIZE)
+            self._file.write(self.head)
+            self._file.write(self.tail)
+
+        # 结尾缓冲超过两倍上限时再裁剪，摊薄内存移动的开销
+        if len(self.tail) > self.tail_bytes * 2 and (self._file is not None or not self.spill_path):
+            del self.tail[:-self.tail_bytes or len(self.tail)]
+
+    @property
+    def spilled(self) -> bool:
+        return self._file is not None
+
+    @property
+    def truncated(self) -> bool:
+        return self.total > self.head_bytes + self.tail_bytes
+
+    def render(self) -> str:
+        """截断后的文本（未超出上限时为完整输出）"""
+        tail = self.tail[-self.tail_bytes:] if self.tail_bytes else bytearray()
+        omitted = self.total - len(self.head) - len(tail)
+        if omitted <= 0:
+            return (self.head + self.tail).decode("utf-8", errors="replace")
+        return (
+            self.head.decode("utf-8", errors="replace")
+            + f"\n\n... 省略 {omitted} 字节（共 {self.total} 字节） ...\n\n"
+            + tail.decode("utf-8", errors="replace")
+        )
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+
+
+class OutputCapture:
+    """一次执行的stdout和stderr"""
+
+    def __init__(self, head_bytes: int, tail_bytes: int, spill_base: Optional[str] = None):
+        """
+        Args:
+            spill_base: 落盘文件路径前缀，超出上限的流写入 spill_base + .out/.err；为None时不落盘
+        """
+        self.spill_base = spill_base
+        self.stdout = StreamCapture(head_bytes, tail_bytes, spill_path(spill_base, "stdout"))
+        self.stderr = StreamCapture(head_bytes, tail_bytes, spill_path(spill_base, "stderr"))
+
+    def feed(self, is_stderr: bool, data: bytes):
+        (self.stderr if is_stderr else self.stdout).feed(data)
+
+    @property
+    def spilled(self) -> bool:
+        return self.stdout.spilled or self.stderr.spilled
+
+    def close(self):
+        self.stdout.close()
+        self.stderr.close()
+
+
+def spill_path(spill_base: Optional[str], stream: str) -> Optional[str]:
+    """落盘文件路径"""
+    if not spill_base:
+        return None
+    return spill_base + STREAM_SUFFIXES[stream]
+
+
+def ensure_dir(path: str) -> str:
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def remove_spill(spill_base: Optional[str]):
+    """删除一次执行的落盘文件"""
+    for stream in STREAM_SUFFIXES:
+        path = spill_path(spill_base, stream)
+        if path:
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+
+def enforce_retention(directory: str, max_age: float, max_bytes: int) -> int:
+    """
+    清理落盘目录：删除修改时间超过max_age秒的文件，总大小仍超过max_bytes时从最旧的开始删除
+    
+    Returns:
+        删除的文件数
+    """
+    if not os.path.isdir(directory):
+        return 0
+    files = []
+    for entry in os.scandir(directory):
+        if entry.is_file():
+            stat = entry.stat()
+            files.append((stat.st_mtime, stat.st_size, entry.path))
+    files.sort()
+    
+    cutoff = time.time() - max_age
+    total = sum(size for _, size, _ in files)
+    deleted = 0
+    for mtime, size, path in files:
+        if mtime >= cutoff and total <= max_bytes:
+            break
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+        total -= size
+        deleted += 1
+    return deleted
@@ -0,0 +1,158 @@
+"""
+远程脚本缓存
+脚本按内容的SHA-256寻址缓存在远程主机上（~/.cache/devops-scripts/<hash><后缀>）：
+缓存不存在时由同一条命令从标准输入接收内容、校验哈希后落盘再执行，不使用SFTP和本地临时文件；
+每次执行都会更新缓存文件的修改时间，常用脚本不会被过期清理；
+本进程已确认缓存存在的主机不再发送内容，同一脚本的重复执行只需一次exec往返。
+"""
+import hashlib
+import shlex
+import threading
+from typing import Callable, Dict, Optional, Set, Tuple
+
+from app.utils.ssh_client import SSHClient
+
+
+# 远程缓存目录（相对于用户主目录）
+REMOTE_CACHE_DIR = ".cache/devops-scripts"
+
+# 缓存未命中且未收到内容时，远程命令输出到stderr的标记和退出码（此时脚本未执行）
+MISS_MARKER = b"__DEVOPS_SCRIPT_CACHE_MISS__\n"
+MISS_EXIT_CODE = 199
+
+# 上传新脚本时顺带清理超过该天数未修改的缓存文件
+PRUNE_DAYS = 30
+
+# (主机, 端口, 用户名)
+HostKey = Tuple[str, int, str]
+
+
+class ScriptUploadError(Exception):
+    """脚本内容未能写入远程缓存"""
+
+
+def script_digest(content: bytes) -> str:
+    return hashlib.sha256(content).hexdigest()
+
+
+def build_command(digest: str, suffix: str, interpreter: str) -> str:
+    """
+    生成远程命令：缓存文件存在则直接执行；否则从标准输入读取内容，哈希一致才原子地放入缓存，
+    不一致（包括没有收到内容）时输出MISS_MARKER并以MISS_EXIT_CODE退出
+    
+    检查缓存前先touch已有文件，命中的文件不会被同时进行的过期清理删除
+    """
+    path = f"$d/{digest}{suffix}"
+    store = " && ".join([
+        'mkdir -p "$d"',
+        f'cat > "{path}.$$"',
+        f'[ "$( (sha256sum || shasum -a 256) < "{path}.$$" 2>/dev/null | cut -c1-64)" = {digest} ]',
+        f'mv -f "{path}.$$" "{path}"',
+    ])
+    marker = MISS_MARKER.decode().strip()
+    return "; ".join([
+        f'd="$HOME/{REMOTE_CACHE_DIR}"',
+        f'touch -c "{path}" 2>/dev/null',
+        f'if [ ! -f "{path}" ]; then {store} || {{ rm -f "{path}.$$"; echo {marker} >&2; exit {MISS_EXIT_CODE}; }}'
+        f'; find "$d" -type f -mtime +{PRUNE_DAYS} -delete 2>/dev/null; fi',
+        f'exec {shlex.quote(interpreter)} "{path}" < /dev/null',
+    ])
+
+
+class _MissFilter:
+    """转发输出，但暂扣可能是MISS_MARKER的stderr开头，以免标记混入脚本输出"""
+    
+    def __init__(self, on_output: Optional[Callable[[bool, bytes], None]]):
+        self.on_output = on_output
+        self.held = b""
+        self.holding = True
+    
+    def feed(self, is_stderr: bool, data: bytes):
+        if is_stderr and self.holding:
+            self.held += data
+            if MISS_MARKER.startswith(self.held):
+                return
+            data, self.held, self.holding = self.held, b"", False
+        elif not is_stderr and self.holding:
+            # 脚本已开始输出，不可能是未命中
+            self.flush()
+        if self.on_output is not None:
+            self.on_output(is_stderr, data)
+    
+    def is_miss(self, exit_code: int) -> bool:
+        return exit_code == MISS_EXIT_CODE and self.held == MISS_MARKER
+    
+    def flush(self):
+        held, self.held, self.holding = self.held, b"", False
+        if held and self.on_output is not None:
+            self.on_output(True, held)
+
+
+class RemoteScriptCache:
+    """记录各主机上已确认存在的脚本缓存"""
+    
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._known: Dict[HostKey, Set[str]] = {}
+    
+    @staticmethod
+    def _host_key(ssh: SSHClient) -> HostKey:
+        return (ssh.host, ssh.port, ssh.username)
+    
+    def _is_known(self, host: HostKey, digest: str) -> bool:
+        with self._lock:
+            return digest in self._known.get(host, ())
+    
+    def _remember(self, host: HostKey, digest: str):
+        with self._lock:
+            self._known.setdefault(host, set()).add(digest)
+    
+    def _forget(self, host: HostKey, digest: str):
+        with self._lock:
+            self._known.get(host, set()).discard(digest)
+    
+    def run(
+        self,
+        ssh: SSHClient,
+        content: str,
+        suffix: str,
+        interpreter: str,
+        on_output: Optional[Callable[[bool, bytes], None]] = None,
+        timeout: Optional[float] = None
+    ) -> int:
+        """
+        执行脚本（优先使用远程缓存）
+        
+        已知缓存存在时不发送内容；若缓存已被清理（远程返回未命中），发送内容重试一次
+        
+        Raises:
+            ScriptUploadError: 内容无法写入远程缓存（脚本未执行）
+            CommandTimeout: 执行超时
+        
+        Returns:
+            退出码
+        """
+        data = content.encode("utf-8")
+        digest = script_digest(data)
+        host = self._host_key(ssh)
+        command = build_command(digest, suffix, interpreter)
+        
+        if self._is_known(host, digest):
+            output = _MissFilter(on_output)
+            exit_code = ssh.run_streaming(command, output.feed, timeout, stdin=b"")
+            if not output.is_miss(exit_code):
+                output.flush()
+                return exit_code
+            self._forget(host, digest)
+        
+        output = _MissFilter(on_output)
+        exit_code = ssh.run_streaming(command, output.feed, timeout, stdin=data)
+        if output.is_miss(exit_code):
+            raise ScriptUploadError("Failed to upload script")
+        output.flush()
+        self._remember(host, digest)
+        return exit_code
+
+
+# 全局远程脚本缓存实例
+remote_script_cache = RemoteScriptCache()
@@ -1,18 +1,99 @@
 import paramiko
-from typing import Tuple, Optional
+from typing import Tuple, Optional, Dict, List, Iterator, Callable
 import io
+import select
+import time
+
+
+# 单次远程调用采集资源使用情况：读取/proc，按"@段名"分段输出，由本地解析
+RESOURCE_PROBE = "; ".join([
+    "echo @stat", "head -n1 /proc/stat", "sleep 0.2", "head -n1 /proc/stat",
+    "echo @meminfo", "grep -E '^(MemTotal|MemFree|MemAvailable|Buffers|Cached):' /proc/meminfo",
+    "echo @loadavg", "cat /proc/loadavg",
+    "echo @uptime", "cat /proc/uptime",
+    "echo @nproc", "(nproc 2>/dev/null || grep -c ^processor /proc/cpuinfo)",
+    "echo @df", "df -P -B1 / | tail -1",
+])
+
+# 单次远程调用采集系统信息
+SYSTEM_INFO_PROBE = "; ".join([
+    "echo @uname", "uname -s", "uname -r",
+    "echo @nproc", "(nproc 2>/dev/null || grep -c ^processor /proc/cpuinfo)",
+    "echo @meminfo", "grep -E '^MemTotal:' /proc/meminfo",
+    "echo @df", "df -P -B1 / | tail -1",
+])
+
+GB = 1024 ** 3
+
+# 从通道读取输出时每次读取的字节数
+CHANNEL_READ_SIZE = 32 * 1024
+
+# 标准输入等待远程窗口空间时的轮询间隔（秒），select无法等待通道可写
+STDIN_POLL_INTERVAL = 0.05
+
+
+class CommandTimeout(Exception):
+    """远程命令超过期限"""
+
+
+def parse_probe_output(output: str) -> Dict[str, List[str]]:
+    """将探针输出按段拆分 {"stat": [...], "meminfo": [...]}"""
+    sections: Dict[str, List[str]] = {}
+    current = None
+    for line in output.splitlines():
+        line = line.strip()
+        if line.startswith('@'):
+            current = line[1:]
+            sections[current] = []
+        elif current and line:
+            sections[current].append(line)
+    return sections
+
+
+def _parse_meminfo(lines: List[str]) -> Dict[str, int]:
+    """解析/proc/meminfo片段，单位kB"""
+    result = {}
+    for line in lines:
+        key, _, rest = line.partition(':')
+        parts = rest.split()
+        if parts:
+            result[key] = int(parts[0])
+    return result
+
+
+def _parse_df(lines: List[str]) -> Tuple[int, int]:
+    """解析 df -P -B1 输出，返回 (已用GB, 总量GB)"""
+    parts = lines[0].split()
+    total, used = int(parts[1]), int(parts[2])
+    return round(used / GB), round(total / GB)
+
+
+def _format_uptime(seconds: float) -> str:
+    """格式化为与 uptime -p 一致的文本"""
+    minutes = int(seconds // 60)
+    days, minutes = divmod(minutes, 1440)
+    hours, minutes = divmod(minutes, 60)
+    parts = []
+    if days:
+        parts.append(f"{days} day{'s' if days != 1 else ''}")
+    if hours:
+        parts.append(f"{hours} hour{'s' if hours != 1 else ''}")
+    if minutes or not parts:
+        parts.append(f"{minutes} minute{'s' if minutes != 1 else ''}")
+    return "up " + ", ".join(parts)
 
 
 class SSHClient:
     """SSH客户端封装"""
     
     def __init__(self, host: str, port: int, username: str, password: Optional[str] = None, 
-                 ssh_key: Optional[str] = None):
+                 ssh_key: Optional[str] = None, keepalive_interval: int = 0):
         self.host = host
         self.port = port
         self.username = username
         self.password = password
         self.ssh_key = ssh_key
+        self.keepalive_interval = keepalive_interval
         self.client = None
     
     def connect(self) -> bool:
@@ -41,30 +122,144 @@ class SSHClient:
                     password=self.password,
                     timeout=10
                 )
+            
+            # 长连接需要定期发送keepalive，避免被防火墙/NAT回收
+            if self.keepalive_interval:
+                self.client.get_transport().set_keepalive(self.keepalive_interval)
             return True
         except Exception as e:
             print(f"SSH connection failed: {str(e)}")
             return False
     
-    def execute_command(self, command: str) -> Tuple[str, str, int]:
+    def is_active(self) -> bool:
+        """检查底层Transport是否仍然可用"""
+        if not self.client:
+            return False
+        transport = self.client.get_transport()
+        return transport is not None and transport.is_active()
+    
+    def execute_command(self, command: str, timeout: Optional[float] = None,
+                        max_output: Optional[int] = None) -> Tuple[str, str, int]:
         """执行命令
         
+        stdout和stderr在命令运行期间同时读取，输出很大时远端不会因缓冲区写满而阻塞
+        
+        Args:
+            timeout: 超时（秒），超时后关闭通道，exit_code为-1
+            max_output: stdout/stderr各自最多保留的字节数，超出部分读取后丢弃
+        
         Returns:
             (stdout, stderr, exit_code)
         """
         if not self.client:
             raise Exception("Not connected")
         
+        buffers = {False: bytearray(), True: bytearray()}
+        truncated = {False: False, True: False}
+        
+        def collect(is_stderr: bool, data: bytes):
+            buffer = buffers[is_stderr]
+            if max_output is not None and len(buffer) + len(data) > max_output:
+                data = data[:max(0, max_output - len(buffer))]
+                truncated[is_stderr] = True
+            buffer.extend(data)
+        
         try:
-            stdin, stdout, stderr = self.client.exec_command(command)
-            exit_code = stdout.channel.recv_exit_status()
-            
-            stdout_str = stdout.read().decode('utf-8')
-            stderr_str = stderr.read().decode('utf-8')
-            
-            return stdout_str, stderr_str, exit_code
+            exit_code = self.run_streaming(command, collect, timeout)
+        except CommandTimeout:
+            stderr_str = buffers[True].decode('utf-8', errors='replace')
+            return (
+                buffers[False].decode('utf-8', errors='replace'),
+                stderr_str + f"\n命令执行超时（{timeout:g}s）",
+                -1,
+            )
         except Exception as e:
             return "", str(e), -1
+        
+        stdout_str, stderr_str = (
+            buffers[s].decode('utf-8', errors='replace') + ("\n...（输出过长，已截断）" if truncated[s] else "")
+            for s in (False, True)
+        )
+        return stdout_str, stderr_str, exit_code
+    
+    def run_streaming(self, command: str, on_output: Callable[[bool, bytes], None],
+                      timeout: Optional[float] = None, stdin: Optional[bytes] = None) -> int:
+        """
+        执行命令，输出到达时立即回调 on_output(是否为stderr, 数据块)，不在内存中累积
+        
+        Args:
+            stdin: 写入命令标准输入的数据，与读取输出交替分块写入，写完后关闭标准输入；
+                为None时不写入。命令未读完输入就结束时，剩余数据丢弃
+        
+        Raises:
+            CommandTimeout: 超过timeout秒（通道已关闭）
+        
+        Returns:
+            退出码
+        """
+        if not self.client:
+            raise Exception("Not connected")
+        
+        deadline = time.monotonic() + timeout if timeout else None
+        channel = self.client.get_transport().open_session(timeout=timeout)
+        try:
+            channel.exec_command(command)
+            for is_stderr, data in self.iter_channel_output(channel, deadline, stdin):
+                on_output(is_stderr, data)
+            return channel.recv_exit_status()
+        finally:
+            channel.close()
+    
+    @staticmethod
+    def iter_channel_output(channel, deadline: Optional[float] = None,
+                            stdin: Optional[bytes] = None) -> Iterator[Tuple[bool, bytes]]:
+        """
+        读取已执行命令的通道输出，直到命令结束
+        
+        Args:
+            deadline: time.monotonic()期限，超过时抛出CommandTimeout
+            stdin: 写入标准输入的数据；只在远程窗口有空间时分块写入，
+                命令不读取输入时不会阻塞输出的读取，写完后关闭标准输入
+        
+        Yields:
+            (是否为stderr, 数据块)
+        """
+        unsent = memoryview(stdin) if stdin is not None else None
+        while True:
+            if deadline is not None and time.monotonic() >= deadline:
+                raise CommandTimeout()
+            
+            sent = 0
+            if unsent is not None:
+                if channel.exit_status_ready() or channel.closed:
+                    # 命令已结束，未读取的输入不再发送
+                    unsent = None
+                elif not unsent:
+                    channel.shutdown_write()
+                    unsent = None
+                elif channel.send_ready():
+                    sent = channel.send(unsent[:CHANNEL_READ_SIZE].tobytes())
+                    unsent = unsent[sent:]
+            
+            if channel.recv_ready():
+                yield False, channel.recv(CHANNEL_READ_SIZE)
+                continue
+            if channel.recv_stderr_ready():
+                yield True, channel.recv_stderr(CHANNEL_READ_SIZE)
+                continue
+            if channel.exit_status_ready() and (channel.eof_received or channel.closed):
+                return
+            if sent:
+                continue
+            
+            wait = 1.0 if unsent is None else STDIN_POLL_INTERVAL
+            if deadline is not None:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise CommandTimeout()
+                wait = min(wait, remaining)
+            # 通道的fileno在stdout或stderr有数据时可读
+            select.select([channel], [], [], wait)
     
     def upload_file(self, local_path: str, remote_path: str) -> bool:
         """上传文件"""
@@ -95,7 +290,26 @@ class SSHClient:
             return False
     
     def get_system_info(self) -> dict:
-        """获取系统信息"""
+        """获取系统信息（单次远程调用，无/proc的主机回退到逐条命令）"""
+        stdout, _, _ = self.execute_command(SYSTEM_INFO_PROBE)
+        try:
+            sections = parse_probe_output(stdout)
+            uname = sections['uname']
+            meminfo = _parse_meminfo(sections['meminfo'])
+            _, disk_total = _parse_df(sections['df'])
+            return {
+                'os_type': uname[0],
+                'os_version': uname[1] if len(uname) > 1 else '',
+                'cpu_cores': int(sections['nproc'][0]),
+                'memory_total': meminfo['MemTotal'] // 1024,
+                'disk_total': disk_total,
+            }
+        except (KeyError, IndexError, ValueError) as e:
+            print(f"System info probe failed, falling back: {e}")
+            return self._get_system_info_legacy()
+    
+    def _get_system_info_legacy(self) -> dict:
+        """逐条命令获取系统信息"""
         info = {}
         
         # 操作系统信息
@@ -128,13 +342,83 @@ class SSHClient:
         
         return info
     
-    def get_resource_usage(self) -> dict:
-        """获取资源使用情况"""
+    def get_resource_usage(self, timeout: Optional[float] = None) -> dict:
+        """
+        获取资源使用情况（单次远程调用，无/proc的主机回退到逐条命令）
+        
+        Args:
+            timeout: 整体超时（秒），包括回退的逐条命令
+        
+        Raises:
+            CommandTimeout: 超时
+        """
+        deadline = time.monotonic() + timeout if timeout else None
+        stdout, _, _ = self.execute_command(RESOURCE_PROBE, timeout=timeout)
+        if deadline is not None and time.monotonic() >= deadline:
+            raise CommandTimeout()
+        try:
+            return self._parse_resource_probe(parse_probe_output(stdout))
+        except (KeyError, IndexError, ValueError) as e:
+            print(f"Resource probe failed, falling back: {e}")
+            return self._get_resource_usage_legacy(deadline)
+    
+    @staticmethod
+    def _parse_resource_probe(sections: Dict[str, List[str]]) -> dict:
+        """解析资源探针输出"""
         usage = {}
         
+        # CPU使用率：两次/proc/stat采样的差值
+        first = [int(v) for v in sections['stat'][0].split()[1:]]
+        second = [int(v) for v in sections['stat'][1].split()[1:]]
+        deltas = [b - a for a, b in zip(first, second)]
+        total = sum(deltas)
+        # idle + iowait
+        idle = deltas[3] + (deltas[4] if len(deltas) > 4 else 0)
+        usage['cpu_percent'] = round((total - idle) / total * 100, 2) if total > 0 else 0.0
+        
+        # 内存使用情况（MB）
+        meminfo = _parse_meminfo(sections['meminfo'])
+        mem_total = meminfo['MemTotal']
+        if 'MemAvailable' in meminfo:
+            mem_used = mem_total - meminfo['MemAvailable']
+        else:
+            mem_used = mem_total - meminfo.get('MemFree', 0) - meminfo.get('Buffers', 0) - meminfo.get('Cached', 0)
+        usage['memory_used'] = mem_used // 1024
+        usage['memory_total'] = mem_total // 1024
+        usage['memory_percent'] = round(mem_used / mem_total * 100, 2) if mem_total > 0 else 0.0
+        
+        # 磁盘使用情况（GB）
+        usage['disk_used'], usage['disk_total'] = _parse_df(sections['df'])
+        if usage['disk_total'] > 0:
+            usage['disk_percent'] = round(usage['disk_used'] / usage['disk_total'] * 100, 2)
+        else:
+            usage['disk_percent'] = 0.0
+        
+        # 系统负载
+        load = sections['loadavg'][0].split()
+        usage['load_1'], usage['load_5'], usage['load_15'] = (float(v) for v in load[:3])
+        usage['cpu_cores'] = int(sections['nproc'][0])
+        
+        # 系统运行时间
+        usage['uptime'] = _format_uptime(float(sections['uptime'][0].split()[0]))
+        
+        return usage
+    
+    def _get_resource_usage_legacy(self, deadline: Optional[float] = None) -> dict:
+        """逐条命令获取资源使用情况（deadline为time.monotonic()期限）"""
+        usage = {}
+        
+        def execute_command(command: str) -> Tuple[str, str, int]:
+            if deadline is None:
+                return self.execute_command(command)
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise CommandTimeout()
+            return self.execute_command(command, timeout=remaining)
+        
         # CPU使用率 - 使用更通用的方法
         # 方法1：尝试使用top命令
-        stdout, _, exit_code = self.execute_command(
+        stdout, _, exit_code = execute_command(
             "top -bn1 | grep -i 'cpu' | head -1 | awk '{for(i=1;i<=NF;i++) if($i~/id/) print 100-$(i-1)}' | cut -d'%' -f1 | cut -d',' -f1"
         )
         if exit_code == 0 and stdout.strip():
@@ -144,21 +428,21 @@ class SSHClient:
                 usage['cpu_percent'] = 0.0
         else:
             # 方法2：使用mpstat或其他方法
-            stdout, _, _ = self.execute_command(
+            stdout, _, _ = execute_command(
                 "cat /proc/loadavg | awk '{print $1}'"
             )
             try:
                 # 将load average转换为百分比（粗略估计）
                 load = float(stdout.strip())
                 # 获取CPU核心数
-                stdout2, _, _ = self.execute_command("nproc")
+                stdout2, _, _ = execute_command("nproc")
                 cores = int(stdout2.strip()) if stdout2.strip() else 1
                 usage['cpu_percent'] = round(min(load / cores * 100, 100), 2)
             except:
                 usage['cpu_percent'] = 0.0
         
         # 内存使用情况
-        stdout, _, _ = self.execute_command("free -m | grep Mem | awk '{print $3,$2}'")
+        stdout, _, _ = execute_command("free -m | grep Mem | awk '{print $3,$2}'")
         try:
             parts = stdout.strip().split()
             if len(parts) >= 2:
@@ -177,7 +461,7 @@ class SSHClient:
             usage['memory_percent'] = 0.0
         
         # 磁盘使用情况
-        stdout, _, _ = self.execute_command("df -BG / | tail -1 | awk '{print $3,$2}' | sed 's/G//g'")
+        stdout, _, _ = execute_command("df -BG / | tail -1 | awk '{print $3,$2}' | sed 's/G//g'")
         try:
             parts = stdout.strip().split()
             if len(parts) >= 2:
@@ -196,7 +480,7 @@ class SSHClient:
             usage['disk_percent'] = 0.0
         
         # 系统运行时间
-        stdout, _, _ = self.execute_command("uptime -p 2>/dev/null || uptime | awk -F'up ' '{print $2}' | awk -F',' '{print $1}'")
+        stdout, _, _ = execute_command("uptime -p 2>/dev/null || uptime | awk -F'up ' '{print $2}' | awk -F',' '{print $1}'")
         usage['uptime'] = stdout.strip() if stdout.strip() else "unknown"
         
         return usage
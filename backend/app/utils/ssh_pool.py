@@ -0,0 +1,205 @@
+"""
+SSH连接池
+按服务器ID复用长连接，多个调用方通过同一Transport上的多路复用通道并发执行命令
+"""
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional
+
+from app.core.config import settings
+from app.utils.ssh_client import SSHClient
+
+
+class _PooledConnection:
+    """连接池条目"""
+
+    def __init__(self, client: SSHClient, fingerprint: str):
+        self.client = client
+        self.fingerprint = fingerprint
+        self.created_at = time.monotonic()
+        self.last_used = self.created_at
+        self.in_use = 0
+        # 被淘汰但仍有调用方在使用，归还后再关闭
+        self.retired = False
+
+
+class SSHConnectionPool:
+    """进程级SSH连接池（按服务器ID缓存，LRU + TTL淘汰）"""
+
+    def __init__(self, max_size: int = 500, idle_ttl: int = 300,
+                 max_lifetime: int = 3600, keepalive_interval: int = 30):
+        self.max_size = max_size
+        self.idle_ttl = idle_ttl
+        self.max_lifetime = max_lifetime
+        self.keepalive_interval = keepalive_interval
+
+        self._lock = threading.Lock()
+        self._connections: "OrderedDict[int, _PooledConnection]" = OrderedDict()
+        # 每台服务器一把连接锁，避免并发请求同时对同一主机握手
+        self._connect_locks: Dict[int, threading.Lock] = {}
+
+    @staticmethod
+    def _fingerprint(server) -> str:
+        """根据连接参数计算指纹，凭据变化后旧连接自动失效"""
+        raw = "\0".join(str(v or "") for v in (
+            server.host, server.port, server.username, server.password, server.ssh_key
+        ))
+        return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+    def _is_usable(self, entry: _PooledConnection, fingerprint: str, now: float) -> bool:
+        """检查连接是否可以继续复用"""
+        return (
+            not entry.retired
+            and entry.fingerprint == fingerprint
+            and now - entry.created_at < self.max_lifetime
+            and entry.client.is_active()
+        )
+
+    def _detach(self, server_id: int, entry: _PooledConnection, to_close: List[SSHClient]):
+        """从池中移除条目（需持有self._lock）"""
+        if self._connections.get(server_id) is entry:
+            del self._connections[server_id]
+        entry.retired = True
+        if entry.in_use == 0:
+            to_close.append(entry.client)
+
+    @staticmethod
+    def _close_all(clients: List[SSHClient]):
+        """在锁外关闭连接"""
+        for client in clients:
+            try:
+                client.close()
+            except Exception as e:
+                print(f"关闭SSH连接失败: {e}")
+
+    def _acquire(self, server) -> Optional[_PooledConnection]:
+        """获取连接，必要时新建"""
+        fingerprint = self._fingerprint(server)
+        to_close: List[SSHClient] = []
+
+        with self._lock:
+            connect_lock = self._connect_locks.setdefault(server.id, threading.Lock())
+
+        try:
+            with connect_lock:
+                with self._lock:
+                    now = time.monotonic()
+                    entry = self._connections.get(server.id)
+                    if entry is not None:
+                        if self._is_usable(entry, fingerprint, now):
+                            entry.in_use += 1
+                            entry.last_used = now
+                            self._connections.move_to_end(server.id)
+                            return entry
+                        self._detach(server.id, entry, to_close)
+
+                client = SSHClient(
+                    host=server.host,
+                    port=server.port,
+                    username=server.username,
+                    password=server.password,
+                    ssh_key=server.ssh_key,
+                    keepalive_interval=self.keepalive_interval
+                )
+                if not client.connect():
+                    return None
+
+                entry = _PooledConnection(client, fingerprint)
+                entry.in_use = 1
+                with self._lock:
+                    self._connections[server.id] = entry
+                    # 超出容量时按LRU淘汰空闲连接
+                    for sid in list(self._connections.keys()):
+                        if len(self._connections) <= self.max_size:
+                            break
+                        candidate = self._connections[sid]
+                        if candidate.in_use == 0:
+                            self._detach(sid, candidate, to_close)
+                return entry
+        finally:
+            self._close_all(to_close)
+
+    def _release(self, server_id: int, entry: _PooledConnection):
+        """归还连接"""
+        to_close: List[SSHClient] = []
+        with self._lock:
+            entry.in_use -= 1
+            entry.last_used = time.monotonic()
+            if entry.retired:
+                if entry.in_use == 0:
+                    to_close.append(entry.client)
+            elif not entry.client.is_active():
+                # 使用过程中连接已断开
+                self._detach(server_id, entry, to_close)
+        self._close_all(to_close)
+
+    @contextmanager
+    def connection(self, server) -> Iterator[Optional[SSHClient]]:
+        """
+        借用指定服务器的SSH连接
+
+        连接失败时返回None；调用方不要自行close，归还由上下文管理器负责
+        """
+        entry = self._acquire(server)
+        try:
+            yield entry.client if entry else None
+        finally:
+            if entry:
+                self._release(server.id, entry)
+
+    def invalidate(self, server_id: int):
+        """使指定服务器的连接失效（凭据变更或删除服务器时调用）"""
+        to_close: List[SSHClient] = []
+        with self._lock:
+            entry = self._connections.get(server_id)
+            if entry is not None:
+                self._detach(server_id, entry, to_close)
+        self._close_all(to_close)
+
+    def evict_idle(self) -> int:
+        """回收空闲超时、超过最长存活时间或已断开的连接
+
+        Returns:
+            回收的连接数
+        """
+        to_close: List[SSHClient] = []
+        with self._lock:
+            now = time.monotonic()
+            for server_id, entry in list(self._connections.items()):
+                if entry.in_use > 0:
+                    continue
+                if (now - entry.last_used >= self.idle_ttl
+                        or now - entry.created_at >= self.max_lifetime
+                        or not entry.client.is_active()):
+                    self._detach(server_id, entry, to_close)
+        self._close_all(to_close)
+        return len(to_close)
+
+    def close_all(self):
+        """关闭所有连接"""
+        to_close: List[SSHClient] = []
+        with self._lock:
+            for server_id, entry in list(self._connections.items()):
+                self._detach(server_id, entry, to_close)
+        self._close_all(to_close)
+
+    def stats(self) -> dict:
+        """连接池状态"""
+        with self._lock:
+            return {
+                "size": len(self._connections),
+                "in_use": sum(1 for e in self._connections.values() if e.in_use > 0),
+                "max_size": self.max_size,
+            }
+
+
+# 全局连接池实例
+ssh_pool = SSHConnectionPool(
+    max_size=settings.SSH_POOL_MAX_SIZE,
+    idle_ttl=settings.SSH_POOL_IDLE_TTL,
+    max_lifetime=settings.SSH_POOL_MAX_LIFETIME,
+    keepalive_interval=settings.SSH_KEEPALIVE_INTERVAL
+)
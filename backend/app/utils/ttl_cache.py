@@ -0,0 +1,62 @@
+"""
+进程内TTL缓存
+用于仪表盘统计等允许短时间内读到旧数据的查询结果
+"""
+import threading
+import time
+from typing import Any, Callable, Dict, Hashable, Tuple
+
+
+class TTLCache:
+    """带过期时间的简单缓存，同一key并发未命中时只计算一次"""
+    
+    def __init__(self, ttl: float, max_entries: int = 256):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        # key -> (过期时间, 值)
+        self._entries: Dict[Hashable, Tuple[float, Any]] = {}
+        self._key_locks: Dict[Hashable, threading.Lock] = {}
+    
+    def get_or_set(self, key: Hashable, factory: Callable[[], Any]) -> Any:
+        """命中则返回缓存值，否则调用factory计算并缓存"""
+        if self.ttl <= 0:
+            return factory()
+        
+        entry = self._entries.get(key)
+        if entry is not None and entry[0] > time.monotonic():
+            return entry[1]
+        
+        with self._lock:
+            key_lock = self._key_locks.setdefault(key, threading.Lock())
+        
+        with key_lock:
+            # 等锁期间可能已被其他线程算好
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] > time.monotonic():
+                return entry[1]
+            
+            value = factory()
+            with self._lock:
+                if len(self._entries) >= self.max_entries:
+                    self._evict_expired()
+                self._entries[key] = (time.monotonic() + self.ttl, value)
+            return value
+    
+    def _evict_expired(self):
+        """清理过期条目，仍然超限时清空（需持有锁）"""
+        now = time.monotonic()
+        for key in [k for k, (expires, _) in self._entries.items() if expires <= now]:
+            del self._entries[key]
+            self._key_locks.pop(key, None)
+        if len(self._entries) >= self.max_entries:
+            self._entries.clear()
+            self._key_locks.clear()
+    
+    def invalidate(self, key: Hashable = None):
+        """使指定key（不传则全部）失效"""
+        with self._lock:
+            if key is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(key, None)
@@ -0,0 +1,253 @@
+#!/usr/bin/env python3
+"""
+列表与统计查询基准测试
+在独立的SQLite数据库中灌入大量告警/执行记录，分别在无索引和有索引（upgrade_schema创建）时
+执行各列表、统计接口实际调用的服务方法，输出查询计划和耗时
+
+用法:
+    python benchmark_queries.py --alerts 2000000 --executions 500000
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+# 添加项目路径
+sys.path.insert(0, os.path.dirname(__file__))
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="列表与统计查询基准测试")
+    parser.add_argument("--alerts", type=int, default=2000000, help="告警记录数")
+    parser.add_argument("--executions", type=int, default=500000, help="脚本/任务执行记录数（各）")
+    parser.add_argument("--servers", type=int, default=500, help="服务器数")
+    parser.add_argument("--days", type=int, default=60, help="数据分布的天数")
+    parser.add_argument("--runs", type=int, default=5, help="每个查询的执行次数")
+    parser.add_argument("--db", help="数据库文件（默认临时文件，结束后删除）")
+    return parser.parse_args()
+
+
+args = parse_args()
+db_path = args.db or os.path.join(tempfile.mkdtemp(prefix="devops-bench-"), "bench.db")
+# 必须在导入app之前设置，确保不会连到业务库
+os.environ["DATABASE_URL"] = f"sqlite:///{db_path}"
+
+from sqlalchemy import event, text  # noqa: E402
+
+from app.core.database import Base, SessionLocal, engine, upgrade_schema  # noqa: E402
+from app.models import Alert, AlertNotification, AlertSilence, ScriptExecution, TaskExecution  # noqa: E402
+from app.services.alert_rule_service import AlertRuleService  # noqa: E402
+from app.services.alert_service import AlertService  # noqa: E402
+from app.services.notification_service import NotificationService  # noqa: E402
+from app.services.script_service import ScriptService  # noqa: E402
+from app.services.task_service import TaskService  # noqa: E402
+
+
+BATCH = 50000
+LEVELS = ["info", "warning", "warning", "error", "critical"]
+ALERT_STATUSES = ["open", "acknowledged", "resolved", "resolved", "resolved"]
+ALERT_TYPES = ["cpu", "memory", "disk"]
+EXEC_STATUSES = ["success", "success", "success", "failed"]
+
+BENCHMARK_TABLES = [
+    Alert.__table__,
+    AlertSilence.__table__,
+    AlertNotification.__table__,
+    ScriptExecution.__table__,
+    TaskExecution.__table__,
+]
+
+
+def random_time(now: datetime, days: int) -> datetime:
+    return now - timedelta(seconds=random.randint(0, days * 86400))
+
+
+def insert_batches(table, total: int, make_row):
+    """分批插入"""
+    with engine.begin() as conn:
+        for offset in range(0, total, BATCH):
+            rows = [make_row() for _ in range(min(BATCH, total - offset))]
+            conn.execute(table.insert(), rows)
+            print(f"   {table.name}: {offset + len(rows)}/{total}", end="\r")
+    print()
+
+
+def seed():
+    """生成测试数据"""
+    print("=" * 60)
+    print(f"📦 生成测试数据: {db_path}")
+    print("=" * 60)
+    now = datetime.utcnow()
+    
+    insert_batches(Alert.__table__, args.alerts, lambda: {
+        "server_id": random.randint(1, args.servers),
+        "alert_type": random.choice(ALERT_TYPES),
+        "level": random.choice(LEVELS),
+        "title": "CPU高负载告警",
+        "message": "CPU使用率达到 91.2%，超过阈值 80.0%",
+        "current_value": 91.2,
+        "threshold_value": 80.0,
+        "status": random.choice(ALERT_STATUSES),
+        "is_notified": True,
+        "triggered_at": random_time(now, args.days),
+    })
+    insert_batches(AlertNotification.__table__, args.alerts // 2, lambda: {
+        "alert_id": random.randint(1, args.alerts),
+        "rule_id": random.randint(1, 50),
+        "notification_type": "email",
+        "recipient": "ops@example.com",
+        "status": "sent",
+        "attempts": 1,
+        "created_at": random_time(now, args.days),
+    })
+    insert_batches(AlertSilence.__table__, 50 * args.servers, lambda: {
+        "rule_id": random.randint(1, 50),
+        "server_id": random.randint(1, args.servers),
+        "last_alert_time": now,
+        "silence_until": random_time(now, 1) + timedelta(days=1),
+    })
+    insert_batches(ScriptExecution.__table__, args.executions, lambda: {
+        "script_id": random.randint(1, 200),
+        "server_id": random.randint(1, args.servers),
+        "status": random.choice(EXEC_STATUSES),
+        "start_time": random_time(now, args.days),
+        "output": "ok",
+        "exit_code": 0,
+    })
+    insert_batches(TaskExecution.__table__, args.executions, lambda: {
+        "task_id": random.randint(1, 200),
+        "status": random.choice(EXEC_STATUSES),
+        "start_time": random_time(now, args.days),
+        "output": "ok",
+    })
+    with engine.begin() as conn:
+        conn.execute(text("ANALYZE"))
+
+
+def drop_indexes():
+    """删除模型上声明的二级索引，模拟升级前的表结构"""
+    with engine.begin() as conn:
+        for table in BENCHMARK_TABLES:
+            for column in table.columns:
+                if column.index:
+                    conn.execute(text(f"DROP INDEX IF EXISTS ix_{table.name}_{column.name}"))
+            for index in table.indexes:
+                conn.execute(text(f"DROP INDEX IF EXISTS {index.name}"))
+        conn.execute(text("ANALYZE"))
+
+
+# (名称, 对应接口, 调用)
+CASES = [
+    ("告警列表", "GET /api/alerts",
+     lambda db: AlertService.get_alerts(db, limit=20)),
+    ("告警列表(未处理)", "GET /api/alerts?status=open",
+     lambda db: AlertService.get_alerts(db, limit=20, status="open")),
+    ("告警统计7天", "GET /api/alert-rules/statistics/overview",
+     lambda db: AlertRuleService._compute_alert_statistics(db, 7)),
+    ("告警趋势30天", "GET /api/alert-rules/statistics/trends",
+     lambda db: AlertRuleService._compute_alert_trends(db, 30)),
+    ("静默检查", "AlertRuleService.is_silenced",
+     lambda db: AlertRuleService.is_silenced(db, 7, 42)),
+    ("通知记录", "GET /api/alert-rules/notifications?alert_id=",
+     lambda db: NotificationService.get_notifications(db, alert_id=12345)),
+    ("脚本执行记录", "GET /api/scripts/executions",
+     lambda db: ScriptService.get_executions(db, limit=20)),
+    ("任务执行记录", "GET /api/tasks/executions",
+     lambda db: TaskService.get_executions(db, limit=20)),
+    ("任务执行记录(按任务)", "GET /api/tasks/executions?task_id=",
+     lambda db: TaskService.get_executions(db, task_id=17, limit=20)),
+]
+
+
+def capture_statements(call):
+    """执行一次调用，记录实际发出的SQL"""
+    statements = []
+    
+    def listener(conn, cursor, statement, parameters, context, executemany):
+        statements.append((statement, parameters))
+    
+    event.listen(engine, "before_cursor_execute", listener)
+    db = SessionLocal()
+    try:
+        call(db)
+    finally:
+        db.close()
+        event.remove(engine, "before_cursor_execute", listener)
+    return statements
+
+
+def explain(statement, parameters):
+    with engine.connect() as conn:
+        rows = conn.exec_driver_sql(f"EXPLAIN QUERY PLAN {statement}", parameters).fetchall()
+    return [row[-1] for row in rows]
+
+
+def measure(call) -> float:
+    """多次执行取中位数（毫秒）"""
+    timings = []
+    for _ in range(args.runs):
+        db = SessionLocal()
+        try:
+            start = time.perf_counter()
+            call(db)
+            timings.append((time.perf_counter() - start) * 1000)
+        finally:
+            db.close()
+    return statistics.median(timings)
+
+
+def run_phase(title: str) -> dict:
+    print()
+    print("=" * 60)
+    print(f"⏱️  {title}")
+    print("=" * 60)
+    results = {}
+    for name, endpoint, call in CASES:
+        elapsed = measure(call)
+        results[name] = elapsed
+        print(f"\n▶ {name}  ({endpoint})  {elapsed:.1f}ms")
+        for statement, parameters in capture_statements(call):
+            for line in explain(statement, parameters):
+                print(f"   {line}")
+    return results
+
+
+def main():
+    Base.metadata.create_all(bind=engine, tables=BENCHMARK_TABLES)
+    drop_indexes()
+    # 复用--db指定的已有数据时跳过生成
+    with engine.connect() as conn:
+        has_data = conn.execute(text("SELECT 1 FROM alerts LIMIT 1")).first() is not None
+    if not has_data:
+        seed()
+    
+    before = run_phase("优化前（无二级索引）")
+    
+    print("\n🛠️  执行 upgrade_schema 创建索引...")
+    start = time.perf_counter()
+    upgrade_schema()
+    with engine.begin() as conn:
+        conn.execute(text("ANALYZE"))
+    print(f"   耗时 {time.perf_counter() - start:.1f}s")
+    
+    after = run_phase("优化后")
+    
+    print()
+    print("=" * 60)
+    print("📊 汇总（中位数耗时）")
+    print("=" * 60)
+    print(f"{'查询':<24}{'优化前':>12}{'优化后':>12}{'加速':>10}")
+    for name, _, _ in CASES:
+        speedup = before[name] / after[name] if after[name] else float("inf")
+        print(f"{name:<24}{before[name]:>10.1f}ms{after[name]:>10.1f}ms{speedup:>9.1f}x")
+    
+    if not args.db:
+        os.remove(db_path)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,3 +1,4 @@
+import threading
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from app.core.config import settings
@@ -6,6 +7,13 @@ from app.core.security import get_password_hash
 from app.models.user import User
 from app.api import auth, servers, scripts, users, alerts, tasks, alert_rules, kubernetes, websocket
 from app.services.scheduler_service import scheduler_service
+from app.services.execution_output_service import ExecutionOutputService
+from app.utils.ssh_pool import ssh_pool
+from app.utils.metrics_store import metrics_store
+from app.services.k8s_metrics_service import k8s_metrics_store
+from app.services.notification_dispatcher import notification_dispatcher
+from app.utils.k8s_client import k8s_clients
+from app.utils.k8s_informer import k8s_informers
 
 # 创建FastAPI应用
 app = FastAPI(
@@ -58,12 +66,24 @@ def on_startup():
     
     # 加载定时任务
     scheduler_service.load_tasks()
+    
+    # 启动告警通知投递
+    notification_dispatcher.start()
+    
+    # 旧版本未压缩的执行输出分批迁移到压缩存储（后台执行，不阻塞启动）
+    threading.Thread(target=ExecutionOutputService.migrate_legacy, name="output-migration", daemon=True).start()
 
 
 @app.on_event("shutdown")
 def on_shutdown():
     """应用关闭时执行"""
     scheduler_service.shutdown()
+    notification_dispatcher.stop()
+    k8s_informers.stop_all()
+    k8s_clients.close_all()
+    ssh_pool.close_all()
+    metrics_store.close()
+    k8s_metrics_store.close()
 
 
 @app.get("/")